@@ -3,18 +3,181 @@ TEF Master Cloud - Hybrid AI Integration Module
 Handles AI interactions with fallback logic (Local -> Cloud) and Internet Search.
 """
 
+import asyncio
+import atexit
+import contextvars
+import hashlib
 import json
 import os
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
 import streamlit as st
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any, Union
+from pathlib import Path
+import httpx
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Tuple, Union
 import google.generativeai as genai
-import ollama
 from duckduckgo_search import DDGS
-from config import GEMINI_CONFIG, OLLAMA_CONFIG, AI_PROVIDER, SEARCH_ENABLED
+from config import (
+    GEMINI_CONFIG, OLLAMA_CONFIG, AI_PROVIDER, SEARCH_ENABLED, SEMANTIC_CACHE_CONFIG, LOCAL_SEARCH_CONFIG,
+    GENERATION_PROFILES, DEFAULT_GENERATION_PROFILE, AI_HEDGE_DELAY_S, RECORD_REPLAY_CONFIG, READING_LOUNGE_MODE,
+    SEARCH_GATE_CONFIG, OPENAI_COMPAT_CONFIG, MODEL_ROUTES, MODEL_ROUTER_CONFIG, MODEL_AUTOTUNE_CONFIG,
+    TEF_WRITING_STRUCTURE_MAX, TEF_WRITING_VOCABULARY_MAX, TEF_WRITING_GRAMMAR_MAX
+)
+from essay_analysis import analyze_essay, format_analysis
+from semantic_cache import SemanticCache
+from metrics import metrics
+from local_search import load_or_build_index, format_results, fold_accents
+from search_gate import build_query, classify as classify_search
+from web_search import WebSearcher
+from model_router import ModelRouter, split_route
+from conjugation import generate_drill, normalize_answer
+from ollama_pool import OllamaHost, OllamaHostPool
+from model_autotune import autotune, load_profile
+from rate_limiter import backoff_delay, error_code, is_retryable, limiter_for, retry_after
+from async_runtime import CallScope, ScopeAbandoned, current_scope, guarded, run_sync, submit
+from tutor_memory import SUMMARY_SYSTEM_PROMPT, ConversationMemory
+
+# Rubric criteria graded independently (and concurrently) by grade_essay
+GRADING_CRITERIA = {
+    "structure": {
+        "max": TEF_WRITING_STRUCTURE_MAX,
+        "focus": "task completion, organisation, paragraphing, use of connectors, length vs target"
+    },
+    "vocabulary": {
+        "max": TEF_WRITING_VOCABULARY_MAX,
+        "focus": "range, precision and register of vocabulary, repetition"
+    },
+    "grammar": {
+        "max": TEF_WRITING_GRAMMAR_MAX,
+        "focus": "accuracy of agreement, conjugation, tense choice and sentence construction"
+    },
+}
+
+JSON_INSTRUCTION = "CRITICAL: RESPONSE MUST BE VALID MINIFIED JSON. NO MARKDOWN."
+
+def _strict_object(properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Object schema for strict mode: every property required, no others allowed (llama.cpp and
+    vLLM/xgrammar treat unlisted properties as forbidden, so the schema must give the full shape)."""
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+_STRING = {"type": "string"}
+
+# JSON shapes per generation profile, for providers that can constrain decoding to a schema. Only
+# profiles whose answer always has the same shape get one: "questions" serves both fill-in-the-blank
+# and MCQ calls, so it is sent in plain json_object mode.
+RESPONSE_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "grading": _strict_object({"score": {"type": "number"}, "feedback": _STRING,
+                               "suggestions": {"type": "array", "items": _STRING}}),
+    "reading_bundle": _strict_object({
+        "article": _STRING,
+        "questions": {"type": "array", "items": _strict_object({
+            "question": _STRING, "options": {"type": "array", "items": _STRING},
+            "correct_index": {"type": "integer"}, "explanation": _STRING, "evidence": _STRING,
+        })},
+    }),
+}
+
+
+def get_profile(name: Optional[str]) -> Dict[str, Any]:
+    """Resolve a generation profile by name (unknown names fall back to the default)."""
+    profile = GENERATION_PROFILES.get(name or DEFAULT_GENERATION_PROFILE, GENERATION_PROFILES[DEFAULT_GENERATION_PROFILE])
+    return {"name": name if name in GENERATION_PROFILES else DEFAULT_GENERATION_PROFILE, **profile}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for budgeting prompts."""
+    return len(text) // 4 + 1
+
+
+# Per-request usage accumulator: set it to a dict to total the provider calls made underneath
+_call_usage: "contextvars.ContextVar[Optional[Dict[str, Any]]]" = contextvars.ContextVar("ai_call_usage", default=None)
+
+
+def _match_words(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", fold_accents(text))
+
+
+def validate_reading_bundle(data: Any, count: int) -> Optional[Dict[str, Any]]:
+    """Check a combined article + MCQ response against the article text.
+
+    Keeps well-formed questions whose "evidence" quote is found in the article. Returns None if the
+    article is too short or fewer than count - 2 questions survive.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("article"), str):
+        return None
+    article = data["article"].strip()
+    article_words = _match_words(article)
+    if len(article_words) < 80:
+        return None
+    article_text, article_vocab = " ".join(article_words), set(article_words)
+
+    questions = []
+    for q in data.get("questions") or []:
+        try:
+            options = [str(o) for o in q["options"]]
+            correct = int(q["correct_index"])
+            evidence = _match_words(str(q.get("evidence", "")))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if len(options) < 2 or not 0 <= correct < len(options) or not str(q.get("question", "")).strip():
+            continue
+        # Grounded if quoted verbatim, or nearly so (models tend to drop or alter a word)
+        grounded = len(evidence) >= 3 and (
+            " ".join(evidence) in article_text
+            or sum(w in article_vocab for w in evidence) / len(evidence) >= 0.8
+        )
+        if not grounded:
+            continue
+        questions.append({
+            "question": str(q["question"]), "options": options, "correct_index": correct,
+            "explanation": str(q.get("explanation", "")), "evidence": str(q.get("evidence", ""))
+        })
+
+    if len(questions) < max(1, count - 2):
+        return None
+    return {"article": article, "questions": questions[:count]}
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider is skipped because it is known to be down."""
+
+
+def streamlit_session_check() -> Optional[Callable[[], bool]]:
+    """Cancellation check for the calling Streamlit script run.
+
+    Returns a callable that turns True once the run has been superseded (rerun/stop requested,
+    e.g. "Back to Roadmap" was clicked) or its browser session is gone. None outside Streamlit.
+    """
+    try:
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        return None
+    requests = getattr(ctx, "script_requests", None)
+    if ctx is None or requests is None:
+        return None
+    session_id = ctx.session_id
+
+    def superseded() -> bool:
+        state = getattr(requests, "_state", None)
+        if state is not None and state.name != "CONTINUE":
+            return True
+        return Runtime.exists() and not Runtime.instance().is_active_session(session_id)
+
+    return superseded
+
 
 class AIProvider(ABC):
-    """Abstract base class for AI providers."""
+    """Abstract base class for AI providers.
+
+    Providers implement the async methods; the sync methods are thin wrappers that run them
+    on the shared AI event loop.
+    """
     
     @property
     @abstractmethod
@@ -26,68 +189,253 @@ class AIProvider(ABC):
     def is_available(self) -> bool:
         pass
 
+    async def ais_available(self) -> bool:
+        """Non-blocking availability check (defaults to the cached sync flag)."""
+        return self.is_available
+
+    async def ainstalled_models(self) -> Optional[set]:
+        """Models this provider can serve, if it can tell (None = unknown, don't filter routes)."""
+        return None
+
+    def preferred_model(self, task: str) -> Optional[str]:
+        """Model this provider would pick for `task` on its own (None = its default)."""
+        return None
+
     @abstractmethod
-    def generate_text(self, prompt: str, system_prompt: str = "") -> str:
+    async def agenerate_text(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
         pass
 
     @abstractmethod
-    def generate_json(self, prompt: str, system_prompt: str = "") -> str:
+    async def agenerate_json(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
         pass
 
+    def generate_text(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE) -> str:
+        return run_sync(self.agenerate_text(prompt, system_prompt, profile))
+
+    def generate_json(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE) -> str:
+        return run_sync(self.agenerate_json(prompt, system_prompt, profile))
+
 class OllamaProvider(AIProvider):
     """Local AI Provider using Ollama."""
     
     def __init__(self):
-        self._name = f"Local ({OLLAMA_CONFIG['model']})"
-        self.client = ollama.Client(host=OLLAMA_CONFIG['base_url'])
+        self.pool = OllamaHostPool(
+            OLLAMA_CONFIG['base_url'], OLLAMA_CONFIG['timeout'],
+            eject_after=OLLAMA_CONFIG['host_eject_after_failures'],
+            eject_s=OLLAMA_CONFIG['host_eject_s'],
+            health_interval_s=OLLAMA_CONFIG['host_health_interval_s'],
+            probe_timeout_s=OLLAMA_CONFIG['host_probe_timeout_s']
+        )
         self.model = OLLAMA_CONFIG['model']
-        self._available = False
-        self._check_availability()
-    
-    def _check_availability(self):
-        try:
-            # Quick list call to check connection
-            self.client.list()
-            self._available = True
-        except:
-            self._available = False
+        self.tuned: Dict[str, str] = {}  # Task -> best model on this machine, from the autotune profile
+        self._warmup_started = False
+        self._keep_warm_thread: Optional[threading.Thread] = None
+        self._last_activity = 0.0
+        self._chars_per_token = 4.0  # Calibrated from cold-load (uncached) prompt evaluations only
+        self.pool.check()
+        if MODEL_AUTOTUNE_CONFIG['enabled']:
+            self.apply_profile(load_profile())
+            if MODEL_AUTOTUNE_CONFIG['run_on_start'] and self.pool.available:
+                threading.Thread(target=self._autotune, name="ollama-autotune", daemon=True).start()
+        if OLLAMA_CONFIG['warmup_on_start'] and self.pool.available:
+            self.start_warmup()
 
     @property
     def name(self) -> str:
-        return self._name
+        hosts = len(self.pool.hosts)
+        return f"Local ({self.model})" + (f" ×{hosts} hosts" if hosts > 1 else "")
+
+    def apply_profile(self, profile: Optional[Dict[str, Any]]):
+        """Use the autotuned model choices (skipping models that are no longer installed)."""
+        if not profile:
+            return
+        installed = self.pool.installed_models()
+        self.tuned = {task: model for task, model in profile.get("best", {}).items()
+                      if installed is None or model in installed}
+        self.model = self.tuned.get("default", self.model)
+
+    def _autotune(self):
+        try:
+            self.apply_profile(autotune())
+        except Exception:
+            pass  # Tuning is best-effort; the configured model keeps working
+
+    def preferred_model(self, task: str) -> Optional[str]:
+        return self.tuned.get(task) or self.tuned.get("default")
 
     @property
     def is_available(self) -> bool:
-        # Re-check on demand if previously unavailable (in case user started it)
-        if not self._available:
-            self._check_availability()
-        return self._available
+        # Re-check on demand if no host is up (in case user started one)
+        if not self.pool.available:
+            self.pool.check()
+        return self.pool.available
 
-    def generate_text(self, prompt: str, system_prompt: str = "") -> str:
+    async def ais_available(self) -> bool:
+        return await self.pool.arefresh()
+
+    async def ainstalled_models(self) -> Optional[set]:
+        """Names of the models pulled on the healthy hosts (refreshed by health probes)."""
+        await self.pool.arefresh()
+        return self.pool.installed_models()
+
+    def _options(self, profile: Dict[str, Any]) -> Dict[str, Any]:
+        options = {
+            "num_predict": profile["max_tokens"],
+            "num_ctx": profile["num_ctx"],
+            "temperature": profile["temperature"],
+        }
+        if profile["stop"]:
+            options["stop"] = profile["stop"]
+        return options
+
+    @staticmethod
+    def _keep_alive(request_class: str) -> str:
+        keep_alive = OLLAMA_CONFIG['keep_alive']
+        return keep_alive.get(request_class, keep_alive['default'])
+
+    def _record_timings(self, response: Any, request_class: str, profile: Optional[str] = None,
+                        prompt_chars: int = 0, model: Optional[str] = None) -> Dict[str, Any]:
+        """Split Ollama's response metadata into model-load vs inference time (ms)."""
+        def ms(field: str) -> float:
+            value = getattr(response, field, None)
+            if value is None and isinstance(response, dict):
+                value = response.get(field)
+            return round((value or 0) / 1e6, 1)
+
+        # Ollama only evaluates prompt tokens that are not already in its KV cache, so the gap between
+        # the expected prompt size and prompt_eval_count is the prefix that was reused.
+        evaluated = getattr(response, 'prompt_eval_count', None) or 0
+        saved_tokens, saved_ms = 0, 0.0
+        if prompt_chars and evaluated:
+            if ms('load_duration') >= OLLAMA_CONFIG['cold_load_min_ms']:
+                # Freshly loaded model => nothing cached => calibrate chars/token on a full evaluation
+                self._chars_per_token = 0.8 * self._chars_per_token + 0.2 * (prompt_chars / evaluated)
+            saved_tokens = max(0, int(prompt_chars / self._chars_per_token) - evaluated)
+            saved_ms = round(saved_tokens * ms('prompt_eval_duration') / evaluated, 1)
+            metrics.increment("ollama_prompt_eval_saved_ms", saved_ms)
+
+        return metrics.record(
+            "ollama_call",
+            model=model or self.model,
+            request_class=request_class,
+            profile=profile,
+            load_ms=ms('load_duration'),
+            prompt_eval_ms=ms('prompt_eval_duration'),
+            eval_ms=ms('eval_duration'),
+            inference_ms=round(ms('prompt_eval_duration') + ms('eval_duration'), 1),
+            total_ms=ms('total_duration'),
+            prompt_tokens=evaluated,
+            output_tokens=getattr(response, 'eval_count', None) or 0,
+            prefix_reused_tokens_est=saved_tokens,
+            prompt_eval_saved_ms_est=saved_ms,
+        )
+
+    async def _achat(self, messages: List[Dict[str, str]], profile: Dict[str, Any],
+                     timeout: Optional[float] = None, model: Optional[str] = None, **kwargs) -> str:
+        # Cancelling the request closes the HTTP connection, which makes Ollama stop generating
+        model = model or self.preferred_model(profile["name"]) or self.model
+        response = await asyncio.wait_for(self.pool.arun(lambda host: host.aclient.chat(
+            model=model, messages=messages, options=self._options(profile),
+            keep_alive=self._keep_alive(profile["request_class"]), **kwargs
+        ), model), timeout)
+        prompt_chars = sum(len(m["content"]) for m in messages)
+        self._record_timings(response, profile["request_class"], profile["name"], prompt_chars, model)
+        self.touch_session()
+        return response['message']['content']
+
+    async def agenerate_text(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
         messages.append({"role": "user", "content": prompt})
         
-        response = self.client.chat(model=self.model, messages=messages)
-        return response['message']['content']
+        return await self._achat(messages, get_profile(profile), timeout, model)
 
-    def generate_json(self, prompt: str, system_prompt: str = "") -> str:
+    async def agenerate_json(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
         # Helper to gently coerce JSON if model doesn't support 'format="json"' strictly
         # But Gemma 3 usually does.
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": prompt + "\n\nCRITICAL: RESPONSE MUST BE VALID MINIFIED JSON. NO MARKDOWN."})
+        # The JSON instruction is constant, so it goes into the system prefix (reused from Ollama's KV cache)
+        # rather than after the variable user content.
+        messages = [{"role": "system", "content": f"{system_prompt}\n{JSON_INSTRUCTION}".strip()}]
+        messages.append({"role": "user", "content": prompt})
         
         # Note: 'format="json"' is supported in newer Ollama versions
         try:
-             response = self.client.chat(model=self.model, messages=messages, format="json", options={"temperature": 0.2})
-             return response['message']['content']
+             return await self._achat(messages, get_profile(profile), timeout, model, format="json")
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+             raise
         except:
              # Fallback without format="json" if model/version issues
-             response = self.client.chat(model=self.model, messages=messages)
-             return response['message']['content']
+             return await self._achat(messages, get_profile(profile), timeout, model)
+
+    async def aembed(self, text: str, model: Optional[str] = None) -> List[float]:
+        """Embedding vector for text from the local embeddings endpoint."""
+        model = model or SEMANTIC_CACHE_CONFIG['embedding_model']
+        response = await self.pool.arun(lambda host: host.aclient.embed(
+            model=model, input=text, keep_alive=self._keep_alive("embedding")
+        ), model)
+        return response['embeddings'][0]
+
+    def embed(self, text: str, model: Optional[str] = None) -> List[float]:
+        return run_sync(self.aembed(text, model))
+
+    # ==================== Warm-up & Keep-alive ====================
+
+    def warm_up(self, host: Optional[OllamaHost] = None) -> Optional[Dict[str, Any]]:
+        """Load the model into memory on one host (an empty prompt makes Ollama load without generating)."""
+        host = host or self.pool.hosts[0]
+        try:
+            start = time.perf_counter()
+            response = host.client.generate(model=self.model, prompt="", keep_alive=self._keep_alive("warmup"))
+            event = self._record_timings(response, "warmup")
+            event["wall_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            return event
+        except Exception:
+            return None
+
+    def start_warmup(self):
+        """Preload the model on every healthy host, each in a background thread (once per process)."""
+        if self._warmup_started:
+            return
+        self._warmup_started = True
+        for host in self.pool.hosts:
+            if host.healthy:
+                threading.Thread(target=self.warm_up, args=(host,), name="ollama-warmup", daemon=True).start()
+
+    def touch_session(self):
+        """Mark the app as in use; starts the optional keep-warm ping loop."""
+        self._last_activity = time.time()
+        if OLLAMA_CONFIG['keep_warm'] and self._keep_warm_thread is None:
+            self._keep_warm_thread = threading.Thread(target=self._keep_warm_loop, name="ollama-keep-warm", daemon=True)
+            self._keep_warm_thread.start()
+
+    def _keep_warm_loop(self):
+        """Re-ping the model while sessions are active so Ollama never unloads it mid-session."""
+        while True:
+            time.sleep(OLLAMA_CONFIG['keep_warm_interval_s'])
+            if time.time() - self._last_activity > OLLAMA_CONFIG['session_idle_timeout_s']:
+                continue
+            for host in self.pool.hosts:
+                if host.healthy:
+                    self.warm_up(host)
+
+    def get_timing_summary(self) -> Dict[str, Any]:
+        """Latest warm-up load time and latest inference timings, for display."""
+        warmup = next((e for e in reversed(metrics.recent("ollama_call", 200)) if e["request_class"] == "warmup"), None)
+        call = next((e for e in reversed(metrics.recent("ollama_call", 200)) if e["request_class"] != "warmup"), None)
+        return {
+            "warmup_load_ms": warmup["load_ms"] if warmup else None,
+            "last_load_ms": call["load_ms"] if call else None,
+            "last_inference_ms": call["inference_ms"] if call else None,
+        }
+
+    def get_host_stats(self) -> List[Dict[str, Any]]:
+        """Per-host state, requests in flight and throughput."""
+        return self.pool.stats()
 
 
 class GeminiProvider(AIProvider):
@@ -97,6 +445,7 @@ class GeminiProvider(AIProvider):
         self._name = f"Cloud ({GEMINI_CONFIG['model']})"
         self.model_name = GEMINI_CONFIG['model']
         self._available = False
+        self.limiter = None
         self._setup_api()
     
     def _setup_api(self):
@@ -111,6 +460,10 @@ class GeminiProvider(AIProvider):
             try:
                 genai.configure(api_key=api_key)
                 self.model = genai.GenerativeModel(self.model_name)
+                self._models: "OrderedDict[tuple, genai.GenerativeModel]" = OrderedDict()
+                self._models_lock = threading.Lock()
+                self.limiter = limiter_for(api_key, GEMINI_CONFIG['requests_per_minute'],
+                                           GEMINI_CONFIG['tokens_per_minute'], name="gemini")
                 self._available = True
             except:
                 self._available = False
@@ -125,50 +478,392 @@ class GeminiProvider(AIProvider):
     def is_available(self) -> bool:
         return self._available
 
-    def generate_text(self, prompt: str, system_prompt: str = "") -> str:
-        if not self._available: raise Exception("Gemini API not configured")
-        
-        config = genai.types.GenerationConfig(temperature=0.7)
-        final_prompt = prompt
-        is_gemma = "gemma" in self.model_name.lower()
-        
-        if system_prompt:
-             if is_gemma:
-                 final_prompt = f"{system_prompt}\n\n{prompt}"
-             else:
-                 # Old SDK uses 'system_instruction' in model init or careful handling
-                 # But it's safer to just prepend for old SDK usually?
-                 # Actually google-generativeai >= 0.5.0 supports system_instruction at model level
-                 # But since we init model once, prepending is safer for dynamic system prompts
-                 # UNLESS we re-init model? No too expensive.
-                 # Let's just prepend for EVERYONE with the old SDK to be safe?
-                 # Actually, earlier I prepended it. Let's do that.
-                 final_prompt = f"{system_prompt}\n\n{prompt}"
-
-        response = self.model.generate_content(
-            final_prompt,
-            generation_config=config
+    @staticmethod
+    def _generation_config(profile: Dict[str, Any]) -> "genai.types.GenerationConfig":
+        return genai.types.GenerationConfig(
+            temperature=profile["temperature"],
+            max_output_tokens=profile["max_tokens"],
+            stop_sequences=profile["stop"][:5] or None,  # Gemini accepts at most 5
+        )
+
+    @staticmethod
+    def _is_gemma(model_name: str) -> bool:
+        return "gemma" in model_name.lower()
+
+    def _model_for(self, system_prompt: str, model_name: Optional[str] = None) -> "genai.GenerativeModel":
+        """One GenerativeModel per (model, system prompt), built with system_instruction (LRU-bounded)."""
+        model_name = model_name or self.model_name
+        if self._is_gemma(model_name):
+            # Gemma models on the API reject system_instruction; their prompt is prefixed instead
+            system_prompt = ""
+        if not system_prompt and model_name == self.model_name:
+            return self.model
+        key = (model_name, system_prompt)
+        with self._models_lock:
+            model = self._models.get(key)
+            if model is None:
+                model = genai.GenerativeModel(model_name, system_instruction=system_prompt or None)
+                self._models[key] = model
+                if len(self._models) > GEMINI_CONFIG['model_cache_size']:
+                    self._models.popitem(last=False)
+            else:
+                self._models.move_to_end(key)
+            return model
+
+    async def _agenerate(self, prompt: str, system_prompt: str, config: "genai.types.GenerationConfig", profile: str,
+                         timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        model = model or self.model_name
+        final_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt and self._is_gemma(model) else prompt
+        # Reserve the prompt plus the longest possible answer; corrected from usage_metadata afterwards
+        reserved = estimate_tokens(final_prompt) + (config.max_output_tokens or 0)
+        deadline = time.monotonic() + timeout if timeout else None
+        queued_s, attempt = 0.0, 0
+        while True:
+            queued_s += await self.limiter.acquire(reserved, max_wait=deadline - time.monotonic() if deadline else None)
+            remaining = deadline - time.monotonic() if deadline else None
+            request_options = {"timeout": remaining} if remaining else None
+            try:
+                response = await self._model_for(system_prompt, model).generate_content_async(
+                    final_prompt, generation_config=config, request_options=request_options
+                )
+                break
+            except Exception as e:
+                self.limiter.settle(reserved, 0)  # Rejected calls don't use tokens
+                hint = retry_after(e)
+                if error_code(e) == 429:
+                    # Over quota: hold everyone, not just this caller, until the quota frees up
+                    metrics.increment("gemini_rate_limited")
+                    self.limiter.pause(hint if hint is not None else backoff_delay(
+                        attempt, GEMINI_CONFIG['backoff_base_s'], GEMINI_CONFIG['backoff_max_s']))
+                if not is_retryable(e) or attempt >= GEMINI_CONFIG['max_retries']:
+                    raise
+                delay = backoff_delay(attempt, GEMINI_CONFIG['backoff_base_s'], GEMINI_CONFIG['backoff_max_s'], hint)
+                if deadline and time.monotonic() + delay >= deadline:
+                    raise
+                metrics.increment("gemini_retries")
+                metrics.record("gemini_retry", model=model, attempt=attempt + 1, code=error_code(e),
+                               delay_s=round(delay, 2), hinted=hint is not None)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+        if usage is not None:
+            self.limiter.settle(reserved, prompt_tokens + output_tokens)
+        metrics.record(
+            "gemini_call",
+            model=model,
+            profile=profile,
+            prompt_tokens=prompt_tokens,
+            cached_tokens=getattr(usage, "cached_content_token_count", 0) or 0,
+            output_tokens=output_tokens,
+            queued_ms=round(queued_s * 1000, 1),
+            retries=attempt,
         )
         return response.text
 
-    def generate_json(self, prompt: str, system_prompt: str = "") -> str:
+    def get_quota_stats(self) -> Dict[str, Any]:
+        """Quota queue state and recent waits, for display."""
+        waits = [e["wait_s"] for e in metrics.recent("rate_limit_wait", limit=200) if e["limiter"] == "gemini"]
+        return {
+            "waiting": self.limiter.waiting if self.limiter else 0,
+            "queued_share": sum(w > 0 for w in waits) / len(waits) if waits else 0.0,
+            "avg_wait_s": sum(waits) / len(waits) if waits else 0.0,
+            "max_wait_s": max(waits, default=0.0),
+            "rate_limited": metrics.counter("gemini_rate_limited"),
+            "retries": metrics.counter("gemini_retries"),
+        }
+
+    async def agenerate_text(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
         if not self._available: raise Exception("Gemini API not configured")
         
-        config = genai.types.GenerationConfig(temperature=0.7)
-        final_prompt = prompt
-        is_gemma = "gemma" in self.model_name.lower()
+        config = self._generation_config(get_profile(profile))
+        return await self._agenerate(prompt, system_prompt, config, profile, timeout, model)
 
-        if not is_gemma:
+    async def agenerate_json(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        if not self._available: raise Exception("Gemini API not configured")
+        
+        config = self._generation_config(get_profile(profile))
+        if not self._is_gemma(model or self.model_name):
             config.response_mime_type = 'application/json'
+        else:
+            system_prompt = f"{system_prompt}\n{JSON_INSTRUCTION}".strip()
+
+        return await self._agenerate(prompt, system_prompt, config, profile, timeout, model)
 
-        if system_prompt:
-             final_prompt = f"{system_prompt}\n\n{prompt}"
 
-        response = self.model.generate_content(
-            final_prompt,
-            generation_config=config
+class OpenAICompatProvider(AIProvider):
+    """Local AI Provider for OpenAI-compatible servers (llama.cpp, vLLM, LM Studio...)."""
+
+    def __init__(self):
+        self.base_url = OPENAI_COMPAT_CONFIG['base_url'].rstrip("/")
+        self.model = OPENAI_COMPAT_CONFIG['model']
+        api_key = os.environ.get(OPENAI_COMPAT_CONFIG['api_key_env_var'])
+        self._headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._available = False
+        self._models: Optional[set] = None
+        self._checked_at = 0.0
+        self._schema_rejected = False  # The server answered a json_schema request with a 4xx
+        if OPENAI_COMPAT_CONFIG['enabled']:
+            self._check_availability()
+
+    @property
+    def name(self) -> str:
+        return f"OpenAI-compatible ({self.model})"
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Keep-alive connection pool for the running loop (httpx pools cannot be shared across loops)."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            size = OPENAI_COMPAT_CONFIG['max_connections']
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self._headers,
+                limits=httpx.Limits(max_connections=size, max_keepalive_connections=size,
+                                    keepalive_expiry=OPENAI_COMPAT_CONFIG['keepalive_expiry_s']),
+                timeout=httpx.Timeout(OPENAI_COMPAT_CONFIG['timeouts']['default'],
+                                      connect=OPENAI_COMPAT_CONFIG['connect_timeout_s']),
+            )
+            self._clients[loop] = client
+        return client
+
+    def _set_models(self, payload: Dict[str, Any]):
+        self._models = {m.get("id") for m in payload.get("data", []) if m.get("id")}
+        self._available = True
+        self._checked_at = time.monotonic()
+
+    def _check_availability(self):
+        try:
+            response = httpx.get(f"{self.base_url}/models", headers=self._headers,
+                                 timeout=OPENAI_COMPAT_CONFIG['connect_timeout_s'])
+            response.raise_for_status()
+            self._set_models(response.json())
+        except Exception:
+            self._available = False
+
+    @property
+    def is_available(self) -> bool:
+        if not OPENAI_COMPAT_CONFIG['enabled']:
+            return False
+        if not self._available:
+            self._check_availability()
+        return self._available
+
+    async def ais_available(self) -> bool:
+        if not OPENAI_COMPAT_CONFIG['enabled']:
+            return False
+        if not self._available:
+            try:
+                response = await self.client.get("/models", timeout=OPENAI_COMPAT_CONFIG['connect_timeout_s'])
+                response.raise_for_status()
+                self._set_models(response.json())
+            except Exception:
+                self._available = False
+        return self._available
+
+    async def ainstalled_models(self) -> Optional[set]:
+        return self._models if await self.ais_available() else None
+
+    def _timeout(self, profile: Dict[str, Any], timeout: Optional[float]) -> float:
+        timeouts = OPENAI_COMPAT_CONFIG['timeouts']
+        limit = timeouts.get(profile["request_class"], timeouts['default'])
+        return min(limit, timeout) if timeout else limit
+
+    async def _achat(self, messages: List[Dict[str, str]], profile: Dict[str, Any], timeout: Optional[float] = None,
+                     model: Optional[str] = None, response_format: Optional[Dict[str, Any]] = None) -> str:
+        stream = OPENAI_COMPAT_CONFIG['stream']
+        payload: Dict[str, Any] = {
+            "model": model or self.model,
+            "messages": messages,
+            "max_tokens": profile["max_tokens"],
+            "temperature": profile["temperature"],
+            "stream": stream,
+        }
+        if profile["stop"]:
+            payload["stop"] = profile["stop"]
+        if response_format:
+            payload["response_format"] = response_format
+        if stream:
+            payload["stream_options"] = {"include_usage": True}
+
+        start = time.perf_counter()
+        first_token = None
+        limit = self._timeout(profile, timeout)
+        request_timeout = httpx.Timeout(limit, connect=OPENAI_COMPAT_CONFIG['connect_timeout_s'])
+
+        async def request() -> Dict[str, Any]:
+            nonlocal first_token
+            if not stream:
+                response = await self.client.post("/chat/completions", json=payload, timeout=request_timeout)
+                response.raise_for_status()
+                data = response.json()
+                return {"content": data["choices"][0]["message"].get("content") or "", "usage": data.get("usage")}
+
+            parts, usage = [], None
+            async with self.client.stream("POST", "/chat/completions", json=payload, timeout=request_timeout) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        continue  # Drain to the end of the body so the connection goes back to the pool
+                    chunk = json.loads(data)
+                    usage = chunk.get("usage") or usage
+                    for choice in chunk.get("choices") or []:
+                        piece = (choice.get("delta") or {}).get("content")
+                        if piece:
+                            if first_token is None:
+                                first_token = time.perf_counter()
+                            parts.append(piece)
+            return {"content": "".join(parts), "usage": usage}
+
+        # httpx timeouts apply per read; the deadline bounds the whole (possibly streamed) answer
+        result = await asyncio.wait_for(request(), limit)
+        usage = result["usage"] or {}
+        metrics.record(
+            "openai_compat_call",
+            model=payload["model"],
+            profile=profile["name"],
+            streamed=stream,
+            ttft_ms=round((first_token - start) * 1000, 1) if first_token else None,
+            total_ms=round((time.perf_counter() - start) * 1000, 1),
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            output_tokens=usage.get("completion_tokens", 0),
+        )
+        return result["content"]
+
+    async def agenerate_text(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        messages.append({"role": "user", "content": prompt})
+        return await self._achat(messages, get_profile(profile), timeout, model)
+
+    async def agenerate_json(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        messages = [{"role": "system", "content": f"{system_prompt}\n{JSON_INSTRUCTION}".strip()},
+                    {"role": "user", "content": prompt}]
+        settings = get_profile(profile)
+        schema = RESPONSE_SCHEMAS.get(settings["name"])
+        if OPENAI_COMPAT_CONFIG['json_schema'] and schema and not self._schema_rejected:
+            response_format = {"type": "json_schema",
+                               "json_schema": {"name": settings["name"], "schema": schema, "strict": True}}
+            try:
+                return await self._achat(messages, settings, timeout, model, response_format)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in (400, 422):
+                    raise
+                # Server without structured-output support: use json_object from now on
+                self._schema_rejected = True
+                metrics.increment("openai_compat_schema_fallbacks")
+        return await self._achat(messages, settings, timeout, model, {"type": "json_object"})
+
+
+class RecordReplayProvider(AIProvider):
+    """Records another provider's responses as fixture files, or serves them back offline.
+
+    RECORD wraps a live provider and saves each successful response, with its latency, under a
+    hash of the request. REPLAY needs no model at all: it returns the fixture for the same request
+    after the recorded (or a fixed) latency, so benchmarks and load tests are reproducible.
+    """
+
+    def __init__(self, mode: str, inner: Optional[AIProvider] = None, fixtures_dir: Optional[Path] = None):
+        if mode not in ("RECORD", "REPLAY"):
+            raise ValueError(f"Unknown record/replay mode: {mode}")
+        if mode == "RECORD" and inner is None:
+            raise ValueError("RECORD mode needs a provider to record")
+        self.mode = mode
+        self.inner = inner
+        self.fixtures_dir = Path(fixtures_dir or RECORD_REPLAY_CONFIG['fixtures_dir'])
+        self._fixtures: Dict[str, Dict[str, Any]] = {}
+        self.misses = 0
+
+    @property
+    def name(self) -> str:
+        if self.mode == "RECORD":
+            return f"Record ({self.inner.name})"
+        return f"Replay ({self.fixtures_dir.name})"
+
+    @property
+    def is_available(self) -> bool:
+        return self.inner.is_available if self.mode == "RECORD" else True
+
+    async def ais_available(self) -> bool:
+        return await self.inner.ais_available() if self.mode == "RECORD" else True
+
+    @staticmethod
+    def request_key(kind: str, *parts: Any) -> str:
+        """Stable hash of a request (provider-independent, so either live provider can record it)."""
+        payload = json.dumps([kind, *parts], ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        if key not in self._fixtures:
+            try:
+                with open(self.fixtures_dir / f"{key}.json", encoding="utf-8") as f:
+                    self._fixtures[key] = json.load(f)
+            except (OSError, ValueError):
+                return None
+        return self._fixtures[key]
+
+    def _save(self, key: str, fixture: Dict[str, Any]):
+        self._fixtures[key] = fixture
+        self.fixtures_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.fixtures_dir / f"{key}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=1)
+        tmp.replace(self.fixtures_dir / f"{key}.json")
+
+    def _replay_latency(self, fixture: Dict[str, Any]) -> float:
+        fixed = RECORD_REPLAY_CONFIG['replay_latency_s']
+        latency = fixture.get("latency_s", 0.0) if fixed is None else fixed
+        return latency * RECORD_REPLAY_CONFIG['latency_scale']
+
+    async def aroundtrip(self, kind: str, parts: List[Any], call: Callable[[], Awaitable[Any]]) -> Any:
+        """Record `call()`'s result under (kind, parts), or replay it."""
+        key = self.request_key(kind, *parts)
+        if self.mode == "REPLAY":
+            fixture = self._load(key)
+            if fixture is None:
+                self.misses += 1
+                metrics.increment("replay_misses")
+                raise Exception(f"No recorded fixture for {kind} request {key}")
+            await asyncio.sleep(self._replay_latency(fixture))
+            return fixture["response"]
+
+        start = time.perf_counter()
+        response = await call()
+        self._save(key, {
+            "kind": kind,
+            "request": parts,
+            "response": response,
+            "latency_s": round(time.perf_counter() - start, 4),
+            "provider": self.inner.name,
+            "recorded_at": time.time(),
+        })
+        return response
+
+    async def agenerate_text(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        return await self.aroundtrip(
+            "text", [prompt, system_prompt, profile] + ([model] if model else []),
+            lambda: self.inner.agenerate_text(prompt, system_prompt, profile, timeout, model)
+        )
+
+    async def agenerate_json(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        return await self.aroundtrip(
+            "json", [prompt, system_prompt, profile] + ([model] if model else []),
+            lambda: self.inner.agenerate_json(prompt, system_prompt, profile, timeout, model)
         )
-        return response.text
 
 
 class HybridHandler:
@@ -177,7 +872,41 @@ class HybridHandler:
     def __init__(self):
         self.ollama = OllamaProvider()
         self.gemini = GeminiProvider()
+        self.openai_compat = OpenAICompatProvider() if OPENAI_COMPAT_CONFIG['enabled'] else None
         self.search = DDGS() if SEARCH_ENABLED else None
+        self.web = WebSearcher(self.search.text) if self.search else None
+        self.local_index = None
+        if LOCAL_SEARCH_CONFIG['enabled']:
+            try:
+                self.local_index = load_or_build_index()
+            except Exception:
+                self.local_index = None
+        self.tutor_cache = SemanticCache(
+            max_entries=SEMANTIC_CACHE_CONFIG['max_entries'],
+            threshold=SEMANTIC_CACHE_CONFIG['similarity_threshold'],
+            path=SEMANTIC_CACHE_CONFIG['path']
+        ) if SEMANTIC_CACHE_CONFIG['enabled'] else None
+        if self.tutor_cache is not None:
+            atexit.register(self.tutor_cache.save)
+
+        self.router = ModelRouter(
+            MODEL_ROUTES,
+            alpha=MODEL_ROUTER_CONFIG['ema_alpha'],
+            validity_floor=MODEL_ROUTER_CONFIG['json_validity_floor'],
+            min_samples=MODEL_ROUTER_CONFIG['min_samples'],
+            explore_rate=MODEL_ROUTER_CONFIG['explore_rate'],
+            path=MODEL_ROUTER_CONFIG['path']
+        ) if MODEL_ROUTER_CONFIG['enabled'] else None
+        if self.router is not None:
+            atexit.register(self.router.save)
+
+        # RECORD wraps every live provider (keeping Local -> Cloud failover); REPLAY needs none
+        self.recorders: List[RecordReplayProvider] = []
+        if AI_PROVIDER == "RECORD":
+            live = [p for p in (self.ollama, self.openai_compat, self.gemini) if p is not None]
+            self.recorders = [RecordReplayProvider("RECORD", p) for p in live]
+        elif AI_PROVIDER == "REPLAY":
+            self.recorders = [RecordReplayProvider("REPLAY")]
         
     def _get_active_provider(self) -> AIProvider:
         """Determines best available provider based on config."""
@@ -192,9 +921,20 @@ class HybridHandler:
             if self.gemini.is_available: return self.gemini
             raise Exception("Gemini API key missing but AI_PROVIDER is set to CLOUD.")
 
-        # 3. AUTO (Default)
+        # 3. Force OpenAI-compatible server
+        if AI_PROVIDER == "OPENAI_COMPAT":
+            if self.openai_compat and self.openai_compat.is_available: return self.openai_compat
+            raise Exception("OpenAI-compatible server is not reachable (or disabled) but AI_PROVIDER is set to OPENAI_COMPAT.")
+
+        # 4. Record / Replay
+        if self.recorders:
+            return next((r for r in self.recorders if r.is_available), None)
+
+        # 5. AUTO (Default)
         if self.ollama.is_available:
             return self.ollama
+        elif self.openai_compat and self.openai_compat.is_available:
+            return self.openai_compat
         elif self.gemini.is_available:
             return self.gemini
         else:
@@ -206,24 +946,92 @@ class HybridHandler:
             return f"🟢 Connected: {provider.name}"
         return "🔴 No AI Connected (Start Ollama or set API Key)"
 
+    def _run(self, coro) -> Any:
+        """Run a coroutine for a sync caller, under a deadline and the caller's session lifetime."""
+        scope = CallScope(OLLAMA_CONFIG['timeout'], streamlit_session_check())
+        return run_sync(coro, scope=scope)
+
     def fetch_content(self, query: str, max_results: int = 3) -> str:
-        """Search the internet for context."""
-        if not SEARCH_ENABLED or not self.search:
-            return ""
+        """Search bundled TEF material first, then the internet if local confidence is low."""
+        return self._run(self.afetch_content(query, max_results))
+
+    async def afetch_content(self, query: str, max_results: int = 3, allow_web: bool = True) -> str:
+        """Async fetch_content: web hits come from the parallel WebSearcher stage."""
+        local_results = []
+        if self.local_index:
+            local_results = self.local_index.search(query, k=LOCAL_SEARCH_CONFIG['max_results'])
+            if self.local_index.is_confident(local_results):
+                return format_results(local_results)
+
+        if not allow_web or not SEARCH_ENABLED or not self.web:
+            return format_results(local_results)
         
+        start = time.perf_counter()
         try:
-            results = self.search.text(query, max_results=max_results)
+            if self.recorders:
+                # Web results change over time; record them too so replayed prompts hash the same
+                results = await self.recorders[0].aroundtrip(
+                    "search", [query, max_results], lambda: self.web.asearch(query, max_results)
+                )
+            else:
+                results = await self.web.asearch(query, max_results)
+            metrics.record("web_search", latency_ms=round((time.perf_counter() - start) * 1000, 1))
             context = ""
             for r in results:
                 context += f"- Title: {r['title']}\n  URL: {r['href']}\n  Summary: {r['body']}\n\n"
             return context
         except Exception as e:
+            # Weak local hits beat no context at all
+            if local_results:
+                return format_results(local_results)
             return f"Error fetching content: {str(e)}"
 
-    def _get_response_hybrid(self, prompt: str, system_prompt: str = "", json_mode: bool = False, use_search: bool = False) -> str:
-        """Central generation logic with fallback and optional search."""
-        
-        # 1. Determine priority order
+    async def agated_context(self, text: str, background: str = "") -> str:
+        """External context for a request, as much as the search gate says it needs ("" for small talk).
+
+        Language questions only use the bundled material; the web is searched with a compact keyword
+        query, and only for requests that need fresh facts. `background` (e.g. a conversation summary)
+        only adds topic words to that query; whether to search is decided on `text` alone.
+        """
+        if not SEARCH_GATE_CONFIG['enabled']:
+            return await self.afetch_content(text[:100])
+
+        decision = classify_search(text)
+        metrics.increment("search_gate_requests")
+        metrics.increment(f"search_gate_{decision.level}")
+        if decision.level != "web":
+            metrics.increment("web_search_skipped")
+            metrics.increment("web_search_avoided_ms_est", self._typical_search_ms())
+        if decision.level == "none":
+            return ""
+        query = build_query(f"{text}\n{background}") if background else decision.query
+        return await self.afetch_content(query, allow_web=decision.level == "web")
+
+    def _typical_search_ms(self) -> float:
+        """Median latency of recent web searches (a configured guess until we have some)."""
+        latencies = sorted(e["latency_ms"] for e in metrics.recent("web_search", limit=50))
+        if not latencies:
+            return SEARCH_GATE_CONFIG['assumed_search_ms']
+        return latencies[len(latencies) // 2]
+
+    def get_search_stats(self) -> Dict[str, Any]:
+        """How often the search gate avoided a web search, and the latency that saved."""
+        requests = metrics.counter("search_gate_requests")
+        skipped = metrics.counter("web_search_skipped")
+        return {
+            "requests": int(requests),
+            "skipped": int(skipped),
+            "skip_rate": skipped / requests if requests else 0.0,
+            "avoided_ms_est": metrics.counter("web_search_avoided_ms_est"),
+            "by_level": {level: int(metrics.counter(f"search_gate_{level}")) for level in ("none", "local", "web")},
+        }
+
+    def _get_response_hybrid(self, prompt: str, system_prompt: str = "", json_mode: bool = False, use_search: bool = False,
+                             profile: str = DEFAULT_GENERATION_PROFILE, search_query: Optional[str] = None) -> str:
+        return self._run(self._aget_response_hybrid(prompt, system_prompt, json_mode, use_search, profile, search_query))
+
+    async def _aprovider_order(self) -> List[AIProvider]:
+        """Providers to try, in priority order."""
         providers = []
         
         # Check active preference
@@ -231,61 +1039,126 @@ class HybridHandler:
             providers.append(self.ollama)
         elif AI_PROVIDER == "CLOUD":
             providers.append(self.gemini)
+        elif AI_PROVIDER == "OPENAI_COMPAT":
+            if self.openai_compat:
+                providers.append(self.openai_compat)
+        elif self.recorders:
+            providers.extend(self.recorders)
         else: # AUTO
-            # Priority: Local -> Cloud
-            # We add BOTH if auto, regardless of current availability, to allow failover
-            # But we prioritize Ollama if it LOOKS available
-            if self.ollama.is_available:
+            # Priority: Local (Ollama -> OpenAI-compatible) -> Cloud
+            # Cloud is always added, regardless of current availability, to allow failover
+            # But local servers only if they LOOK available
+            if await self.ollama.ais_available():
                 providers.append(self.ollama)
-                providers.append(self.gemini)
-            else:
-                providers.append(self.gemini)
-                # Optionally add Ollama as backup-backup? No, if it's dead it's dead.
+            if self.openai_compat and await self.openai_compat.ais_available():
+                providers.append(self.openai_compat)
+            providers.append(self.gemini)
 
         if not providers:
             # Fallback if nothing configured
             providers = [self.gemini]
+        return providers
+
+    @property
+    def _route_providers(self) -> Dict[str, Optional[AIProvider]]:
+        return {"ollama": self.ollama, "openai": self.openai_compat, "gemini": self.gemini}
+
+    def _route_provider(self, route: str) -> Optional[AIProvider]:
+        return self._route_providers.get(split_route(route)[0])
+
+    async def _aroute_attempts(self, providers: List[AIProvider], task: str) -> List[Tuple[AIProvider, Optional[str]]]:
+        """(provider, model) pairs to try for `task`: the router's ranking of the routes the allowed
+        providers can serve, then any allowed provider left without a route (on its default model)."""
+        if self.router is None or self.recorders:
+            return [(provider, None) for provider in providers]
+
+        installed = {}
+        for provider in providers:
+            if await provider.ais_available():
+                installed[provider] = await provider.ainstalled_models()
+
+        def usable(route: str) -> bool:
+            provider = self._route_provider(route)
+            if provider not in installed:
+                return False
+            models = installed[provider]
+            return models is None or split_route(route)[1] in models
+
+        tuned = self.ollama.preferred_model(task)
+        prefer = f"ollama:{tuned}" if tuned else None
+        attempts = [(self._route_provider(r), split_route(r)[1]) for r in self.router.rank(task, usable, prefer)]
+        attempts += [(p, None) for p in providers if all(p is not routed for routed, _ in attempts)]
+        return attempts
+
+    def _observe_route(self, provider: AIProvider, model: Optional[str], task: str, elapsed_s: float, valid: bool):
+        """Feed a routed call's latency and outcome back to the router."""
+        if self.router is None or model is None:
+            return
+        name = next((n for n, p in self._route_providers.items() if p is provider), None)
+        if name is None:
+            return
+        self.router.observe(f"{name}:{model}", task, elapsed_s, valid)
+        self.router.maybe_save(MODEL_ROUTER_CONFIG['save_interval_s'])
+
+    async def _aget_response_hybrid(self, prompt: str, system_prompt: str = "", json_mode: bool = False,
+                                    use_search: bool = False, profile: str = DEFAULT_GENERATION_PROFILE,
+                                    search_query: Optional[str] = None, search_context: Optional[str] = None) -> str:
+        """Central generation logic with fallback and optional search.
+
+        Prompts are laid out stable-first (system prompt, fixed instructions, then variable content,
+        then search context) so providers can reuse the processed prefix across calls.
+        `search_context` lets callers pass context they already fetched concurrently.
+        """
+        settings = get_profile(profile)
+
+        # 1. Determine priority order (providers allowed by AI_PROVIDER, models ranked by the router)
+        providers = await self._aprovider_order()
+        attempts = await self._aroute_attempts(providers, settings["name"])
 
         # Enhance prompt with search if requested
         final_prompt = prompt
-        if use_search and SEARCH_ENABLED and self.search:
+        if use_search:
             try:
-                # Heuristic: Extract search query from prompt or just use prompt
-                context = self.fetch_content(prompt[:100]) # simple heuristic
+                # The search gate decides whether (and what) to search, from the query or the prompt
+                context = search_context
+                if context is None:
+                    context = await self.agated_context(search_query or prompt)
                 if context:
-                    final_prompt = f"Context from Internet:\n{context}\n\nUser Question:\n{prompt}"
-            except:
+                    context = self._fit_context(context, prompt, system_prompt, settings)
+                    final_prompt = f"{prompt}\n\nReference context (use it if relevant):\n{context}"
+            except Exception:
                 pass # Search failure shouldn't block AI
 
-        # 2. Try providers in order
+        # 2. Try providers in order (or race them, if hedging is enabled) within the caller's deadline.
+        # If the caller goes away (Streamlit rerun / disconnect) the in-flight generation is cancelled.
+        scope = current_scope() or CallScope(OLLAMA_CONFIG['timeout'])
+        try:
+            if AI_PROVIDER == "AUTO" and AI_HEDGE_DELAY_S is not None and len(attempts) > 1:
+                attempt = self._arace_providers(attempts, final_prompt, system_prompt, json_mode, settings, scope)
+            else:
+                attempt = self._afailover(attempts, final_prompt, system_prompt, json_mode, settings, scope)
+            return await guarded(attempt, scope)
+        except ScopeAbandoned:
+            metrics.increment("ai_abandoned_calls")
+            return "Error: Request cancelled because the page moved on."
+        except asyncio.TimeoutError:
+            metrics.increment("ai_deadline_exceeded")
+            return "Error: AI request exceeded its deadline."
+
+    async def _afailover(self, attempts: List[Tuple[AIProvider, Optional[str]]], final_prompt: str, system_prompt: str,
+                         json_mode: bool, settings: Dict[str, Any], scope: CallScope) -> str:
+        """Sequential failover: each (provider, model) attempt gets whatever is left of the deadline."""
+        skip_unavailable = len(attempts) > 1
         last_error = None
         
-        for provider in providers:
+        for provider, model in attempts:
+            if scope.remaining() == 0:
+                break
             try:
-                # Skip if we know it's unavailable (unless it's the only one)
-                if not provider.is_available and len(providers) > 1:
-                    continue
-                    
-                if json_mode:
-                    result = provider.generate_json(final_prompt, system_prompt)
-                    # CRITICAL: Validate JSON immediately. 
-                    # If Local AI returns garbage, we MUST fail here to trigger failover to Cloud.
-                    try:
-                        cleaned = result.replace('```json', '').replace('```', '').strip()
-                        # specific fix for common issues
-                        if not cleaned: raise ValueError("Empty response")
-                        json.loads(cleaned)
-                        # passed validation, use original result (or cleaned?) 
-                        # Return cleaned to save next step overhead
-                        result = cleaned 
-                    except Exception as json_err:
-                        raise ValueError(f"Provider returned invalid JSON: {str(json_err)}")
-                else:
-                    result = provider.generate_text(final_prompt, system_prompt)
-                    
-                # If we got here, success!
-                return result
-                
+                return await self._atry_provider(provider, final_prompt, system_prompt, json_mode, settings,
+                                                 skip_unavailable, timeout=scope.remaining(), model=model)
+            except ProviderUnavailable:
+                continue
             except Exception as e:
                 last_error = e
                 # Failover to next provider
@@ -294,37 +1167,185 @@ class HybridHandler:
         # If all failed
         return f"Error: All AI providers failed. Last error: {str(last_error)}"
 
+    async def _atry_provider(self, provider: AIProvider, final_prompt: str, system_prompt: str, json_mode: bool,
+                             settings: Dict[str, Any], skip_unavailable: bool = True,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        """One provider attempt: generate, validate JSON if needed, record metrics. Raises on failure."""
+        # Skip if we know it's unavailable (unless it's the only one)
+        if skip_unavailable and not await provider.ais_available():
+            raise ProviderUnavailable(provider.name)
+
+        start = time.perf_counter()
+        try:
+            if json_mode:
+                result = await provider.agenerate_json(final_prompt, system_prompt, profile=settings["name"],
+                                                       timeout=timeout, model=model)
+                # CRITICAL: Validate JSON immediately. 
+                # If Local AI returns garbage, we MUST fail here to trigger failover to Cloud.
+                try:
+                    cleaned = result.replace('```json', '').replace('```', '').strip()
+                    # specific fix for common issues
+                    if not cleaned: raise ValueError("Empty response")
+                    json.loads(cleaned)
+                    # passed validation, use original result (or cleaned?) 
+                    # Return cleaned to save next step overhead
+                    result = cleaned 
+                except Exception as json_err:
+                    raise ValueError(f"Provider returned invalid JSON: {str(json_err)}")
+            else:
+                result = await provider.agenerate_text(final_prompt, system_prompt, profile=settings["name"],
+                                                       timeout=timeout, model=model)
+        except asyncio.CancelledError:
+            self._record_call(provider, settings, json_mode, final_prompt, system_prompt, start, ok=False,
+                              error="cancelled", model=model)
+            raise
+        except Exception as e:
+            self._record_call(provider, settings, json_mode, final_prompt, system_prompt, start, ok=False,
+                              error=str(e), model=model)
+            self._observe_route(provider, model, settings["name"], time.perf_counter() - start, valid=False)
+            raise
+
+        # If we got here, success!
+        self._record_call(provider, settings, json_mode, final_prompt, system_prompt, start, ok=True, model=model)
+        self._observe_route(provider, model, settings["name"], time.perf_counter() - start, valid=True)
+        return result
+
+    async def _arace_providers(self, attempts: List[Tuple[AIProvider, Optional[str]]], final_prompt: str,
+                               system_prompt: str, json_mode: bool, settings: Dict[str, Any], scope: CallScope) -> str:
+        """Hedged failover: start the next attempt if the current one is slow or fails; first success wins."""
+        pending = set()
+        last_error = None
+        queue = list(attempts)
+
+        while queue or pending:
+            if queue:
+                provider, model = queue.pop(0)
+                pending.add(asyncio.ensure_future(
+                    self._atry_provider(provider, final_prompt, system_prompt, json_mode, settings,
+                                        timeout=scope.remaining(), model=model)
+                ))
+            done, pending = await asyncio.wait(
+                pending, timeout=AI_HEDGE_DELAY_S if queue else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                error = task.exception()
+                if error is None:
+                    for other in pending:
+                        other.cancel()
+                    metrics.increment("hedged_calls")
+                    return task.result()
+                if not isinstance(error, ProviderUnavailable):
+                    last_error = error
+
+        return f"Error: All AI providers failed. Last error: {str(last_error)}"
+
+    def _fit_context(self, context: str, prompt: str, system_prompt: str, settings: Dict[str, Any]) -> str:
+        """Trim search context so prompt + context + output fit in the profile's context window."""
+        budget = settings["num_ctx"] - settings["max_tokens"] - estimate_tokens(prompt) - estimate_tokens(system_prompt) - 32
+        if budget <= 0:
+            return ""
+        return context if estimate_tokens(context) <= budget else context[:budget * 4]
+
+    def _record_call(self, provider: AIProvider, settings: Dict[str, Any], json_mode: bool, prompt: str,
+                     system_prompt: str, start: float, ok: bool, error: Optional[str] = None,
+                     model: Optional[str] = None):
+        """Per-call metrics: provider, model (None = provider default), profile limits, prompt size, latency and outcome."""
+        elapsed_s = time.perf_counter() - start
+        prompt_tokens = estimate_tokens(prompt) + estimate_tokens(system_prompt)
+        usage = _call_usage.get()
+        if usage is not None:
+            usage["calls"] += 1
+            usage["prompt_tokens_est"] += prompt_tokens
+        if error == "cancelled":
+            self._record_wasted(provider, settings, elapsed_s)
+        metrics.record(
+            "ai_call",
+            provider=provider.name,
+            model=model,
+            profile=settings["name"],
+            max_tokens=settings["max_tokens"],
+            num_ctx=settings["num_ctx"],
+            temperature=settings["temperature"],
+            json_mode=json_mode,
+            prompt_tokens_est=prompt_tokens,
+            latency_ms=round(elapsed_s * 1000, 1),
+            ok=ok,
+            error=error,
+        )
+
+    def _record_wasted(self, provider: AIProvider, settings: Dict[str, Any], elapsed_s: float):
+        """Account for a cancelled generation.
+
+        `ai_wasted_generation_s` is time the provider spent on an answer nobody read;
+        `ai_recovered_generation_s_est` estimates the time freed by cancelling it instead of letting
+        it finish (typical latency of recent successful calls with the same provider and profile).
+        """
+        metrics.increment("ai_cancelled_calls")
+        metrics.increment("ai_wasted_generation_s", elapsed_s)
+        latencies = sorted(
+            e["latency_ms"] for e in metrics.recent("ai_call", limit=200)
+            if e["ok"] and e["provider"] == provider.name and e["profile"] == settings["name"]
+        )
+        if latencies:
+            typical_s = latencies[len(latencies) // 2] / 1000
+            metrics.increment("ai_recovered_generation_s_est", max(0.0, typical_s - elapsed_s))
+
     # ==================== Public Methods ====================
+    # Every public method has an async twin (a-prefixed); the sync versions are thin wrappers
+    # so existing callers in modules/ keep working.
 
     def generate_grammar_explanation(self, topic: str) -> str:
-        prompt = f"""Explain the French grammar topic: {topic}
+        return self._run(self.agenerate_grammar_explanation(topic))
+
+    async def agenerate_grammar_explanation(self, topic: str) -> str:
+        prompt = f"""Explain the French grammar topic below.
         Include:
         1. Brief definition
         2. When to use it
         3. 2-3 concrete examples
-        Keep it practical and exam-focused."""
+        Keep it practical and exam-focused.
+
+        Topic: {topic}"""
         
         # Enhanced System Prompt to be aware of provider capabilities if needed
         system = "You are a French grammar expert preparing students for the TEF exam."
         
-        return self._get_response_hybrid(prompt, system, use_search=True) # Search can help with obscure topics
+        return await self._aget_response_hybrid(prompt, system, use_search=True, profile="explanation",
+                                                search_query=f"French grammar {topic}") # Search can help with obscure topics
 
     def generate_fill_in_blank_questions(self, topic: str, count: int = 5) -> List[Dict[str, Any]]:
+        return self._run(self.agenerate_fill_in_blank_questions(topic, count))
+
+    async def agenerate_fill_in_blank_questions(self, topic: str, count: int = 5) -> List[Dict[str, Any]]:
+        # Mechanical conjugation topics are built locally, no model call
+        drill = generate_drill(topic, count)
+        if drill:
+            metrics.increment("local_drills")
+            return drill
+
         system = "You are creating TEF-style grammar exercises. Return ONLY a valid JSON array."
-        prompt = f"""Create {count} fill-in-the-blank questions for: {topic}.
-        Format as JSON array: [{{"question": "...", "answer": "...", "explanation": "..."}}]"""
+        prompt = f"""Create fill-in-the-blank questions.
+        Format as JSON array: [{{"question": "...", "answer": "...", "explanation": "..."}}]
+
+        Number of questions: {count}
+        Topic: {topic}"""
         
-        response = self._get_response_hybrid(prompt, system, json_mode=True)
+        response = await self._aget_response_hybrid(prompt, system, json_mode=True, profile="questions")
         try:
             cleaned = response.replace('```json', '').replace('```', '')
             return json.loads(cleaned)[:count]
         except:
             return []
 
-    def grade_fill_in_blank(self, user_answer: str, correct_answer: str) -> Dict[str, Any]:
+    def grade_fill_in_blank(self, user_answer: str, correct_answer: str, exact: bool = False) -> Dict[str, Any]:
         # Simple local logic first
         u, c = user_answer.strip().lower(), correct_answer.strip().lower()
         if u == c: return {"correct": True, "user_answer": user_answer, "correct_answer": correct_answer}
+
+        # Conjugation drills: an ending is the whole point, so no fuzzy matching
+        if exact:
+            correct = normalize_answer(user_answer) == normalize_answer(correct_answer)
+            return {"correct": correct, "user_answer": user_answer, "correct_answer": correct_answer}
         
         # Fuzzy match logic (could use Levenshtein here to save AI calls, but keeping it simple)
         # Using a simple set similarity for now to avoid dependency import issues if not present
@@ -339,36 +1360,145 @@ class HybridHandler:
         return len(set1 & set2) / len(set1 | set2)
 
     def generate_reading_article(self, topic: str, difficulty: str = "B1") -> str:
-        system = f"Write clear, natural French at {difficulty} level."
-        prompt = f"Write a 200-word article in French about: {topic}."
+        return self._run(self.agenerate_reading_article(topic, difficulty))
+
+    async def agenerate_reading_article(self, topic: str, difficulty: str = "B1") -> str:
+        system = "You write clear, natural French articles for TEF reading practice."
+        prompt = f"Write a 200-word article in French.\nCEFR level: {difficulty}\nTopic: {topic}"
         # Use search to get real facts about the topic!
-        return self._get_response_hybrid(prompt, system, use_search=True)
+        return await self._aget_response_hybrid(prompt, system, use_search=True, profile="article", search_query=topic)
 
     def generate_reading_questions(self, article: str, count: int = 5) -> List[Dict[str, Any]]:
+        return self._run(self.agenerate_reading_questions(article, count))
+
+    async def agenerate_reading_questions(self, article: str, count: int = 5) -> List[Dict[str, Any]]:
         system = "Return ONLY a valid JSON array."
-        prompt = f"""Create {count} MCQ questions based on: \n{article}\n
-        Format: [{{"question": "...", "options": ["A)..."], "correct_index": 0, "explanation": "..."}}]"""
+        prompt = f"""Create MCQ comprehension questions based on the article below.
+        Format: [{{"question": "...", "options": ["A)..."], "correct_index": 0, "explanation": "..."}}]
+
+        Number of questions: {count}
+        Article:
+        {article}"""
         
-        response = self._get_response_hybrid(prompt, system, json_mode=True)
+        response = await self._aget_response_hybrid(prompt, system, json_mode=True, profile="questions")
         try:
             cleaned = response.replace('```json', '').replace('```', '')
             return json.loads(cleaned)[:count]
         except:
             return []
 
+    def generate_reading_bundle(self, topic: str, difficulty: str = "B1", count: int = 5,
+                                mode: Optional[str] = None) -> Dict[str, Any]:
+        """Reading Lounge article plus its MCQs: {"article", "questions", "mode", "latency_ms", "prompt_tokens_est"}."""
+        return self._run(self.agenerate_reading_bundle(topic, difficulty, count, mode))
+
+    async def agenerate_reading_bundle(self, topic: str, difficulty: str = "B1", count: int = 5,
+                                       mode: Optional[str] = None) -> Dict[str, Any]:
+        # "bundle" saves a round trip and never sends the article back as prompt;
+        # if the combined response does not validate we fall back to the two-step path.
+        mode = mode or READING_LOUNGE_MODE
+        usage = {"calls": 0, "prompt_tokens_est": 0}
+        token = _call_usage.set(usage)
+        start = time.perf_counter()
+        try:
+            bundle = await self._areading_bundle_single(topic, difficulty, count) if mode == "bundle" else None
+            used = "bundle" if bundle else ("bundle_fallback" if mode == "bundle" else "two_step")
+            if bundle is None:
+                article = await self.agenerate_reading_article(topic, difficulty)
+                questions = await self.agenerate_reading_questions(article, count)
+                bundle = {"article": article, "questions": questions}
+        finally:
+            _call_usage.reset(token)
+
+        bundle.update(
+            mode=used,
+            latency_ms=round((time.perf_counter() - start) * 1000, 1),
+            prompt_tokens_est=usage["prompt_tokens_est"],
+            calls=usage["calls"],
+        )
+        metrics.record("reading_lounge", mode=used, latency_ms=bundle["latency_ms"],
+                       prompt_tokens_est=usage["prompt_tokens_est"], calls=usage["calls"],
+                       questions=len(bundle["questions"]))
+        return bundle
+
+    async def _areading_bundle_single(self, topic: str, difficulty: str, count: int) -> Optional[Dict[str, Any]]:
+        system = "You write clear, natural French articles for TEF reading practice, with comprehension questions. Return ONLY JSON."
+        prompt = f"""Write a 200-word article in French, then MCQ comprehension questions about it.
+        Every question must be answerable from the article; copy the supporting sentence into "evidence".
+        Format: {{"article": "...", "questions": [{{"question": "...", "options": ["A)..."], "correct_index": 0, "explanation": "...", "evidence": "exact quote from the article"}}]}}
+
+        Number of questions: {count}
+        CEFR level: {difficulty}
+        Topic: {topic}"""
+
+        response = await self._aget_response_hybrid(prompt, system, json_mode=True, use_search=True,
+                                                     profile="reading_bundle", search_query=topic)
+        try:
+            data = json.loads(response.replace('```json', '').replace('```', ''))
+        except Exception:
+            return None
+        return validate_reading_bundle(data, count)
+
     def grade_essay(self, essay: str, task_type: str) -> Dict[str, Any]:
+        """Grade an essay criterion by criterion, in parallel, on top of a local pre-analysis."""
+        return self._run(self.agrade_essay(essay, task_type))
+
+    async def agrade_essay(self, essay: str, task_type: str) -> Dict[str, Any]:
+        analysis = analyze_essay(essay)
+        stats = format_analysis(analysis)
+
+        scores = await asyncio.gather(*(
+            self._agrade_criterion(criterion, essay, task_type, stats) for criterion in GRADING_CRITERIA
+        ))
+        results = dict(zip(GRADING_CRITERIA, scores))
+
+        return self._assemble_grading(results, analysis)
+
+    async def _agrade_criterion(self, criterion: str, essay: str, task_type: str, stats: str) -> Dict[str, Any]:
+        """Grade a single rubric criterion. Failures are isolated to this criterion."""
+        spec = GRADING_CRITERIA[criterion]
         system = "You are a TEF examiner. Return ONLY JSON."
-        prompt = f"Grade this essay for '{task_type}'. Return JSON with structure_score, vocabulary_score, grammar_score, total_score, feedbacks, suggestions."
-        
-        response = self._get_response_hybrid(prompt, system, json_mode=True)
+        prompt = f"""Grade ONLY the {criterion} of the TEF essay below on a 0-{spec['max']} scale.
+        Focus: {spec['focus']}
+        Trust the pre-computed statistics, do not recount.
+        Return JSON: {{"score": 0, "feedback": "2-3 sentences", "suggestions": ["max 2 short items"]}}
+
+        Task type: {task_type}
+        Statistics:
+        {stats}
+
+        Essay:
+        {essay}"""
+
+        response = await self._aget_response_hybrid(prompt, system, json_mode=True, profile="grading")
         try:
-            cleaned = response.replace('```json', '').replace('```', '')
-            return json.loads(cleaned)
-        except:
-            return {"total_score": 0, "structure_score":0, "vocabulary_score":0, "grammar_score":0, "structure_feedback": "Error", "suggestions": ["AI Error"]}
+            data = json.loads(response.replace('```json', '').replace('```', ''))
+            score = max(0, min(spec['max'], int(float(data.get("score", 0)))))
+            suggestions = data.get("suggestions", [])
+            if isinstance(suggestions, str):
+                suggestions = [suggestions]
+            return {"score": score, "feedback": str(data.get("feedback", "")), "suggestions": list(suggestions)[:2], "ok": True}
+        except Exception:
+            return {"score": 0, "feedback": f"Could not grade {criterion} (AI Error).", "suggestions": [], "ok": False}
+
+    def _assemble_grading(self, results: Dict[str, Dict[str, Any]], analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Combine per-criterion results into the grading dict the Writing Clinic expects."""
+        grading: Dict[str, Any] = {"suggestions": [], "analysis": analysis}
+        for criterion, result in results.items():
+            grading[f"{criterion}_score"] = result["score"]
+            grading[f"{criterion}_feedback"] = result["feedback"]
+            grading["suggestions"].extend(result["suggestions"])
+        grading["total_score"] = sum(results[c]["score"] for c in GRADING_CRITERIA)
+        grading["failed_criteria"] = [c for c, r in results.items() if not r["ok"]]
+        if len(grading["failed_criteria"]) == len(GRADING_CRITERIA):
+            grading["suggestions"] = ["AI Error"]
+        return grading
 
     def generate_speaking_question(self, difficulty: str = "B1") -> str:
-        return self._get_response_hybrid(f"Generate one TEF speaking question (Level {difficulty}). Return ONLY text.", "")
+        return self._run(self.agenerate_speaking_question(difficulty))
+
+    async def agenerate_speaking_question(self, difficulty: str = "B1") -> str:
+        return await self._aget_response_hybrid(f"Generate one TEF speaking question (Level {difficulty}). Return ONLY text.", "", profile="questions")
 
     def evaluate_pronunciation(self, transcription: str, original_text: str) -> Dict[str, Any]:
         # Placeholder for pronunciation feedback
@@ -377,8 +1507,88 @@ class HybridHandler:
     # NEW: Generic Tutor Function
     def ask_tutor(self, query: str) -> str:
         """General purpose tutor function with search access."""
-        system = "You are a helpful TEF tutor. Use the provided context to answer accurately."
-        return self._get_response_hybrid(query, system, use_search=True)
+        return self.ask_tutor_with_meta(query)["answer"]
+
+    async def aask_tutor(self, query: str) -> str:
+        return (await self.aask_tutor_with_meta(query))["answer"]
+
+    def new_tutor_memory(self) -> ConversationMemory:
+        """Empty conversation memory for one tutor chat (kept by the caller, e.g. in session state)."""
+        return ConversationMemory(estimate_tokens)
+
+    def ask_tutor_with_meta(self, query: str, memory: Optional[ConversationMemory] = None) -> Dict[str, Any]:
+        """Tutor answer plus cache metadata: {"answer", "cached", "similarity"}.
+
+        With `memory`, the answer sees the earlier turns and the exchange is added to it, and the
+        search also uses the previous question and the summary. The semantic cache only serves (and
+        stores) opening questions: once the memory holds turns or a summary, an answer depends on the
+        conversation and is always generated.
+        """
+        return self._run(self.aask_tutor_with_meta(query, memory))
+
+    async def aask_tutor_with_meta(self, query: str, memory: Optional[ConversationMemory] = None) -> Dict[str, Any]:
+        # Search runs concurrently with the cache lookup and is cancelled on a cache hit
+        if memory is None or memory.empty:
+            search_task = asyncio.ensure_future(self.agated_context(query))
+        else:
+            search_task = asyncio.ensure_future(self.agated_context(memory.search_text(query), memory.summary))
+        # A follow-up depends on the conversation: only an opening question may use (or fill) the cache
+        vector = await self._aembed_query(query) if memory is None or memory.empty else None
+        result = None
+        if vector is not None:
+            hit = self.tutor_cache.get(vector)
+            if hit:
+                search_task.cancel()
+                result = {"answer": hit["answer"], "cached": True, "similarity": hit["similarity"]}
+
+        if result is None:
+            try:
+                context = await search_task
+            except Exception:
+                context = ""
+
+            system = "You are a helpful TEF tutor. Use the provided context to answer accurately."
+            prompt = memory.render(query) if memory is not None else query
+            answer = await self._aget_response_hybrid(prompt, system, use_search=True, profile="chat",
+                                                      search_context=context)
+            if vector is not None and not answer.startswith("Error:"):
+                self.tutor_cache.put(query, vector, answer)
+                await asyncio.to_thread(self.tutor_cache.maybe_save, SEMANTIC_CACHE_CONFIG['save_interval_s'])
+            result = {"answer": answer, "cached": False, "similarity": None}
+
+        if memory is not None and not result["answer"].startswith("Error:"):
+            memory.add("user", query)
+            memory.add("assistant", result["answer"])
+            self._schedule_summary(memory)
+        return result
+
+    def _schedule_summary(self, memory: ConversationMemory):
+        """Fold the turns that left the window into the rolling summary, in the background (the
+        answer is not held up, and a page rerun doesn't cancel it)."""
+        request = memory.begin_summary()
+        if request is None:
+            return
+
+        async def refresh():
+            summary = None
+            try:
+                answer = await self._aget_response_hybrid(request["prompt"], SUMMARY_SYSTEM_PROMPT, profile="summary")
+                if not answer.startswith("Error:"):
+                    summary = answer
+            finally:
+                memory.finish_summary(request, summary)
+                metrics.increment("tutor_summaries" if summary else "tutor_summary_failures")
+
+        submit(refresh(), CallScope(OLLAMA_CONFIG['timeout']))
+
+    async def _aembed_query(self, query: str) -> Optional[List[float]]:
+        """Embed a tutor query for the semantic cache. None if caching is off or Ollama is down."""
+        if self.tutor_cache is None or not await self.ollama.ais_available():
+            return None
+        try:
+            return await self.ollama.aembed(query.strip().lower())
+        except Exception:
+            return None
 
 
 # Global instance
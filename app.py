@@ -147,12 +147,39 @@ def render_sidebar():
         
         # AI Status
         from ai_handler import ai_handler
+        ai_handler.ollama.touch_session()  # Keeps the local model warm while the app is in use
         status = ai_handler.get_status()
         st.caption(status)
         if "Local" in status:
              st.caption("⚡ Running locally on GPU")
+             timings = ai_handler.ollama.get_timing_summary()
+             if timings["warmup_load_ms"] is not None:
+                 st.caption(f"🔥 Model preloaded in {timings['warmup_load_ms'] / 1000:.1f}s")
+             if timings["last_inference_ms"] is not None:
+                 st.caption(f"⏱️ Last call: load {timings['last_load_ms'] / 1000:.1f}s · "
+                            f"inference {timings['last_inference_ms'] / 1000:.1f}s")
+             hosts = ai_handler.ollama.get_host_stats()
+             if len(hosts) > 1:
+                 for host in hosts:
+                     st.caption(f"🖥️ {host['url'].split('//')[-1]}: {host['state']} · {host['outstanding']} in flight · "
+                                f"{host['requests_per_min']:.0f} req/min · {host['output_tokens_per_s']:.0f} tok/s")
         elif "Cloud" in status:
              st.caption(f"☁️ Running on Gemini Cloud ({GEMINI_CONFIG['model']})")
+        quota = ai_handler.gemini.get_quota_stats()
+        if quota["waiting"] or quota["max_wait_s"] > 0 or quota["retries"]:
+             st.caption(f"⏳ Cloud quota: {quota['waiting']} waiting · {quota['queued_share']:.0%} of requests queued "
+                        f"(avg {quota['avg_wait_s']:.1f}s, max {quota['max_wait_s']:.1f}s) · {quota['retries']:.0f} retries")
+        search_stats = ai_handler.get_search_stats()
+        if search_stats["skipped"]:
+             st.caption(f"🔎 Web search skipped for {search_stats['skip_rate']:.0%} of requests "
+                        f"(~{search_stats['avoided_ms_est'] / 1000:.0f}s saved)")
+        from metrics import metrics
+        if metrics.counter("ai_cancelled_calls"):
+             st.caption(f"🛑 {metrics.counter('ai_cancelled_calls'):.0f} abandoned generations cancelled "
+                        f"(~{metrics.counter('ai_recovered_generation_s_est'):.0f}s of model time freed)")
+        last_route = metrics.last("model_route")
+        if last_route:
+             st.caption(f"🧭 Last route: {last_route['task']} → {last_route['chosen']} ({last_route['reason'].replace('_', ' ')})")
 
 
 # ==================== Main Navigation ====================
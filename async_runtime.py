@@ -0,0 +1,107 @@
+"""
+TEF Master Local - Async Runtime
+One background event loop shared by every Streamlit script thread.
+
+Async AI calls are scheduled onto this loop, so many generations and searches can be in
+flight at once without a thread per call. Sync code (Streamlit pages, CLIs) uses run_sync().
+
+A CallScope carries a deadline and a cancellation check (e.g. "the Streamlit session that asked
+for this has rerun") into every coroutine started under one run_sync() call.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+_current_scope: "contextvars.ContextVar[Optional[CallScope]]" = contextvars.ContextVar("ai_call_scope", default=None)
+
+
+class ScopeAbandoned(Exception):
+    """Raised when the caller that owns a scope no longer needs the result."""
+
+
+class CallScope:
+    """Deadline plus cancellation condition shared by all work done for one caller."""
+
+    def __init__(self, timeout: Optional[float] = None, should_cancel: Optional[Callable[[], bool]] = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.should_cancel = should_cancel or (lambda: False)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (never negative), or None if unbounded."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def abandoned(self) -> bool:
+        try:
+            return bool(self.should_cancel())
+        except Exception:
+            return False
+
+
+def current_scope() -> Optional[CallScope]:
+    """The CallScope of the coroutine being run, if any."""
+    return _current_scope.get()
+
+
+async def guarded(awaitable: Awaitable[Any], scope: CallScope, poll_s: float = 0.1) -> Any:
+    """Await `awaitable`, cancelling it on the scope's deadline or when the scope is abandoned.
+
+    Raises asyncio.TimeoutError or ScopeAbandoned; the inner task sees a CancelledError.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            remaining = scope.remaining()
+            wait = poll_s if remaining is None else min(poll_s, remaining)
+            done, _ = await asyncio.wait({task}, timeout=wait)
+            if done:
+                return task.result()
+            if scope.remaining() == 0:
+                raise asyncio.TimeoutError("AI call deadline exceeded")
+            if scope.abandoned():
+                raise ScopeAbandoned("Caller went away")
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+async def _run_in_scope(coro: Awaitable[Any], scope: CallScope) -> Any:
+    _current_scope.set(scope)  # Task-local: child tasks inherit a copy of this context
+    return await coro
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """The shared background loop (started on first use)."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="ai-event-loop", daemon=True).start()
+        return _loop
+
+
+def submit(coro: Awaitable[Any], scope: Optional[CallScope] = None) -> "asyncio.Future":
+    """Schedule a coroutine on the shared loop; returns a concurrent.futures.Future."""
+    if scope is not None:
+        coro = _run_in_scope(coro, scope)
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run_sync(coro: Awaitable[Any], timeout: Optional[float] = None, scope: Optional[CallScope] = None) -> Any:
+    """Run a coroutine on the shared loop and block the calling thread until it finishes."""
+    loop = get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() called from the AI event loop; await the coroutine instead")
+    return submit(coro, scope).result(timeout)
@@ -0,0 +1,393 @@
+"""
+TEF Master Local - AI Pipeline Benchmark
+Drives every public HybridHandler method against stand-in providers with injected latency and
+failure rates, and reports latency percentiles, pipeline overhead, failovers and JSON repair.
+
+No Ollama, Gemini or Internet access is needed. Results are written as JSON so runs can be
+compared across commits.
+
+Usage:
+    python benchmarks/bench_ai_pipeline.py --scenario flaky-local --iterations 50
+    python benchmarks/bench_ai_pipeline.py --compare benchmarks/results/old.json
+"""
+
+import argparse
+import asyncio
+import contextvars
+import hashlib
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ai_handler as ai_module  # noqa: E402
+from ai_handler import AIProvider, DEFAULT_GENERATION_PROFILE  # noqa: E402
+from config import MODEL_ROUTES  # noqa: E402
+from metrics import metrics  # noqa: E402
+from model_router import ModelRouter  # noqa: E402
+from semantic_cache import SemanticCache  # noqa: E402
+from web_search import WebSearcher  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Provider behaviour per scenario: latency in seconds, rates are per call
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "healthy": {
+        "local": {"latency": 0.08, "jitter": 0.02, "failure_rate": 0.0, "fenced_rate": 0.0, "broken_rate": 0.0},
+        "cloud": {"latency": 0.15, "jitter": 0.05, "failure_rate": 0.0, "fenced_rate": 0.0, "broken_rate": 0.0},
+        "search_latency": 0.05,
+    },
+    "flaky-local": {
+        "local": {"latency": 0.08, "jitter": 0.04, "failure_rate": 0.15, "fenced_rate": 0.2, "broken_rate": 0.1},
+        "cloud": {"latency": 0.15, "jitter": 0.05, "failure_rate": 0.02, "fenced_rate": 0.0, "broken_rate": 0.0},
+        "search_latency": 0.05,
+    },
+    "local-down": {
+        "local": {"latency": 0.08, "jitter": 0.0, "failure_rate": 1.0, "available": False},
+        "cloud": {"latency": 0.15, "jitter": 0.05, "failure_rate": 0.0, "fenced_rate": 0.0, "broken_rate": 0.0},
+        "search_latency": 0.05,
+    },
+    "hedged": {
+        "local": {"latency": 0.08, "jitter": 0.3, "failure_rate": 0.1, "fenced_rate": 0.1, "broken_rate": 0.05},
+        "cloud": {"latency": 0.15, "jitter": 0.05, "failure_rate": 0.0, "fenced_rate": 0.0, "broken_rate": 0.0},
+        "search_latency": 0.05,
+        "hedge_delay_s": 0.2,
+    },
+}
+
+# Attempts made by providers during the current _aget_response_hybrid call
+_attempts: "contextvars.ContextVar[Optional[List[Dict[str, Any]]]]" = contextvars.ContextVar("attempts", default=None)
+_search_time: "contextvars.ContextVar[Optional[List[float]]]" = contextvars.ContextVar("search_time", default=None)
+
+
+# ==================== Stand-ins ====================
+
+class StandInProvider(AIProvider):
+    """Fake provider with configurable latency, errors and malformed JSON."""
+
+    def __init__(self, name: str, latency: float, jitter: float = 0.0, failure_rate: float = 0.0,
+                 fenced_rate: float = 0.0, broken_rate: float = 0.0, available: bool = True, seed: int = 0):
+        self._name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.fenced_rate = fenced_rate
+        self.broken_rate = broken_rate
+        self.available = available
+        self.rng = random.Random(seed)
+        self.probes = 0
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def is_available(self) -> bool:
+        self.probes += 1
+        return self.available
+
+    async def ais_available(self) -> bool:
+        self.probes += 1
+        return self.available
+
+    async def _respond(self, payload: str, json_mode: bool, timeout: Optional[float]) -> str:
+        delay = max(0.0, self.rng.gauss(self.latency, self.jitter))
+        outcome = "ok"
+        roll = self.rng.random()
+        if roll < self.failure_rate:
+            outcome = "error"
+        elif json_mode and roll < self.failure_rate + self.broken_rate:
+            outcome = "broken"
+        elif json_mode and roll < self.failure_rate + self.broken_rate + self.fenced_rate:
+            outcome = "fenced"
+
+        attempt = {"provider": self._name, "outcome": outcome, "busy_s": delay}
+        attempts = _attempts.get()
+        if attempts is not None:
+            attempts.append(attempt)
+        await asyncio.wait_for(asyncio.sleep(delay), timeout)
+
+        if outcome == "error":
+            raise Exception(f"{self._name}: injected failure")
+        if outcome == "broken":
+            return payload[: len(payload) // 2]
+        if outcome == "fenced":
+            return f"```json\n{payload}\n```"
+        return payload
+
+    async def agenerate_text(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        return await self._respond("Voici une réponse de démonstration. " * 20, False, timeout)
+
+    async def agenerate_json(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        if '"article"' in prompt:
+            sentences = [f"La ville numéro {i} investit dans les transports publics cette année." for i in range(12)]
+            payload = {"article": " ".join(sentences), "questions": [
+                {"question": f"Q{i}?", "options": ["A) oui", "B) non"], "correct_index": 0, "explanation": "...",
+                 "evidence": sentences[i]} for i in range(5)
+            ]}
+        elif "Grade ONLY" in prompt:
+            payload = {"score": self.rng.randint(60, 140), "feedback": "Bon travail.", "suggestions": ["Varier les connecteurs."]}
+        elif "MCQ" in prompt:
+            payload = [{"question": f"Q{i}?", "options": ["A) oui", "B) non"], "correct_index": 0, "explanation": "..."}
+                       for i in range(5)]
+        else:
+            payload = [{"question": f"Je ___ content ({i}).", "answer": "suis", "explanation": "être"} for i in range(5)]
+        return await self._respond(json.dumps(payload, ensure_ascii=False), True, timeout)
+
+    async def aembed(self, text: str, model: Optional[str] = None) -> List[float]:
+        # Deterministic per text, so repeated tutor questions exercise the semantic cache
+        seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+        await asyncio.sleep(0.005)
+        return np.random.default_rng(seed).standard_normal(64).tolist()
+
+
+class StandInSearch:
+    """Replaces DDGS.text with a fixed-latency fake."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def text(self, query: str, max_results: int = 3) -> List[Dict[str, str]]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return [{"title": f"Result {i} for {query}", "href": f"https://example.org/{i}", "body": "Résumé. " * 20}
+                for i in range(max_results)]
+
+
+# ==================== Harness ====================
+
+def build_handler(scenario: Dict[str, Any], seed: int):
+    """The global HybridHandler with its providers, search and cache swapped for stand-ins."""
+    handler = ai_module.ai_handler
+    handler.recorders = []
+    handler.ollama = StandInProvider("Local (stand-in)", seed=seed, **scenario["local"])
+    handler.gemini = StandInProvider("Cloud (stand-in)", seed=seed + 1, **scenario["cloud"])
+    handler.search = StandInSearch(scenario["search_latency"])
+    handler.web = WebSearcher(handler.search.text, {"fetch_top": 0})  # Snippets only: no page fetches
+    handler.tutor_cache = SemanticCache(max_entries=1000, threshold=0.92)
+    handler.router = ModelRouter(MODEL_ROUTES, explore_rate=0.0)  # In memory: don't touch the app's route stats
+    ai_module.AI_PROVIDER = "AUTO"
+    ai_module.SEARCH_ENABLED = True
+    ai_module.AI_HEDGE_DELAY_S = scenario.get("hedge_delay_s")
+    return handler
+
+
+def instrument(handler, hybrid_calls: List[Dict[str, Any]], selection_s: List[float]):
+    """Wrap the pipeline internals to time provider selection and per-call provider work."""
+    order = handler._aprovider_order
+    hybrid = handler._aget_response_hybrid
+    fetch = handler.afetch_content
+
+    async def timed_order():
+        start = time.perf_counter()
+        try:
+            return await order()
+        finally:
+            selection_s.append(time.perf_counter() - start)
+
+    async def timed_fetch(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await fetch(*args, **kwargs)
+        finally:
+            record = _search_time.get()
+            if record is not None:
+                record.append(time.perf_counter() - start)
+
+    async def timed_hybrid(*args, **kwargs):
+        attempts: List[Dict[str, Any]] = []
+        searches: List[float] = []
+        _attempts.set(attempts)
+        _search_time.set(searches)
+        start = time.perf_counter()
+        result = await hybrid(*args, **kwargs)
+        hybrid_calls.append({
+            "wall_s": time.perf_counter() - start,
+            "attempts": attempts,
+            "search_s": sum(searches),
+            "ok": not result.startswith("Error:"),
+        })
+        return result
+
+    handler._aprovider_order = timed_order
+    handler._aget_response_hybrid = timed_hybrid
+    handler.afetch_content = timed_fetch
+
+
+def workload(handler, rng: random.Random):
+    """One pass over every public HybridHandler method, with the arguments the UI uses."""
+    topic = rng.choice(["Le subjonctif", "Le passé composé", "Les pronoms relatifs", "Le conditionnel"])
+    essay = "Madame, Monsieur, je vous écris pour signaler un problème. " * rng.randint(5, 15)
+    article = "Article de démonstration sur la vie à Montréal. " * 30
+    return {
+        "fetch_content": lambda: handler.fetch_content(f"actualités {topic}"),
+        "generate_grammar_explanation": lambda: handler.generate_grammar_explanation(topic),
+        "generate_fill_in_blank_questions": lambda: handler.generate_fill_in_blank_questions(topic, 5),
+        "grade_fill_in_blank": lambda: handler.grade_fill_in_blank("suis", "suis"),
+        "generate_reading_article": lambda: handler.generate_reading_article(topic, "B1"),
+        "generate_reading_questions": lambda: handler.generate_reading_questions(article, 5),
+        "generate_reading_bundle": lambda: handler.generate_reading_bundle(topic, "B1", 5, mode="bundle"),
+        "reading_lounge_two_step": lambda: handler.generate_reading_bundle(topic, "B1", 5, mode="two_step"),
+        "grade_essay": lambda: handler.grade_essay(essay, "Section A: Fait Divers"),
+        "generate_speaking_question": lambda: handler.generate_speaking_question("B1"),
+        "evaluate_pronunciation": lambda: handler.evaluate_pronunciation("bonjour", "bonjour"),
+        "ask_tutor": lambda: handler.ask_tutor(f"Explique-moi {topic.lower()}"),
+    }
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"n": 0}
+    ms = np.array(samples) * 1000
+    return {
+        "n": len(samples),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def summarize_hybrid(hybrid_calls: List[Dict[str, Any]], selection_s: List[float], handler) -> Dict[str, Any]:
+    overhead, failovers, all_failed = [], 0, 0
+    fenced, repaired = 0, 0
+    for call in hybrid_calls:
+        attempts = call["attempts"]
+        busy = sum(a["busy_s"] for a in attempts)
+        # Hedged calls overlap providers, so only sequential calls give a meaningful overhead
+        if len({a["provider"] for a in attempts}) == len(attempts):
+            overhead.append(max(0.0, call["wall_s"] - busy - call["search_s"]))
+        failovers += len(attempts) > 1
+        all_failed += not call["ok"]
+        for i, attempt in enumerate(attempts):
+            if attempt["outcome"] == "fenced":
+                fenced += 1
+                # Accepted if it was the attempt that ended the call
+                repaired += call["ok"] and i == len(attempts) - 1
+    return {
+        "calls": len(hybrid_calls),
+        "pipeline_overhead": percentiles(overhead),
+        "provider_selection": percentiles(selection_s),
+        "availability_probes": handler.ollama.probes + handler.gemini.probes,
+        "failovers": failovers,
+        "all_providers_failed": all_failed,
+        "json_repair": {"attempts": fenced, "repaired": repaired,
+                        "success_rate": round(repaired / fenced, 3) if fenced else None},
+        "search_calls": handler.search.calls,
+        "search_gate": handler.get_search_stats(),
+        "hedged_wins": metrics.counter("hedged_calls"),
+    }
+
+
+def summarize_reading_lounge() -> Dict[str, Any]:
+    """End-to-end Reading Lounge latency and prompt tokens per generation mode."""
+    by_mode: Dict[str, List[Dict[str, Any]]] = {}
+    for event in metrics.recent("reading_lounge", limit=10_000):
+        by_mode.setdefault(event["mode"], []).append(event)
+    return {
+        mode: {
+            **percentiles([e["latency_ms"] / 1000 for e in events]),
+            "prompt_tokens_mean": round(sum(e["prompt_tokens_est"] for e in events) / len(events), 1),
+            "calls_mean": round(sum(e["calls"] for e in events) / len(events), 2),
+        }
+        for mode, events in by_mode.items()
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Any], baseline_path: Path):
+    """Print p50/p95/p99 deltas per method against an earlier results file."""
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    print(f"\nvs {baseline_path.name} (commit {baseline.get('commit')}):")
+    for method, stats in current["methods"].items():
+        old = baseline.get("methods", {}).get(method)
+        if not old or not stats.get("n") or not old.get("n"):
+            continue
+        deltas = "  ".join(
+            f"{q}: {stats[q] - old[q]:+.1f}ms ({(stats[q] / old[q] - 1) * 100 if old[q] else 0:+.0f}%)"
+            for q in ("p50_ms", "p95_ms", "p99_ms")
+        )
+        print(f"  {method:34s} {deltas}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="flaky-local")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", type=Path, help="Results file (default: benchmarks/results/ai_pipeline-<scenario>.json)")
+    parser.add_argument("--compare", type=Path, help="Earlier results file to diff against")
+    args = parser.parse_args()
+
+    scenario = SCENARIOS[args.scenario]
+    metrics.reset()
+    handler = build_handler(scenario, args.seed)
+    hybrid_calls: List[Dict[str, Any]] = []
+    selection_s: List[float] = []
+    instrument(handler, hybrid_calls, selection_s)
+
+    rng = random.Random(args.seed)
+    latencies: Dict[str, List[float]] = {}
+    for _ in range(args.iterations):
+        for method, call in workload(handler, rng).items():
+            start = time.perf_counter()
+            call()
+            latencies.setdefault(method, []).append(time.perf_counter() - start)
+
+    results = {
+        "benchmark": "ai_pipeline",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "scenario": {"name": args.scenario, **scenario},
+        "iterations": args.iterations,
+        "seed": args.seed,
+        "methods": {method: percentiles(samples) for method, samples in latencies.items()},
+        "hybrid": summarize_hybrid(hybrid_calls, selection_s, handler),
+        "reading_lounge": summarize_reading_lounge(),
+    }
+
+    output = args.output or RESULTS_DIR / f"ai_pipeline-{args.scenario}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    print(f"scenario={args.scenario} iterations={args.iterations} commit={results['commit']}")
+    for method, stats in results["methods"].items():
+        print(f"  {method:34s} p50={stats['p50_ms']:8.1f}ms  p95={stats['p95_ms']:8.1f}ms  p99={stats['p99_ms']:8.1f}ms")
+    hybrid = results["hybrid"]
+    print(f"hybrid calls={hybrid['calls']} failovers={hybrid['failovers']} failed={hybrid['all_providers_failed']} "
+          f"probes={hybrid['availability_probes']}")
+    print(f"  pipeline overhead p50={hybrid['pipeline_overhead'].get('p50_ms', 0):.2f}ms "
+          f"p99={hybrid['pipeline_overhead'].get('p99_ms', 0):.2f}ms; "
+          f"provider selection p50={hybrid['provider_selection'].get('p50_ms', 0):.3f}ms")
+    repair = hybrid["json_repair"]
+    print(f"  JSON repair: {repair['repaired']}/{repair['attempts']} fenced responses accepted")
+    for mode, stats in results["reading_lounge"].items():
+        print(f"reading lounge [{mode}] p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms "
+              f"prompt tokens={stats['prompt_tokens_mean']:.0f} calls={stats['calls_mean']:.2f}")
+    print(f"-> {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
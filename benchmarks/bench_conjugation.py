@@ -0,0 +1,85 @@
+"""
+TEF Master Local - Conjugation Drill Benchmark
+Checks the conjugation engine against hand-verified forms (regular groups, spelling and stem
+changes, irregulars, être agreement, reflexives) and times local drill generation for every
+syllabus topic it covers.
+
+Usage:
+    python benchmarks/bench_conjugation.py --rounds 2000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from conjugation import DRILL_TOPICS, conjugate, generate_drill, validate_exercise  # noqa: E402
+
+# (infinitive, tense, person, gender, expected)
+REFERENCE = [
+    ("parler", "present", 1, "m", "parles"), ("manger", "present", 3, "m", "mangeons"),
+    ("commencer", "present", 3, "m", "commençons"), ("acheter", "present", 0, "m", "achète"),
+    ("appeler", "present", 5, "m", "appellent"), ("appeler", "present", 3, "m", "appelons"),
+    ("préférer", "present", 1, "m", "préfères"), ("finir", "present", 5, "m", "finissent"),
+    ("attendre", "present", 2, "m", "attend"), ("aller", "present", 5, "m", "vont"),
+    ("devenir", "present", 5, "m", "deviennent"), ("être", "present", 4, "m", "êtes"),
+    ("s'habiller", "present", 0, "m", "m'habille"), ("s'habiller", "present", 3, "m", "nous habillons"),
+    ("se lever", "present", 0, "m", "me lève"),
+    ("comprendre", "passe_compose", 0, "m", "ai compris"), ("aller", "passe_compose", 5, "f", "sont allées"),
+    ("partir", "passe_compose", 2, "m", "est parti"), ("se lever", "passe_compose", 2, "f", "s'est levée"),
+    ("finir", "passe_compose", 3, "m", "avons fini"), ("vendre", "passe_compose", 2, "m", "a vendu"),
+    ("acheter", "futur_simple", 3, "m", "achèterons"), ("préférer", "futur_simple", 0, "m", "préférerai"),
+    ("attendre", "futur_simple", 0, "m", "attendrai"), ("venir", "futur_simple", 5, "m", "viendront"),
+    ("voir", "futur_simple", 3, "m", "verrons"), ("être", "futur_simple", 1, "m", "seras"),
+    ("être", "imparfait", 2, "m", "était"), ("commencer", "imparfait", 0, "m", "commençais"),
+    ("commencer", "imparfait", 3, "m", "commencions"), ("manger", "imparfait", 4, "m", "mangiez"),
+    ("faire", "imparfait", 3, "m", "faisions"), ("boire", "imparfait", 0, "m", "buvais"),
+    ("finir", "imparfait", 5, "m", "finissaient"),
+    ("avoir", "conditionnel", 0, "m", "aurais"), ("vouloir", "conditionnel", 4, "m", "voudriez"),
+    ("pouvoir", "conditionnel", 2, "m", "pourrait"),
+    ("se lever", "futur_proche", 0, "m", "vais me lever"), ("partir", "futur_proche", 3, "m", "allons partir"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=2000, help="Drills generated per topic")
+    parser.add_argument("--count", type=int, default=5, help="Exercises per drill")
+    args = parser.parse_args()
+
+    wrong = [(verb, tense, person, expected, conjugate(verb, tense, person, gender))
+             for verb, tense, person, gender, expected in REFERENCE
+             if conjugate(verb, tense, person, gender) != expected]
+    for verb, tense, person, expected, got in wrong:
+        print(f"  {verb} {tense} person={person}: expected {expected!r}, got {got!r}")
+
+    timings, short, invalid = [], [], 0
+    for topic in DRILL_TOPICS:
+        for seed in range(args.rounds):
+            start = time.perf_counter()
+            drill = generate_drill(topic, args.count, seed=seed)
+            timings.append(time.perf_counter() - start)
+            invalid += sum(not validate_exercise(e) for e in drill)
+            if len(drill) < args.count:
+                short.append(topic)
+    us = np.array(timings) * 1e6
+    print(f"{len(REFERENCE)} reference forms, {len(wrong)} wrong")
+    print(f"{len(DRILL_TOPICS)} topics x {args.rounds} drills of {args.count}: "
+          f"p50={np.percentile(us, 50):.0f}us p99={np.percentile(us, 99):.0f}us per drill")
+
+    checks = {
+        "reference forms correct": not wrong,
+        "every drill full and valid": not short and invalid == 0,
+        "p99 drill under 1ms": np.percentile(us, 99) < 1000,
+    }
+    for name, ok in checks.items():
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+TEF Master Local - Essay Draft History Benchmark
+Saves a long series of small revisions of a ~300-word essay with essay_history.EssayHistory (on a
+throwaway SQLite file) and reports storage against full copies, save/load/listing latency, exact
+reconstruction of every revision, and how many writes a burst of debounced autosaves turns into.
+
+Usage:
+    python benchmarks/bench_essay_history.py --revisions 200
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from essay_history import EssayHistory  # noqa: E402
+
+SENTENCES = [
+    "Je vous écris au sujet de l'article publié la semaine dernière dans votre journal.",
+    "Bien que cette idée paraisse généreuse, je souhaite vous faire part de mon opinion.",
+    "Tout d'abord, il faut reconnaître que la culture devrait être accessible à tous.",
+    "Par conséquent, la gratuité permettrait aux familles modestes de découvrir des œuvres.",
+    "Cependant, cette mesure aurait un coût considérable pour les collectivités.",
+    "En outre, certains sites risqueraient d'être envahis par des foules immenses.",
+    "À mon avis, une solution intermédiaire serait préférable pour tout le monde.",
+    "En conclusion, je pense qu'il est important que l'État soutienne les musées.",
+]
+SWAPS = ["vraiment", "sans doute", "pourtant", "ainsi", "notamment", "surtout", "également", "donc"]
+
+
+def revise(text: str, rng: random.Random) -> str:
+    """One editing step: swap, insert or garble a word, or add a sentence."""
+    words = text.split(" ")
+    roll = rng.random()
+    i = rng.randrange(len(words))
+    if roll < 0.4:
+        words[i] = rng.choice(SWAPS)
+    elif roll < 0.7:
+        words.insert(i, rng.choice(SWAPS))
+    elif roll < 0.95:
+        words[i] = words[i][::-1] + "x"
+    else:
+        words.append(rng.choice(SENTENCES))
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--revisions", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    history = EssayHistory(Path(tempfile.mkdtemp()) / "essay_history.sqlite3", keyframe_every=20, debounce_s=0.2)
+    text = " ".join(SENTENCES * 2)
+    versions, save_ms = [], []
+    for _ in range(args.revisions):
+        text = revise(text, rng)
+        start = time.perf_counter()
+        rev = history.save_draft("user", "B_01", text)
+        save_ms.append((time.perf_counter() - start) * 1000)
+        if rev > len(versions):
+            versions.append(text)
+
+    raw = sum(len(v.encode("utf-8")) for v in versions)
+    zipped = sum(len(zlib.compress(v.encode("utf-8"), 9)) for v in versions)
+    start = time.perf_counter()
+    rows = history.history("user", "B_01")
+    list_ms = (time.perf_counter() - start) * 1000
+    stored = sum(r["stored_bytes"] for r in rows)
+    print(f"{len(versions)} revisions of a {len(versions[-1].split())}-word essay: stored {stored / 1024:.1f} KiB "
+          f"vs {raw / 1024:.1f} KiB full copies ({raw / stored:.0f}x), {zipped / 1024:.1f} KiB compressed copies "
+          f"({zipped / stored:.1f}x)")
+
+    load_ms, exact = [], True
+    for rev, version in enumerate(versions, 1):
+        start = time.perf_counter()
+        exact &= history.load("user", "B_01", rev) == version
+        load_ms.append((time.perf_counter() - start) * 1000)
+    print(f"save p50={np.percentile(save_ms, 50):.2f}ms p99={np.percentile(save_ms, 99):.2f}ms  "
+          f"load p50={np.percentile(load_ms, 50):.2f}ms p99={np.percentile(load_ms, 99):.2f}ms  "
+          f"list {len(rows)} revisions={list_ms:.2f}ms")
+
+    for rev in (5, 40, 120):
+        history.record_grade("user", "B_01", rev, {"total_score": 200 + rev, "structure_score": 70,
+                                                   "vocabulary_score": 70, "grammar_score": 60 + rev})
+    trend = history.grade_trend("user", "B_01")
+
+    # A burst of keystroke-level autosaves (one every 10 ms for 1 s), then a pause
+    burst = versions[-1]
+    for i in range(100):
+        burst += "a" if i % 5 else " "
+        history.autosave("user", "A_01", burst)
+        time.sleep(0.01)
+    time.sleep(0.5)
+    writes = len(history.history("user", "A_01"))
+    print(f"100 autosaves in 1s -> {writes} write(s); grade trend {[(r['rev'], r['total_score']) for r in trend]}")
+
+    checks = {
+        "every revision reconstructs exactly": exact,
+        "storage at least 5x smaller than compressed full copies": zipped / stored >= 5,
+        "load p99 under 20ms": np.percentile(load_ms, 99) < 20,
+        "grade trend lists graded revisions in order": [r["rev"] for r in trend] == [5, 40, 120],
+        "autosave burst debounced into one write of the final text":
+            writes == 1 and history.load("user", "A_01") == burst,
+    }
+    for name, ok in checks.items():
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
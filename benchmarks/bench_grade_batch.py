@@ -0,0 +1,133 @@
+"""
+TEF Master Local - Batch Grading CLI Benchmark
+Runs grade_batch.grade_batch over a generated classroom batch (a directory of tagged .txt files and
+a CSV) with a stand-in model of fixed latency: throughput with 1 worker vs a pool, the essays/minute
+cap, a rerun that skips finished essays, and a resume from a checkpoint cut short by a crash.
+
+Usage:
+    python benchmarks/bench_grade_batch.py --essays 24 --workers 6 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ai_handler as ai_module  # noqa: E402
+from ai_handler import AIProvider, DEFAULT_GENERATION_PROFILE  # noqa: E402
+from grade_batch import CHECKPOINT_FILE, grade_batch  # noqa: E402
+
+
+class StandInGrader(AIProvider):
+    """Answers every criterion call with a score after `latency` seconds."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    @property
+    def name(self) -> str:
+        return "Local (stand-in)"
+
+    @property
+    def is_available(self) -> bool:
+        return True
+
+    async def agenerate_text(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        return ""
+
+    async def agenerate_json(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return json.dumps({"score": 100, "feedback": "Bon travail.", "suggestions": ["Variez les connecteurs."]})
+
+
+def write_batch(root: Path, essays: int):
+    """Half the essays in per-prompt folders, half tagged in the file name, plus one untagged file."""
+    for i in range(essays):
+        text = f"Élève {i} : " + "Hier, je suis allé au marché avec ma sœur et nous avons acheté des fruits. " * (3 + i % 5)
+        path = root / "A_01" / f"student{i:02d}.txt" if i % 2 else root / f"student{i:02d}_B_0{1 + i % 4}.txt"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    (root / "notes.txt").write_text("Pas un essai.", encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--essays", type=int, default=24)
+    parser.add_argument("--workers", type=int, default=6)
+    parser.add_argument("--latency", type=float, default=0.1, help="Stand-in latency per criterion call, seconds")
+    args = parser.parse_args()
+
+    grader = StandInGrader(args.latency)
+    handler = ai_module.ai_handler
+    handler.recorders = []
+    handler.ollama = handler.gemini = grader
+    handler.openai_compat = handler.router = None
+
+    tmp = Path(tempfile.mkdtemp())
+    source = tmp / "essays"
+    write_batch(source, args.essays)
+    quiet = lambda line: None  # noqa: E731
+
+    single = grade_batch(source, tmp / "single", workers=1, essays_per_minute=0, log=quiet)
+    pooled = grade_batch(source, tmp / "pooled", workers=args.workers, essays_per_minute=0, log=quiet)
+    for label, run in (("1 worker", single), (f"{args.workers} workers", pooled)):
+        print(f"{label:10s} graded={run['graded']} failed={run['failed']} wall={run['wall_s']:.2f}s "
+              f"-> {run['essays_per_minute']:.0f} essays/min")
+
+    rate = 240
+    capped = grade_batch(source, tmp / "capped", workers=args.workers, essays_per_minute=rate, log=quiet)
+    floor_s = (args.essays + 1 - min(args.workers, rate)) / rate * 60
+    print(f"capped at {rate}/min: wall={capped['wall_s']:.2f}s (pacing floor {floor_s:.2f}s)")
+
+    calls = grader.calls
+    rerun = grade_batch(source, tmp / "pooled", workers=args.workers, log=quiet)
+    rerun_calls = grader.calls - calls
+    print(f"rerun: skipped={rerun['skipped']} graded={rerun['graded']} model calls={rerun_calls}")
+
+    # Crash halfway: keep half the checkpoint and a torn last line
+    checkpoint = tmp / "pooled" / CHECKPOINT_FILE
+    lines = checkpoint.read_text(encoding="utf-8").splitlines(keepends=True)
+    kept = [line for line in lines if '"grading"' in line][:args.essays // 2]
+    checkpoint.write_text("".join(kept) + lines[-1][:40], encoding="utf-8")
+    resumed = grade_batch(source, tmp / "pooled", workers=args.workers, log=quiet)
+    print(f"resume after crash: skipped={resumed['skipped']} graded={resumed['graded']}")
+
+    with open(tmp / "essays.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "prompt_id", "essay"])
+        for i, path in enumerate(sorted(source.rglob("student*.txt"))):
+            writer.writerow([f"s{i}", "A_02" if i % 2 else "B_04", path.read_text(encoding="utf-8")])
+    from_csv = grade_batch(tmp / "essays.csv", tmp / "csv", workers=args.workers, log=quiet)
+    with open(tmp / "csv" / "results.csv", newline="", encoding="utf-8") as f:
+        csv_rows = list(csv.DictReader(f))
+    with open(tmp / "pooled" / "results.json", encoding="utf-8") as f:
+        json_rows = json.load(f)
+
+    checks = {
+        "every tagged essay graded, untagged one reported": pooled["graded"] == args.essays and pooled["failed"] == 1,
+        f"pool of {args.workers} is >= {args.workers / 2:.0f}x faster than 1 worker":
+            single["wall_s"] / pooled["wall_s"] >= args.workers / 2,
+        "essays/minute cap respected": capped["wall_s"] >= floor_s * 0.9,
+        "rerun skips finished essays (no model calls)": rerun["graded"] == 0 and rerun_calls == 0,
+        "resume grades only what the checkpoint lacks":
+            resumed["skipped"] == args.essays // 2 and resumed["graded"] == args.essays - args.essays // 2,
+        "CSV input and results.csv/json written": from_csv["graded"] == args.essays and len(csv_rows) == args.essays
+            and len(json_rows) == args.essays + 1,
+    }
+    for name, ok in checks.items():
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+TEF Master Local - Grading Job Queue Benchmark
+Drives grading_jobs.GradingJobs with a stand-in grader (fixed latency) on a throwaway SQLite file:
+submit latency against the grading time, worker-pool throughput, identical resubmissions served
+from the stored result, jobs left running by a stopped app picked up by the next one, and a worker
+that survives a SQLite error. Every queue is closed at the end, so no worker task is left pending.
+
+Usage:
+    python benchmarks/bench_grading_jobs.py --essays 40 --workers 4 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from grading_jobs import GradingJobs  # noqa: E402
+from metrics import metrics  # noqa: E402
+
+
+class StandInGrader:
+    """agrade_essay stand-in: sleeps `latency` seconds and returns a grading dict."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def __call__(self, essay: str, task_type: str) -> Dict[str, Any]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        score = 60 + len(essay) % 90
+        return {"structure_score": score, "vocabulary_score": score, "grammar_score": score,
+                "total_score": 3 * score, "structure_feedback": "", "vocabulary_feedback": "",
+                "grammar_feedback": "", "suggestions": [], "failed_criteria": []}
+
+
+def wait_all(jobs: GradingJobs, ids: List[str], timeout: float = 60) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(jobs.get(job_id)["status"] in ("done", "failed") for job_id in ids):
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--essays", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stand-in grading time per essay, seconds")
+    args = parser.parse_args()
+
+    path = Path(tempfile.mkdtemp()) / "grading_jobs.sqlite3"
+    essays = [(f"user{i % 3}", f"Essai numéro {i} : " + "Je pense que la culture est importante. " * (5 + i % 7))
+              for i in range(args.essays)]
+
+    grader = StandInGrader(args.latency)
+    jobs = GradingJobs(grader, path=path, workers=args.workers, job_timeout=30)
+    submit_ms, ids = [], []
+    start = time.perf_counter()
+    for user, essay in essays:
+        t = time.perf_counter()
+        ids.append(jobs.submit(user, essay, "Section B"))
+        submit_ms.append((time.perf_counter() - t) * 1000)
+    finished = wait_all(jobs, ids)
+    wall = time.perf_counter() - start
+    ideal = args.essays * args.latency / args.workers
+    print(f"{args.essays} essays, {args.workers} workers: wall={wall:.2f}s (ideal {ideal:.2f}s), "
+          f"submit p50={np.percentile(submit_ms, 50):.2f}ms p99={np.percentile(submit_ms, 99):.2f}ms "
+          f"vs {args.latency * 1000:.0f}ms grading")
+
+    calls_before = grader.calls
+    t = time.perf_counter()
+    again = [jobs.submit(user, "  " + essay.replace(" ", "  "), "Section B") for user, essay in essays]
+    resubmit_ms = (time.perf_counter() - t) * 1000 / len(essays)
+    reused = again == ids and all(jobs.get(job_id)["status"] == "done" for job_id in again)
+    print(f"resubmitted {len(essays)} identical essays: {grader.calls - calls_before} grading calls, "
+          f"{resubmit_ms:.2f}ms each, reused={metrics.counter('grading_jobs_reused'):.0f}")
+    rewards = [jobs.claim_reward(ids[0]), jobs.claim_reward(ids[0])]
+
+    # A stopped app leaves a job running; the next start re-queues it
+    stuck = StandInGrader(3600)
+    before = GradingJobs(stuck, path=path, workers=1, job_timeout=7200)
+    orphan = before.submit("user9", "Un essai interrompu par un redémarrage.", "Section A")
+    while before.get(orphan)["status"] != "running":
+        time.sleep(0.01)
+    restarted = GradingJobs(StandInGrader(args.latency), path=path, workers=1, job_timeout=30)
+    restarted.get(orphan)
+    recovered = wait_all(restarted, [orphan], timeout=10)
+    print(f"job left running before restart: {restarted.get(orphan)['status']} after restart")
+
+    # A locked database while claiming a job must not kill the worker
+    flaky = GradingJobs(StandInGrader(args.latency), workers=1, job_timeout=30)
+    claim, failures = flaky._claim, []
+
+    def locked_once(job_id):
+        if not failures:
+            failures.append(job_id)
+            raise sqlite3.OperationalError("database is locked")
+        return claim(job_id)
+
+    flaky._claim = locked_once
+    errors_before = metrics.counter("grading_jobs_errors")
+    lost = flaky.submit("user1", "Un essai soumis pendant un verrou.", "Section A")
+    after_error = flaky.submit("user1", "Un essai soumis juste après.", "Section A")
+    survived = wait_all(flaky, [after_error], timeout=10)
+    print(f"claim error: {metrics.counter('grading_jobs_errors') - errors_before:.0f} recorded, "
+          f"next job {flaky.get(after_error)['status']}, failed job {flaky.get(lost)['status']}")
+
+    checks = {
+        "all jobs finished": finished and all(jobs.get(job_id)["status"] == "done" for job_id in ids),
+        "submit returns in under 10ms": np.percentile(submit_ms, 99) < 10,
+        f"throughput near {args.workers} workers (wall < 1.5x ideal)": wall < ideal * 1.5 + 0.2,
+        "identical resubmissions make no model call": reused and grader.calls == calls_before,
+        "XP claimed once per essay": rewards == [True, False],
+        "unfinished job recovered after restart": recovered,
+        "worker keeps running after a database error":
+            survived and metrics.counter("grading_jobs_errors") - errors_before == 1,
+    }
+    for queue in (jobs, before, restarted, flaky):
+        queue.close()
+    for name, ok in checks.items():
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
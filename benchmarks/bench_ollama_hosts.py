@@ -0,0 +1,114 @@
+"""
+TEF Master Local - Multi-host Ollama Benchmark
+Runs concurrent generations through OllamaProvider against several local Ollama stand-ins of
+different speeds. Part-way through, the fastest host is stopped and later restarted, to check that
+it is ejected, that its requests fail over, and that it is re-admitted. A single-host run of the
+same workload is the baseline.
+
+Usage:
+    python benchmarks/bench_ollama_hosts.py --delays 0.05,0.1,0.2 --requests 150 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import OLLAMA_CONFIG  # noqa: E402
+from fake_ollama import FakeOllamaServer  # noqa: E402
+from metrics import metrics  # noqa: E402
+
+# Fast health checks so ejection and re-admission happen within one run
+OLLAMA_CONFIG.update({"warmup_on_start": False, "host_eject_after_failures": 2, "host_eject_s": 0.5,
+                      "host_health_interval_s": 0.25, "host_probe_timeout_s": 0.5})
+
+from ai_handler import OllamaProvider  # noqa: E402
+
+
+def run_workload(servers: List[FakeOllamaServer], requests: int, concurrency: int,
+                 outage: Any = None) -> Dict[str, Any]:
+    """`requests` chat calls, `concurrency` at a time; `outage` = (stop_at, restart_at) request indices."""
+    OLLAMA_CONFIG["base_url"] = [s.url for s in servers]
+    provider = OllamaProvider()
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    async def one(i: int, slots: asyncio.Semaphore):
+        async with slots:
+            if outage and i == outage[0]:
+                servers[0].stop()
+            if outage and i == outage[1]:
+                servers[0].start()
+            start = time.perf_counter()
+            try:
+                await provider.agenerate_text(f"Bonjour n°{i}", profile="chat", timeout=30)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    async def run_all():
+        slots = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(one(i, slots) for i in range(requests)))
+
+    start = time.perf_counter()
+    asyncio.run(run_all())
+    wall = time.perf_counter() - start
+    return {"wall_s": wall, "latencies": np.array(latencies) * 1000, "errors": errors,
+            "hosts": provider.get_host_stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delays", default="0.05,0.1,0.2", help="Seconds per request for each host (comma-separated)")
+    parser.add_argument("--requests", type=int, default=150)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    delays = [float(d) for d in args.delays.split(",")]
+
+    baseline_server = FakeOllamaServer(delay=delays[0]).start()
+    baseline = run_workload([baseline_server], args.requests, args.concurrency)
+    baseline_server.stop()
+
+    servers = [FakeOllamaServer(delay=d).start() for d in delays]
+    outage = (args.requests // 4, args.requests // 2)
+    pooled = run_workload(servers, args.requests, args.concurrency, outage)
+    events = metrics.recent("ollama_host", limit=100)
+
+    for label, run in (("single host", baseline), (f"{len(servers)} hosts", pooled)):
+        ms = run["latencies"]
+        print(f"{label:12s} wall={run['wall_s']:.2f}s throughput={len(ms) / run['wall_s']:.1f} req/s "
+              f"p50={np.percentile(ms, 50):.0f}ms p95={np.percentile(ms, 95):.0f}ms errors={len(run['errors'])}")
+    print(f"outage: host 0 stopped at request {outage[0]}, restarted at request {outage[1]}")
+    for server, stats in zip(servers, pooled["hosts"]):
+        print(f"  {stats['url']:24s} delay={server.delay:.2f}s served={server.served:4d} max_in_flight={server.max_active} "
+              f"state={stats['state']} failures={stats['failures']} ejections={stats['ejections']} "
+              f"tok/s={stats['output_tokens_per_s']}")
+    for event in events:
+        print(f"  event: {event['event']:10s} {event['url']} {event.get('reason', '')}")
+
+    fast = servers[0].url
+    by_speed = [s.served for s in sorted(servers, key=lambda s: s.delay)]
+    checks = {
+        "no failed requests": not pooled["errors"],
+        "throughput above single host": len(pooled["latencies"]) / pooled["wall_s"]
+                                        > len(baseline["latencies"]) / baseline["wall_s"],
+        "fastest host served the most": servers[0].served == max(s.served for s in servers),
+        "faster hosts served more requests": by_speed == sorted(by_speed, reverse=True),
+        "stopped host ejected": any(e["event"] == "ejected" and e["url"] == fast for e in events),
+        "restarted host re-admitted": any(e["event"] == "readmitted" and e["url"] == fast for e in events),
+    }
+    for name, ok in checks.items():
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    for server in servers:
+        server.stop()
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
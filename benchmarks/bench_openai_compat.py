@@ -0,0 +1,131 @@
+"""
+TEF Master Local - OpenAI-compatible Provider Benchmark
+Runs the same concurrent workload (chat and schema-constrained grading calls) through
+OpenAICompatProvider against a local OpenAI-compatible stand-in and through OllamaProvider against
+a local Ollama stand-in with the same speed. Reports latency percentiles, time to first token
+(streamed answers only) and how many TCP connections the pooled client opened. A last run against
+a server that rejects json_schema checks the fallback to json_object mode.
+
+Usage:
+    python benchmarks/bench_openai_compat.py --delay 0.1 --requests 120 --concurrency 6
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import OLLAMA_CONFIG, OPENAI_COMPAT_CONFIG  # noqa: E402
+from fake_ollama import FakeOllamaServer  # noqa: E402
+from fake_openai import FakeOpenAIServer  # noqa: E402
+from metrics import metrics  # noqa: E402
+
+OLLAMA_CONFIG["warmup_on_start"] = False
+
+from ai_handler import OllamaProvider, OpenAICompatProvider  # noqa: E402
+
+
+def run_workload(provider: Any, requests: int, concurrency: int) -> Dict[str, Any]:
+    """`requests` calls, every third one a JSON grading call, `concurrency` at a time."""
+    latencies: List[float] = []
+    errors: List[str] = []
+    invalid_json = 0
+
+    async def one(i: int, slots: asyncio.Semaphore):
+        nonlocal invalid_json
+        async with slots:
+            start = time.perf_counter()
+            try:
+                if i % 3 == 0:
+                    answer = await provider.agenerate_json(f"Note cet essai n°{i}", profile="grading", timeout=30)
+                    try:
+                        json.loads(answer)
+                    except ValueError:
+                        invalid_json += 1
+                else:
+                    await provider.agenerate_text(f"Bonjour n°{i}", profile="chat", timeout=30)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    async def run_all():
+        slots = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(one(i, slots) for i in range(requests)))
+
+    start = time.perf_counter()
+    asyncio.run(run_all())
+    wall = time.perf_counter() - start
+    return {"wall_s": wall, "latencies": np.array(latencies) * 1000, "errors": errors, "invalid_json": invalid_json}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=0.1, help="Seconds per request on both stand-ins")
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--concurrency", type=int, default=6)
+    args = parser.parse_args()
+
+    ollama_server = FakeOllamaServer(delay=args.delay).start()
+    OLLAMA_CONFIG["base_url"] = ollama_server.url
+    ollama_run = run_workload(OllamaProvider(), args.requests, args.concurrency)
+    ollama_server.stop()
+
+    runs = {"ollama": ollama_run}
+    servers = {}
+    for stream in (False, True):
+        server = FakeOpenAIServer(delay=args.delay).start()
+        OPENAI_COMPAT_CONFIG.update({"enabled": True, "base_url": server.url, "stream": stream})
+        label = f"openai {'stream' if stream else 'plain'}"
+        runs[label] = run_workload(OpenAICompatProvider(), args.requests, args.concurrency)
+        servers[label] = server
+        server.stop()
+
+    # A server without structured outputs: the first grading calls get a 400, then json_object is used
+    rejecting = FakeOpenAIServer(delay=args.delay / 4).start()
+    rejecting.reject_schemas = True
+    OPENAI_COMPAT_CONFIG.update({"enabled": True, "base_url": rejecting.url, "stream": True})
+    no_schema = run_workload(OpenAICompatProvider(), args.requests // 4, args.concurrency)
+    rejecting.stop()
+    print(f"schema rejected: {rejecting.rejected} request(s) answered 400, then "
+          f"{sum(1 for f in rejecting.response_formats if f and f.get('type') == 'json_object')} json_object call(s); "
+          f"errors={len(no_schema['errors'])} invalid_json={no_schema['invalid_json']}")
+
+    ttft = np.array([e["ttft_ms"] for e in metrics.recent("openai_compat_call", limit=args.requests * 2)
+                     if e["streamed"] and e["ttft_ms"] is not None])
+    for label, run in runs.items():
+        ms = run["latencies"]
+        extra = ""
+        if label in servers:
+            server = servers[label]
+            extra = f" connections={server.connections} for {server.served + server.requests.get('/v1/models', 0)} requests"
+        print(f"{label:14s} wall={run['wall_s']:.2f}s throughput={len(ms) / run['wall_s']:.1f} req/s "
+              f"p50={np.percentile(ms, 50):.0f}ms p95={np.percentile(ms, 95):.0f}ms errors={len(run['errors'])}{extra}")
+    if len(ttft):
+        print(f"streamed time to first token: p50={np.percentile(ttft, 50):.0f}ms p95={np.percentile(ttft, 95):.0f}ms")
+
+    streamed, plain = runs["openai stream"], runs["openai plain"]
+    formats = servers["openai stream"].response_formats
+    checks = {
+        "no failed requests": not any(run["errors"] for run in runs.values()),
+        f"connections <= pool size ({OPENAI_COMPAT_CONFIG['max_connections']})": all(
+            s.connections <= OPENAI_COMPAT_CONFIG['max_connections'] for s in servers.values()),
+        "grading sent a json_schema": any(f and f.get("type") == "json_schema" for f in formats),
+        "JSON answers parse": plain["invalid_json"] == 0 and streamed["invalid_json"] == 0,
+        "rejected json_schema falls back to json_object": not no_schema["errors"] and no_schema["invalid_json"] == 0
+            and 0 < rejecting.rejected <= args.concurrency,
+        "first token before full answer": len(ttft) > 0 and np.median(ttft) < np.median(streamed["latencies"]),
+    }
+    for name, ok in checks.items():
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
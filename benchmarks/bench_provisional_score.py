@@ -0,0 +1,84 @@
+"""
+TEF Master Local - Provisional Essay Score Benchmark
+Times essay_analysis.provisional_score (the instant local estimate the Writing Clinic shows while
+the AI grades) on ~300-word letters, and checks that it ranks a developed letter above a weak one
+on every criterion, for every Section B prompt.
+
+Usage:
+    python benchmarks/bench_provisional_score.py --runs 2000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data.writing_prompts import get_prompts_by_type  # noqa: E402
+from essay_analysis import analyze_essay, provisional_score  # noqa: E402
+
+GOOD_LETTER = """Madame, Monsieur,
+
+Je vous écris au sujet de l'article publié la semaine dernière dans votre journal, qui propose de rendre tous les musées gratuits. Bien que cette idée paraisse généreuse, je souhaite vous faire part de mon opinion nuancée.
+
+Tout d'abord, il faut reconnaître que la culture devrait être accessible à tous. Quand j'étais étudiant, je n'avais pas les moyens de visiter les grandes expositions parisiennes, et je le regrettais beaucoup. Par conséquent, la gratuité permettrait aux jeunes et aux familles modestes de découvrir des œuvres qu'ils ne verraient jamais autrement. De plus, les écoles pourraient organiser davantage de sorties pédagogiques sans demander de contribution aux parents.
+
+Cependant, cette mesure aurait un coût considérable. Les musées doivent payer leurs employés, entretenir les bâtiments et restaurer les collections fragiles. Si l'entrée devenait gratuite, qui financerait ces dépenses ? Les contribuables, sans doute, même ceux qui ne fréquentent jamais les musées. En outre, certains sites risqueraient d'être envahis par des foules immenses, ce qui nuirait à la qualité de la visite.
+
+À mon avis, une solution intermédiaire serait préférable. Par exemple, on pourrait instaurer la gratuité pour les moins de vingt-six ans, pour les demandeurs d'emploi et, pour tout le monde, le premier dimanche du mois. Ainsi, l'accès à la culture serait élargi tout en préservant les ressources nécessaires au bon fonctionnement des établissements. Néanmoins, il faudrait que les musées puissent compter sur des mécènes privés afin que les tarifs restent raisonnables pour les autres visiteurs.
+
+En conclusion, je pense qu'il est important que l'État soutienne les musées, mais la gratuité totale ne me semble ni réaliste ni souhaitable. J'espère que votre journal publiera d'autres points de vue sur ce débat passionnant.
+
+Veuillez agréer, Madame, Monsieur, l'expression de mes salutations distinguées."""
+
+WEAK_LETTER = " ".join(["je suis pour les musees gratuits et je pense que c est bien et les gens aime les musees"] * 12)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    prompts = get_prompts_by_type("Section B")
+    prompt = prompts[0]
+    words = len(GOOD_LETTER.split())
+
+    timings = {}
+    calls = {"provisional_score": lambda: provisional_score(GOOD_LETTER, prompt),
+             "analyze_essay": lambda: analyze_essay(GOOD_LETTER)}
+    for label, call in calls.items():
+        call()
+        samples = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            call()
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[label] = np.array(samples)
+        print(f"{label:18s} {words} words: p50={np.percentile(samples, 50):.2f}ms "
+              f"p99={np.percentile(samples, 99):.2f}ms")
+
+    criteria = ("structure_score", "vocabulary_score", "grammar_score")
+    ranked = True
+    for p in prompts:
+        good, weak = provisional_score(GOOD_LETTER, p), provisional_score(WEAK_LETTER, p)
+        print(f"{p['id']}: good {[good[c] for c in criteria]} = {good['total_score']}  "
+              f"weak {[weak[c] for c in criteria]} = {weak['total_score']}")
+        ranked &= all(good[c] > weak[c] for c in criteria)
+
+    empty = provisional_score("", prompt)
+    checks = {
+        f"p99 under 5ms for {words} words": np.percentile(timings["provisional_score"], 99) < 5,
+        "developed letter beats weak one on every criterion": ranked,
+        "scores within 0-150": all(0 <= provisional_score(GOOD_LETTER, p)[c] <= 150 for p in prompts for c in criteria),
+        "empty essay scores 0": empty["total_score"] == 0,
+    }
+    for name, ok in checks.items():
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
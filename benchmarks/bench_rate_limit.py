@@ -0,0 +1,132 @@
+"""
+TEF Master Local - Cloud Quota Benchmark
+Drives GeminiProvider against a stand-in model that enforces a server-side quota (token bucket,
+429 "Please retry in Ns" when exceeded), once with the client-side limiter configured to the quota
+and once without pacing. Reports 429s, retries, achieved throughput vs the quota ceiling and how
+much the per-second throughput swings.
+
+Usage:
+    python benchmarks/bench_rate_limit.py --requests 200 --concurrency 30 --quota-rps 25
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-key")  # Never sent: the model is a stand-in
+
+from google.api_core.exceptions import ResourceExhausted  # noqa: E402
+
+from ai_handler import GeminiProvider  # noqa: E402
+from config import GEMINI_CONFIG  # noqa: E402
+from metrics import metrics  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+
+
+class QuotaModel:
+    """Stand-in GenerativeModel: `rps` requests/s with a burst of `burst`, fixed latency."""
+
+    def __init__(self, rps: float, burst: float, latency: float):
+        self.rps = rps
+        self.burst = burst
+        self.latency = latency
+        self.level = burst
+        self.updated = time.monotonic()
+        self.accepted: List[float] = []
+        self.rejected = 0
+
+    async def generate_content_async(self, prompt: str, generation_config: Any = None, request_options: Any = None):
+        now = time.monotonic()
+        self.level = min(self.burst, self.level + (now - self.updated) * self.rps)
+        self.updated = now
+        if self.level < 1:
+            self.rejected += 1
+            raise ResourceExhausted(f"Resource has been exhausted (e.g. check quota). "
+                                    f"Please retry in {(1 - self.level) / self.rps:.2f}s.")
+        self.level -= 1
+        self.accepted.append(now)
+        await asyncio.sleep(self.latency)
+        usage = SimpleNamespace(prompt_token_count=40, candidates_token_count=60, cached_content_token_count=0)
+        return SimpleNamespace(text="Bonjour !", usage_metadata=usage)
+
+
+def run(provider: GeminiProvider, model: QuotaModel, limiter: RateLimiter, requests: int,
+        concurrency: int) -> Dict[str, Any]:
+    provider._model_for = lambda system_prompt, model_name=None: model
+    provider.limiter = limiter
+    retries_before = metrics.counter("gemini_retries")
+    errors: List[str] = []
+
+    async def one(slots: asyncio.Semaphore):
+        async with slots:
+            try:
+                await provider.agenerate_text("Bonjour", profile="chat", timeout=60)
+            except Exception as e:
+                errors.append(type(e).__name__)
+
+    async def run_all():
+        slots = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(one(slots) for _ in range(requests)))
+
+    start = time.perf_counter()
+    asyncio.run(run_all())
+    wall = time.perf_counter() - start
+    accepted = np.array(model.accepted) - model.accepted[0] if model.accepted else np.array([])
+    per_second = np.bincount(accepted.astype(int))[:-1] if len(accepted) else np.array([0])  # Drop the partial last second
+    return {
+        "wall_s": wall,
+        "errors": errors,
+        "rejected": model.rejected,
+        "retries": metrics.counter("gemini_retries") - retries_before,
+        "throughput": len(model.accepted) / wall,
+        "per_second": per_second,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=30)
+    parser.add_argument("--quota-rps", type=float, default=25.0, help="Server quota, requests per second")
+    parser.add_argument("--burst", type=float, default=5.0, help="Server burst allowance, requests")
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    GEMINI_CONFIG.update({"backoff_base_s": 0.05, "backoff_max_s": 1.0, "max_retries": 8})
+    provider = GeminiProvider()
+    runs = {}
+    for label, limiter in (
+        ("paced", RateLimiter(args.quota_rps * 60, 1e9, "gemini", burst_s=args.burst / args.quota_rps)),
+        ("unpaced", RateLimiter(1e9, 1e9, "gemini")),
+    ):
+        runs[label] = run(provider, QuotaModel(args.quota_rps, args.burst, args.latency), limiter,
+                          args.requests, args.concurrency)
+
+    for label, r in runs.items():
+        ps = r["per_second"]
+        print(f"{label:8s} wall={r['wall_s']:.2f}s throughput={r['throughput']:.1f}/s (quota {args.quota_rps:.0f}/s) "
+              f"429s={r['rejected']} retries={r['retries']:.0f} failed={len(r['errors'])} "
+              f"per-second min/max={ps.min() if len(ps) else 0}/{ps.max() if len(ps) else 0} "
+              f"cv={ps.std() / ps.mean() if len(ps) and ps.mean() else 0:.2f}")
+
+    paced = runs["paced"]
+    checks = {
+        "no failed requests (paced)": not paced["errors"],
+        "throughput >= 90% of quota (paced)": paced["throughput"] >= 0.9 * args.quota_rps,
+        "429s cut by pacing": paced["rejected"] <= max(1, runs["unpaced"]["rejected"] // 10),
+    }
+    for name, ok in checks.items():
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
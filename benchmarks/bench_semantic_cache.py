@@ -0,0 +1,146 @@
+"""
+TEF Master Local - Semantic Cache Benchmark
+Measures SemanticCache lookup latency and near-duplicate recall at a given size (p99 must stay
+under 1 ms, recall at or above 95%), then checks that the AI Tutor (HybridHandler.ask_tutor_with_meta with a stand-in model) fills a cache that starts
+empty and answers a repeated question from it.
+
+Usage:
+    python benchmarks/bench_semantic_cache.py --entries 100000 --dim 768
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ai_handler as ai_module  # noqa: E402
+from ai_handler import AIProvider, DEFAULT_GENERATION_PROFILE  # noqa: E402
+from semantic_cache import SemanticCache  # noqa: E402
+
+
+class StandInTutor(AIProvider):
+    """Answers every question and embeds every query deterministically (same text, same vector)."""
+
+    def __init__(self):
+        self.calls = 0
+
+    @property
+    def name(self) -> str:
+        return "Local (stand-in)"
+
+    @property
+    def is_available(self) -> bool:
+        return True
+
+    def preferred_model(self, task: str) -> Optional[str]:
+        return None
+
+    async def agenerate_text(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        self.calls += 1
+        return f"Réponse {self.calls}"
+
+    async def agenerate_json(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        return "{}"
+
+    async def aembed(self, text: str) -> List[float]:
+        rng = np.random.default_rng(abs(hash(text)) % 2 ** 32)
+        return rng.standard_normal(64).tolist()
+
+
+def tutor_round_trip() -> dict:
+    """Ask the same question twice through the tutor path, starting from an empty cache."""
+    handler = ai_module.ai_handler
+    handler.recorders = []
+    handler.ollama = handler.gemini = StandInTutor()
+    handler.openai_compat = handler.router = handler.search = handler.web = handler.local_index = None
+    handler.tutor_cache = SemanticCache(max_entries=100, threshold=0.92)
+    query = "Quelle est la différence entre le passé composé et l'imparfait ?"
+    first = handler.ask_tutor_with_meta(query)
+    second = handler.ask_tutor_with_meta(query)
+    return {"first": first, "second": second, "stored": len(handler.tutor_cache),
+            "model_calls": handler.ollama.calls}
+
+
+def synthetic_embeddings(n: int, dim: int, topics: int, rng) -> np.ndarray:
+    """Clustered unit vectors, closer to real sentence embeddings than uniform noise."""
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, topics, n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--nprobe", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    vectors = synthetic_embeddings(args.entries, args.dim, topics=max(1, args.entries // 50), rng=rng)
+
+    cache = SemanticCache(max_entries=args.entries, threshold=0.92, nprobe=args.nprobe)
+    start = time.perf_counter()
+    for i, vec in enumerate(vectors):
+        cache.put(f"q{i}", vec, f"a{i}")
+    fill_s = time.perf_counter() - start
+
+    # Paraphrase-like queries: small perturbations of stored entries
+    targets = rng.integers(0, args.entries, args.queries)
+    noisy = vectors[targets] + 0.01 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    latencies, hits = [], 0
+    for target, query in zip(targets, noisy):
+        t0 = time.perf_counter()
+        result = cache.get(query)
+        latencies.append(time.perf_counter() - t0)
+        hits += bool(result and result["answer"] == f"a{target}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache.path = Path(tmp) / "bench_cache"
+        t0 = time.perf_counter()
+        cache.save()
+        save_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        restored = SemanticCache(max_entries=args.entries, path=cache.path)
+        load_s = time.perf_counter() - t0
+
+    print(f"entries={len(cache)} dim={args.dim} nprobe={args.nprobe}")
+    print(f"fill: {fill_s:.1f}s ({args.entries / fill_s:,.0f} puts/s)")
+    print(f"lookup p50={percentile_ms(latencies, 50):.3f}ms p95={percentile_ms(latencies, 95):.3f}ms "
+          f"p99={percentile_ms(latencies, 99):.3f}ms")
+    print(f"near-duplicate recall: {hits / args.queries:.1%}")
+    print(f"save: {save_s:.2f}s, load: {load_s:.2f}s (restored {len(restored)} entries)")
+
+    tutor = tutor_round_trip()
+    print(f"tutor: {tutor['stored']} entr(y/ies) stored from an empty cache, {tutor['model_calls']} model call(s) "
+          f"for the same question asked twice")
+
+    checks = {
+        f"lookup p99 under 1ms at {len(cache):,} entries": percentile_ms(latencies, 99) < 1.0,
+        "near-duplicate recall at least 95%": hits / args.queries >= 0.95,
+        "restored cache has every entry": len(restored) == len(cache),
+        "tutor stores its first answer in an empty cache": not tutor["first"]["cached"] and tutor["stored"] == 1,
+        "repeated tutor question answered from the cache":
+            tutor["second"]["cached"] and tutor["second"]["answer"] == tutor["first"]["answer"]
+            and tutor["model_calls"] == 1,
+    }
+    for name, ok in checks.items():
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+TEF Master Local - Tutor Memory Benchmark
+Holds a long AI Tutor conversation through HybridHandler.ask_tutor_with_meta with a stand-in model,
+and tracks, per turn, the prompt size sent to the model and the turns kept in memory, against
+sending the full transcript. Summary refreshes run in the background as in the app. Also checks
+that a follow-up which names no topic is searched with the previous question's keywords.
+
+Usage:
+    python benchmarks/bench_tutor_memory.py --turns 300
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ai_handler as ai_module  # noqa: E402
+from ai_handler import AIProvider, DEFAULT_GENERATION_PROFILE, estimate_tokens  # noqa: E402
+from metrics import metrics  # noqa: E402
+
+
+class StandInTutor(AIProvider):
+    """Answers every chat turn with ~90 words and every summary request with ~110 words."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.turn = 0
+
+    @property
+    def name(self) -> str:
+        return "Local (stand-in)"
+
+    @property
+    def is_available(self) -> bool:
+        return True
+
+    async def agenerate_text(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        await asyncio.sleep(self.latency)
+        if profile == "summary":
+            return "L'apprenant (B1) prépare le TEF ; il a revu le subjonctif et confond encore les auxiliaires. " * 6
+        self.turn += 1
+        return f"Réponse {self.turn} : voici une explication détaillée avec des exemples concrets. " * 9
+
+    async def agenerate_json(self, prompt: str, system_prompt: str = "", profile: str = DEFAULT_GENERATION_PROFILE,
+                             timeout: Optional[float] = None, model: Optional[str] = None) -> str:
+        return "{}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.005, help="Stand-in model latency, seconds")
+    args = parser.parse_args()
+
+    handler = ai_module.ai_handler
+    handler.recorders = []
+    handler.ollama = handler.gemini = StandInTutor(args.latency)
+    handler.openai_compat = None
+    handler.search = handler.web = handler.tutor_cache = handler.router = None
+
+    memory = handler.new_tutor_memory()
+    transcript_tokens = 0
+    prompt_tokens, naive_tokens, kept_turns, render_us = [], [], [], []
+    for turn in range(args.turns):
+        query = f"Question {turn} : peux-tu m'expliquer la différence entre le passé composé et l'imparfait ?"
+        start = time.perf_counter()
+        prompt = memory.render(query)
+        render_us.append((time.perf_counter() - start) * 1e6)
+        prompt_tokens.append(estimate_tokens(prompt))
+        naive_tokens.append(transcript_tokens + estimate_tokens(query))
+
+        result = handler.ask_tutor_with_meta(query, memory=memory)
+        transcript_tokens += estimate_tokens(query) + estimate_tokens(result["answer"])
+        kept_turns.append(len(memory.turns))
+    time.sleep(0.2)  # Let the last background refresh land
+
+    searched = []
+
+    async def record_search(query: str, max_results: int = 3, allow_web: bool = True) -> str:
+        searched.append(query)
+        return ""
+
+    handler.afetch_content = record_search
+    followup = handler.new_tutor_memory()
+    handler.ask_tutor_with_meta("Comment conjuguer le verbe venir au subjonctif ?", memory=followup)
+    handler.ask_tutor_with_meta("Et au pluriel ?", memory=followup)
+    print(f"follow-up search query: {searched[-1]!r}")
+
+    sent = [e["prompt_tokens_est"] for e in metrics.recent("ai_call", limit=args.turns * 2) if e["profile"] == "chat"]
+    quarter = args.turns // 4
+    early, late = np.array(prompt_tokens[quarter:2 * quarter]), np.array(prompt_tokens[-quarter:])
+    print(f"{args.turns} turns, {memory.refreshes} summary refreshes "
+          f"({metrics.counter('tutor_summary_failures'):.0f} failed)")
+    print(f"prompt tokens   turn {quarter}-{2 * quarter}: max={early.max()}  last {quarter}: max={late.max()}  "
+          f"(full transcript at the end: {naive_tokens[-1]})")
+    print(f"sent to model   max={max(sent)}  kept turns max={max(kept_turns)}  "
+          f"render p50={np.percentile(render_us, 50):.0f}us p99={np.percentile(render_us, 99):.0f}us")
+
+    checks = {
+        "summaries refreshed": memory.refreshes > 0,
+        "prompt size flat (late <= early + 10%)": late.max() <= early.max() * 1.1,
+        "kept turns bounded": max(kept_turns[-quarter:]) <= max(kept_turns[quarter:2 * quarter]) + 2,
+        "summary in late prompts": "Summary of the conversation" in memory.render("?"),
+        "follow-up searched with the previous question's topic": "subjonctif" in searched[-1],
+    }
+    for name, ok in checks.items():
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+TEF Master Local - Web Search Stage Benchmark
+Runs WebSearcher against a local HTTP stand-in with scripted latency: fast pages, a page slower
+than the time budget, an oversized page and a non-HTML response, plus one search query that never
+comes back in time. Checks that the budget, the connection bound and the byte limit hold.
+
+Usage:
+    python benchmarks/bench_web_search.py --iterations 20 --budget 1.5
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_web import FakeWebServer  # noqa: E402
+from metrics import metrics  # noqa: E402
+from web_search import WebSearcher  # noqa: E402
+
+
+def scripted_search(server: FakeWebServer, slow_query_s: float):
+    """Stand-in for DDGS.text: overlapping hits per query variant, one variant stuck past the budget."""
+    pages = {
+        "fast-a": server.url("/page/fast-a", delay=0.05, kb=30),
+        "fast-b": server.url("/page/fast-b", delay=0.1, kb=10),
+        "huge": server.url("/page/huge", delay=0.05, kb=3000),
+        "slow": server.url("/page/slow", delay=30),
+        "json": server.url("/api/data", type="json"),
+        "fast-c": server.url("/page/fast-c", delay=0.2, kb=8),
+    }
+    script = {
+        0: (0.05, ["fast-a", "slow", "huge", "json"]),
+        1: (0.15, ["slow", "fast-a", "fast-b", "fast-c"]),
+        2: (slow_query_s, ["fast-c"]),
+    }
+    calls: Dict[str, int] = {}
+
+    def search(query: str, max_results: int = 5) -> List[Dict[str, str]]:
+        variant = len(calls)
+        calls[query] = variant
+        delay, names = script.get(variant, (0.05, []))
+        time.sleep(delay)
+        return [{"title": f"Résultat {name}", "href": pages[name], "body": f"Extrait court ({name})."}
+                for name in names[:max_results]]
+
+    search.reset = calls.clear
+    return search
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=1.5, help="Stage time budget in seconds")
+    parser.add_argument("--max-connections", type=int, default=2)
+    parser.add_argument("--max-page-kb", type=int, default=256)
+    args = parser.parse_args()
+
+    server = FakeWebServer().start()
+    search = scripted_search(server, slow_query_s=args.budget * 4)
+    searcher = WebSearcher(search, {
+        "queries": 3, "fetch_top": 4, "time_budget_s": args.budget,
+        "max_connections": args.max_connections, "max_page_bytes": args.max_page_kb * 1024,
+    })
+
+    async def run_once():
+        search.reset()
+        return await searcher.asearch("TEF Canada épreuves", max_results=4)
+
+    async def run_all():
+        latencies, last = [], None
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            last = await run_once()
+            latencies.append(time.perf_counter() - start)
+        return latencies, last
+
+    latencies, results = asyncio.run(run_all())
+    stats = metrics.last("web_search_stage")
+    ms = np.array(latencies) * 1000
+
+    print(f"iterations={args.iterations} budget={args.budget}s max_connections={args.max_connections} "
+          f"max_page_kb={args.max_page_kb}")
+    print(f"stage latency p50={np.percentile(ms, 50):.0f}ms p95={np.percentile(ms, 95):.0f}ms max={ms.max():.0f}ms")
+    print(f"last run: {stats}")
+    for r in results:
+        print(f"  {r['href'].split('?')[0]:45s} {len(r['body']):6d} chars  {r['body'][:60]!r}")
+
+    checks = {
+        "within budget (+250ms slack)": ms.max() <= args.budget * 1000 + 250,
+        "connection pool bound held": server.max_active <= args.max_connections,
+        "page byte limit held": stats["bytes"] <= stats["pages_fetched"] * args.max_page_kb * 1024,
+        "slow page fell back to snippet": any("Extrait court" in r["body"] for r in results if "slow" in r["href"]),
+        "page text extracted (no nav/script)": any("TEF Canada" in r["body"] and "Menu" not in r["body"] for r in results),
+    }
+    for name, ok in checks.items():
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    server.stop()
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+TEF Master Local - Writing Checker Benchmark
+Runs writing_checker over labeled sentences (each known error must be flagged, each correct sentence
+must pass) and times a ~300-word essay: a cold check, a re-check after a one-word edit, and an
+unchanged re-check, reporting how many sentences each had to analyze.
+
+Usage:
+    python benchmarks/bench_writing_checker.py --repeats 200
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from writing_checker import WritingChecker, check_sentence  # noqa: E402
+
+# (sentence, rule expected to flag it, or None if it is correct)
+LABELED = [
+    ("Elle est allé au marché hier.", "agreement"),
+    ("Ils sont arrivé en retard.", "agreement"),
+    ("Nous sommes parti tôt ce matin.", "agreement"),
+    ("Elles se sont levé à sept heures.", "agreement"),
+    ("J'ai allé à Paris l'été dernier.", "auxiliary"),
+    ("Il a venu me voir samedi.", "auxiliary"),
+    ("Ils ont parti sans dire au revoir.", "auxiliary"),
+    ("Elle a monté au grenier.", "auxiliary"),
+    ("Elles ont entré dans la salle.", "auxiliary"),
+    ("Je ai beaucoup de travail.", "elision"),
+    ("La école est fermée le dimanche.", "elision"),
+    ("Si il pleut, nous resterons à la maison.", "elision"),
+    ("Je pense que il a raison.", "elision"),
+    ("Je ne pas aime les épinards.", "negation"),
+    ("Je n'ai mangé pas ce matin.", "negation"),
+    ("Il y a pas de solution simple.", "negation"),
+    ("Vous savez pas la réponse.", "negation"),
+    ("Elle est allée au marché hier.", None),
+    ("Mes parents sont arrivés en retard.", None),
+    ("Elles se sont levées à sept heures.", None),
+    ("Ils se sont parlé pendant une heure.", None),
+    ("Je suis allé à Paris l'été dernier.", None),
+    ("J'ai sorti le chien avant de partir.", None),
+    ("Elle a monté les valises au grenier.", None),
+    ("J'ai beaucoup de travail.", None),
+    ("L'école est fermée le dimanche.", None),
+    ("Le héros de ce roman est un enfant.", None),
+    ("Si on pleure, on se sent mieux.", None),
+    ("Je n'aime pas les épinards.", None),
+    ("Je n'ai pas mangé ce matin.", None),
+    ("Il n'y a pas de solution simple.", None),
+    ("Cette maison est grande et lumineuse.", None),
+    # Object pronouns that look like subjects
+    ("Je ne vous crois pas.", None),
+    ("Elle ne nous a pas vus.", None),
+    ("Il ne nous aime pas.", None),
+    ("Ce qui nous est arrivé est grave.", None),
+    ("Il nous est arrivé un accident.", None),
+    # Transitive uses with a direct object that does not start with a determiner
+    ("Il a sorti quelque chose de son sac.", None),
+    ("Elle a descendu deux valises.", None),
+    ("J'ai monté ça tout seul.", None),
+    ("J'ai entré le code.", None),
+    ("Ils ont entré les données.", None),
+    # Reflexives whose pronoun is not the direct object
+    ("Elle s'est imaginé que tout irait bien.", None),
+    ("Elle s'est lavé soigneusement les mains.", None),
+    # "une" as a noun
+    ("Je lis la une du journal.", None),
+]
+
+ESSAY_SENTENCES = [
+    "Je vous écris au sujet de l'article publié la semaine dernière dans votre journal.",
+    "Bien que cette idée paraisse généreuse, je souhaite vous faire part de mon opinion.",
+    "Tout d'abord, il faut reconnaître que la culture devrait être accessible à tous.",
+    "Par conséquent, la gratuité permettrait aux familles modestes de découvrir des œuvres.",
+    "Cependant, cette mesure aurait un coût considérable pour les collectivités.",
+    "En outre, certains sites risqueraient d'être envahis par des foules immenses.",
+    "L'année dernière, elle est allé au Louvre avec ma sœur et elles ont attendu deux heures.",
+    "Je ne pas pense que les musées puissent accueillir autant de visiteurs.",
+    "À mon avis, une solution intermédiaire serait préférable pour tout le monde.",
+    "Si il fallait choisir, je proposerais la gratuité pour les jeunes et les chômeurs.",
+    "Les musées ont déjà montré qu'ils savent innover et attirer de nouveaux publics.",
+    "En conclusion, je pense qu'il est important que l'État soutienne les musées.",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    tp = fp = fn = 0
+    for sentence, expected in LABELED:
+        rules = {issue["rule"] for issue in check_sentence(sentence)}
+        if expected is None:
+            fp += bool(rules)
+            if rules:
+                print(f"  false positive: {sentence!r} -> {sorted(rules)}")
+        elif expected in rules:
+            tp += 1
+        else:
+            fn += 1
+            print(f"  missed: {sentence!r} (expected {expected})")
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    print(f"{len(LABELED)} labeled sentences: precision={precision:.2f} recall={recall:.2f}")
+
+    rng = random.Random(args.seed)
+    essay = " ".join(ESSAY_SENTENCES * 2)
+    words = essay.split(" ")
+    cold_ms, edit_ms, same_ms, edit_analyzed = [], [], [], []
+    for _ in range(args.repeats):
+        checker = WritingChecker()
+        start = time.perf_counter()
+        issues = checker.check(essay)
+        cold_ms.append((time.perf_counter() - start) * 1000)
+        cold_analyzed = checker.analyzed
+
+        edited = list(words)
+        i = rng.choice([n for n, word in enumerate(edited) if word.isalpha()])
+        edited[i] = edited[i] + "s"
+        start = time.perf_counter()
+        checker.check(" ".join(edited))
+        edit_ms.append((time.perf_counter() - start) * 1000)
+        edit_analyzed.append(checker.analyzed)
+
+        start = time.perf_counter()
+        checker.check(" ".join(edited))
+        same_ms.append((time.perf_counter() - start) * 1000)
+    same_analyzed = checker.analyzed
+
+    print(f"{len(words)}-word essay, {cold_analyzed} sentences, {len(issues)} issues")
+    print(f"cold check p50={np.percentile(cold_ms, 50):.2f}ms p99={np.percentile(cold_ms, 99):.2f}ms")
+    print(f"after one edit p50={np.percentile(edit_ms, 50):.3f}ms p99={np.percentile(edit_ms, 99):.3f}ms "
+          f"(max {max(edit_analyzed)} sentence(s) re-analyzed)")
+    print(f"unchanged p50={np.percentile(same_ms, 50):.3f}ms ({same_analyzed} re-analyzed)")
+
+    checks = {
+        "no false positives on correct sentences": fp == 0,
+        "recall at least 0.9 on labeled errors": recall >= 0.9,
+        "every seeded essay error flagged": len(issues) >= 6,
+        "one edit re-analyzes at most one sentence": max(edit_analyzed) <= 1,
+        "unchanged text re-analyzes nothing": same_analyzed == 0,
+        "check after an edit p99 under 5ms": np.percentile(edit_ms, 99) < 5,
+    }
+    for name, ok in checks.items():
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
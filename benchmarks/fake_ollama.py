@@ -0,0 +1,117 @@
+"""
+TEF Master Local - Local Ollama Stand-in
+Threaded HTTP server speaking the parts of the Ollama API the app uses (/api/tags, /api/chat,
+/api/generate, /api/embed), with a scripted speed. Several can run side by side to exercise the
+multi-host pool offline; a server can be stopped and restarted on the same port, or made to fail.
+
+Response time models a CPU box: `delay` seconds per request, multiplied by the number of requests
+the server is working on when the request arrives.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional
+
+
+class FakeOllamaServer:
+    """One scripted Ollama server on 127.0.0.1, with request and concurrency counters."""
+
+    def __init__(self, delay: float = 0.1, tokens: int = 64, models: Iterable[str] = ("gemma3:4b",),
+                 port: int = 0):
+        self.delay = delay
+        self.tokens = tokens
+        self.models = list(models)
+        self.failing = False  # True: answer generation requests with HTTP 500
+        self.requests: Dict[str, int] = {}
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.port = port
+        self._bind()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def served(self) -> int:
+        return sum(n for path, n in self.requests.items() if path != "/api/tags")
+
+    def _bind(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+
+    def start(self) -> "FakeOllamaServer":
+        if self._server is None:
+            self._bind()
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop accepting connections (requests already in progress still finish)."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: dict):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _count(self):
+                with server._lock:
+                    server.requests[self.path] = server.requests.get(self.path, 0) + 1
+
+            def do_GET(self):
+                self._count()
+                if self.path != "/api/tags":
+                    return self._send(404, {"error": "not found"})
+                self._send(200, {"models": [{"name": m, "model": m} for m in server.models]})
+
+            def do_POST(self):
+                self._count()
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if server.failing:
+                    return self._send(500, {"error": "scripted failure"})
+                with server._lock:
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                    load = server.active
+                try:
+                    time.sleep(server.delay * load)
+                finally:
+                    with server._lock:
+                        server.active -= 1
+
+                timings = {
+                    "model": request.get("model"), "created_at": "2025-01-01T00:00:00Z", "done": True,
+                    "total_duration": int(server.delay * load * 1e9), "load_duration": 0,
+                    "prompt_eval_count": 32, "prompt_eval_duration": int(server.delay * load * 2e8),
+                    "eval_count": server.tokens, "eval_duration": int(server.delay * load * 8e8),
+                }
+                if self.path == "/api/chat":
+                    content = '{"ok": true}' if request.get("format") else "Bonjour ! " * 8
+                    self._send(200, {**timings, "message": {"role": "assistant", "content": content}})
+                elif self.path == "/api/generate":
+                    self._send(200, {**timings, "response": ""})
+                elif self.path == "/api/embed":
+                    self._send(200, {"model": request.get("model"), "embeddings": [[0.1, 0.2, 0.3]]})
+                else:
+                    self._send(404, {"error": "not found"})
+
+        return Handler
@@ -0,0 +1,148 @@
+"""
+TEF Master Local - Local OpenAI-compatible Stand-in
+Threaded HTTP/1.1 server speaking the parts of the OpenAI API the app uses (/v1/models and
+/v1/chat/completions, plain or streamed as server-sent events), with the same scripted speed as
+fake_ollama: `delay` seconds per request, multiplied by the requests in progress on arrival.
+Streamed answers spread that time over `tokens` chunks, so the first token arrives early.
+
+Connections are kept alive, and each new TCP connection is counted, to check client pooling.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional
+
+# Canned JSON answers per schema name, so constrained requests get a schema-shaped reply
+JSON_ANSWERS = {
+    "grading": {"score": 112, "feedback": "Bonne maîtrise.", "suggestions": ["Variez les connecteurs."]},
+}
+
+
+class FakeOpenAIServer:
+    """One scripted OpenAI-compatible server on 127.0.0.1, with request and connection counters."""
+
+    def __init__(self, delay: float = 0.1, tokens: int = 32, models: Iterable[str] = ("local-model",),
+                 port: int = 0):
+        self.delay = delay
+        self.tokens = tokens
+        self.models = list(models)
+        self.requests: Dict[str, int] = {}
+        self.connections = 0
+        self.response_formats: List[Optional[Dict[str, Any]]] = []
+        self.reject_schemas = False  # True: answer json_schema requests with HTTP 400, like a server without them
+        self.rejected = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    @property
+    def served(self) -> int:
+        return self.requests.get("/v1/chat/completions", 0)
+
+    def start(self) -> "FakeOpenAIServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _answer(self, request: Dict[str, Any]) -> str:
+        response_format = request.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            return json.dumps(JSON_ANSWERS.get(response_format["json_schema"]["name"], {"ok": True}))
+        if response_format.get("type") == "json_object":
+            return '{"ok": true}'
+        return "Bonjour ! " * 8
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: dict):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _chunk(self, payload: Any):
+                data = f"data: {payload if isinstance(payload, str) else json.dumps(payload)}\n\n".encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _count(self):
+                with server._lock:
+                    server.requests[self.path] = server.requests.get(self.path, 0) + 1
+
+            def do_GET(self):
+                self._count()
+                if self.path != "/v1/models":
+                    return self._send(404, {"error": {"message": "not found"}})
+                self._send(200, {"object": "list", "data": [{"id": m, "object": "model"} for m in server.models]})
+
+            def do_POST(self):
+                self._count()
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path != "/v1/chat/completions":
+                    return self._send(404, {"error": {"message": "not found"}})
+                if server.reject_schemas and (request.get("response_format") or {}).get("type") == "json_schema":
+                    with server._lock:
+                        server.rejected += 1
+                    return self._send(400, {"error": {"message": "response_format json_schema is not supported"}})
+                with server._lock:
+                    server.response_formats.append(request.get("response_format"))
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                    load = server.active
+                try:
+                    content = server._answer(request)
+                    usage = {"prompt_tokens": 32, "completion_tokens": server.tokens,
+                             "total_tokens": 32 + server.tokens}
+                    if not request.get("stream"):
+                        time.sleep(server.delay * load)
+                        return self._send(200, {
+                            "object": "chat.completion", "model": request.get("model"), "usage": usage,
+                            "choices": [{"index": 0, "finish_reason": "stop",
+                                         "message": {"role": "assistant", "content": content}}],
+                        })
+
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    step = max(1, -(-len(content) // server.tokens))
+                    pieces = [content[i:i + step] for i in range(0, len(content), step)]
+                    for piece in pieces:
+                        time.sleep(server.delay * load / len(pieces))
+                        self._chunk({"object": "chat.completion.chunk", "model": request.get("model"),
+                                     "choices": [{"index": 0, "delta": {"content": piece}}]})
+                    if (request.get("stream_options") or {}).get("include_usage"):
+                        self._chunk({"object": "chat.completion.chunk", "choices": [], "usage": usage})
+                    self._chunk("[DONE]")
+                    self.wfile.write(b"0\r\n\r\n")
+                finally:
+                    with server._lock:
+                        server.active -= 1
+
+        return Handler
@@ -0,0 +1,99 @@
+"""
+TEF Master Local - Local Web Stand-in
+Threaded HTTP server with scripted pages, used to exercise the web search stage offline.
+
+Each path is scripted by query string, e.g. /page/3?delay=0.5&kb=20&type=html:
+    delay   seconds before the response starts
+    kb      approximate body size in kilobytes (streamed in chunks)
+    type    html (default) or json
+"""
+
+import select
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlsplit
+
+PARAGRAPH = ("<p>Le TEF Canada évalue la compréhension écrite, la compréhension orale, l'expression écrite "
+             "et l'expression orale des candidats à l'immigration.</p>\n")
+
+
+class FakeWebServer:
+    """Scripted pages on 127.0.0.1, plus counters for concurrent and total connections."""
+
+    def __init__(self, port: int = 0):
+        self.requests: List[str] = []
+        self.active = 0
+        self.max_active = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+
+    def url(self, path: str, **params) -> str:
+        query = "&".join(f"{k}={v}" for k, v in params.items())
+        return f"http://127.0.0.1:{self.port}{path}" + (f"?{query}" if query else "")
+
+    def start(self) -> "FakeWebServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _wait(self, delay: float) -> bool:
+                """Sleep `delay` seconds; False as soon as the client hangs up."""
+                end = time.monotonic() + delay
+                while time.monotonic() < end:
+                    readable, _, _ = select.select([self.connection], [], [], min(0.02, end - time.monotonic()))
+                    if readable and not self.connection.recv(1, socket.MSG_PEEK):
+                        return False
+                return True
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                params: Dict[str, str] = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                with server._lock:
+                    server.requests.append(parts.path)
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                try:
+                    if not self._wait(float(params.get("delay", 0))):
+                        return
+                    kind = params.get("type", "html")
+                    if kind == "json":
+                        body = b'{"not": "html"}'
+                        content_type = "application/json"
+                    else:
+                        repeats = max(1, int(float(params.get("kb", 4)) * 1024 / len(PARAGRAPH.encode())))
+                        body = (f"<html><head><script>var x = 1;</script></head><body><nav>Menu Accueil Contact</nav>"
+                                f"<article><h1>Page {parts.path}</h1>{PARAGRAPH * repeats}</article>"
+                                f"<footer>© 2024</footer></body></html>").encode("utf-8")
+                        content_type = "text/html; charset=utf-8"
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    for i in range(0, len(body), 16384):
+                        self.wfile.write(body[i:i + 16384])
+                        with server._lock:
+                            server.bytes_sent += len(body[i:i + 16384])
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with server._lock:
+                        server.active -= 1
+
+        return Handler
@@ -10,23 +10,126 @@ import streamlit as st
 # Base paths
 BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "data"
+CACHE_DIR = DATA_DIR / "cache"  # Runtime caches (not committed)
 
 # ==================== AI Configuration ====================
 
-# AI Provider Options: "AUTO", "LOCAL", "CLOUD"
+# AI Provider Options: "AUTO", "LOCAL", "CLOUD", "OPENAI_COMPAT"
 # AUTO: Tries Local first, falls back to Cloud
 # LOCAL: Forces Local (Ollama)
 # CLOUD: Forces Cloud (Gemini)
+# OPENAI_COMPAT: Forces the OpenAI-compatible server (llama.cpp, vLLM...; see OPENAI_COMPAT_CONFIG)
+# RECORD / REPLAY: Record live responses / replay them offline (see RECORD_REPLAY_CONFIG)
 AI_PROVIDER = "AUTO"
 
+# Hedged failover (AUTO only): if the first provider has not answered after this many
+# seconds, start the next one too and keep whichever answers first. None = sequential failover.
+AI_HEDGE_DELAY_S = None
+
+# RECORD: Like AUTO, but also saves every response (with its latency) as a fixture file
+# REPLAY: Serves recorded fixtures only -- no Ollama, Gemini or Internet needed (benchmarks, load tests)
+RECORD_REPLAY_CONFIG = {
+    "fixtures_dir": BASE_DIR / "benchmarks" / "fixtures",
+    "replay_latency_s": None,   # None = replay the recorded latency; a number = fixed latency in seconds
+    "latency_scale": 1.0        # Multiplier on the replayed latency (0 = as fast as possible)
+}
+
 # Internet Search
 SEARCH_ENABLED = True
 
+# AI Tutor conversation memory: recent turns verbatim plus a rolling summary of older ones
+TUTOR_MEMORY_CONFIG = {
+    "window_tokens": 1000,          # Recent turns sent verbatim with each question
+    "summary_batch_tokens": 600,    # Fold turns into the summary once this much has left the window
+    "summary_words": 120,
+    "max_turns": 200,               # Hard cap on kept turns (only reached if summaries keep failing)
+    "visible_messages": 20,         # Chat messages rendered; older ones load on demand
+    "max_stored_messages": 500
+}
+
+# Build conjugation drills (present, passé composé, futur...) locally with conjugation.py instead of
+# asking the AI; topics it doesn't cover still go to the AI
+LOCAL_DRILLS_ENABLED = True
+
+# Writing Clinic essay grading runs as background jobs: results are stored per user and essay, so a
+# rerun or reconnect picks up the same job and an identical resubmission reuses the stored grade
+GRADING_JOBS_CONFIG = {
+    "path": CACHE_DIR / "grading_jobs.sqlite3",
+    "workers": 2,               # Essays graded at once (each one fans out a call per criterion)
+    "job_timeout": 300,         # Seconds before a running job is marked failed
+    "poll_interval_s": 1.0      # Writing Clinic refresh while a job is pending
+}
+
+# Batch grading CLI (grade_batch.py) defaults; both can be overridden on the command line
+BATCH_GRADING_CONFIG = {
+    "workers": 4,               # Essays graded at once
+    "essays_per_minute": 0      # Start at most this many essays per minute (0 = no limit)
+}
+
+# Writing Clinic draft history: each revision is stored as an edit diff against the previous one,
+# with a full (compressed) copy every few revisions so loading one never replays a long chain
+ESSAY_HISTORY_CONFIG = {
+    "path": CACHE_DIR / "essay_history.sqlite3",
+    "keyframe_every": 20,       # Full copy every N revisions
+    "autosave_debounce_s": 3.0  # Autosave once typing pauses this long
+}
+
+# Writing Clinic local checker (agreement, auxiliaries, elision, negation), re-run on each edit
+WRITING_CHECKER_CONFIG = {
+    "enabled": True,
+    "max_cached_sentences": 5000,   # Checked sentences kept; only new or edited sentences are analyzed
+    "max_shown": 10                 # Issues listed under the essay
+}
+
+# Search gate: skip external context for small talk, keep language questions local,
+# and search the web with a compact keyword query only when fresh facts are needed
+SEARCH_GATE_CONFIG = {
+    "enabled": True,
+    "max_keywords": 6,        # Terms kept in the generated search query
+    "min_web_keywords": 3,    # Open questions with at least this many topic words go to the web
+    "assumed_search_ms": 1500  # Web search latency assumed for skipped searches until real ones are measured
+}
+
+# Web search stage: reformulated queries in parallel, then the best pages fetched and extracted
+WEB_SEARCH_CONFIG = {
+    "queries": 3,               # Query variants searched concurrently
+    "results_per_query": 5,
+    "fetch_top": 3,             # Pages fetched for full text (0 = snippets only)
+    "max_connections": 4,       # Connection pool bound for page fetches
+    "max_page_bytes": 400_000,  # Stop reading a page after this many bytes
+    "time_budget_s": 4.0,       # Whole stage (search + fetch); late queries/pages are dropped
+    "search_share": 0.5,        # Part of the budget the query fan-out may use before pages are fetched
+    "search_threads": 8,        # Worker threads for the (blocking) search client
+    "connect_timeout_s": 2.0,
+    "context_tokens": 900,      # Extracted text kept across all pages
+    "user_agent": "Mozilla/5.0 (compatible; TEFMasterLocal/1.0)"
+}
+
 # 1. Local Configuration (Ollama)
 OLLAMA_CONFIG = {
-    "base_url": "http://localhost:11434",
+    "base_url": "http://localhost:11434",   # Or a list of URLs to spread requests over several Ollama servers
     "model": "gemma3:4b",   # User confirmed local model
-    "timeout": 120
+    "timeout": 120,
+    # How long Ollama keeps the model loaded after each request class
+    "keep_alive": {
+        "default": "10m",
+        "interactive": "30m",   # Tutor chat, lessons, reading
+        "grading": "15m",       # Essay grading
+        "embedding": "30m",     # Semantic cache lookups
+        "warmup": "30m"         # Startup preload and keep-warm pings
+    },
+    "warmup_on_start": True,            # Preload the model in the background at app startup
+    "keep_warm": False,                 # Optional: ping the model while sessions are active
+    "keep_warm_interval_s": 240,
+    "session_idle_timeout_s": 900,      # Stop pinging after this long without activity
+    # A load_duration at least this long means the model was (re)loaded, so its KV cache was empty.
+    # Warm calls also report a few ms of load time, which must not count as cold.
+    "cold_load_min_ms": 250,
+    # Multiple hosts: requests go to the healthy host expected to answer first (in flight x recent speed)
+    "host_eject_after_failures": 2,     # Consecutive connection/server errors before a host is ejected
+    "host_eject_s": 30,                 # Cool-down before an ejected host is probed for re-admission
+    "host_health_interval_s": 15,       # Re-probe healthy hosts (also refreshes their model lists)
+    "host_probe_timeout_s": 2.0
 }
 
 # 2. Cloud Configuration (Gemini)
@@ -35,7 +138,101 @@ GEMINI_CONFIG = {
     # but kept 'gemini-1.5-flash' variable invalid if needed.
     # User also mentioned 'gemma-3-12b-it' might be available via API.
     "model": "gemma-3-27b-it", 
-    "api_key_env_var": "GEMINI_API_KEY"
+    "api_key_env_var": "GEMINI_API_KEY",
+    "model_cache_size": 16,  # GenerativeModel instances kept per distinct system prompt
+    # Client-side quota per API key (Gemma 3 free tier: 30 requests/min, 15k tokens/min)
+    "requests_per_minute": 30,
+    "tokens_per_minute": 15000,
+    "max_retries": 4,          # On 429 / 5xx, with jittered exponential backoff honouring retry-after
+    "backoff_base_s": 1.0,
+    "backoff_max_s": 30.0
+}
+
+# 2b. OpenAI-compatible local servers (llama.cpp server, vLLM, LM Studio...)
+# In AUTO mode it is tried after Ollama and before Gemini.
+OPENAI_COMPAT_CONFIG = {
+    "enabled": False,
+    "base_url": "http://localhost:8080/v1",
+    "model": "local-model",
+    "api_key_env_var": "OPENAI_COMPAT_API_KEY",  # Optional bearer token
+    "stream": True,                 # Stream tokens (server-sent events)
+    "json_schema": True,            # Constrain JSON answers with a schema (json_object if the server rejects it)
+    "max_connections": 8,           # Persistent keep-alive pool size
+    "keepalive_expiry_s": 120,
+    "connect_timeout_s": 2.0,
+    # Per-request timeout by request class (the caller's remaining deadline still applies)
+    "timeouts": {"default": 120, "interactive": 60, "grading": 120}
+}
+
+# Generation profiles, applied uniformly by every provider.
+# max_tokens -> num_predict (Ollama) / max_output_tokens (Gemini) / max_tokens (OpenAI-compatible)
+# num_ctx    -> Ollama context window; also the prompt budget used to trim search context for all providers
+# request_class selects the Ollama keep_alive above
+GENERATION_PROFILES = {
+    "explanation": {"max_tokens": 700, "num_ctx": 4096, "temperature": 0.5, "stop": [], "request_class": "interactive"},
+    "questions": {"max_tokens": 600, "num_ctx": 2048, "temperature": 0.3, "stop": [], "request_class": "interactive"},
+    "article": {"max_tokens": 450, "num_ctx": 4096, "temperature": 0.7, "stop": ["\n---"], "request_class": "interactive"},
+    "reading_bundle": {"max_tokens": 1100, "num_ctx": 4096, "temperature": 0.5, "stop": [], "request_class": "interactive"},
+    "grading": {"max_tokens": 300, "num_ctx": 4096, "temperature": 0.2, "stop": [], "request_class": "grading"},
+    "chat": {"max_tokens": 600, "num_ctx": 4096, "temperature": 0.6, "stop": ["\nUser:"], "request_class": "interactive"},
+    "summary": {"max_tokens": 250, "num_ctx": 2048, "temperature": 0.2, "stop": [], "request_class": "interactive"},
+}
+DEFAULT_GENERATION_PROFILE = "chat"
+
+# Model routing: candidate models per task (generation profile), as "provider:model" routes.
+# The router tries the fastest candidate whose JSON-validity rate meets the floor; models that
+# are not pulled in Ollama (or a Cloud route without an API key, or a disabled server) are skipped.
+_LOCAL_ROUTE = f"ollama:{OLLAMA_CONFIG['model']}"
+_COMPAT_ROUTE = f"openai:{OPENAI_COMPAT_CONFIG['model']}"
+_CLOUD_ROUTE = f"gemini:{GEMINI_CONFIG['model']}"
+MODEL_ROUTES = {
+    "default": [_LOCAL_ROUTE, _COMPAT_ROUTE, _CLOUD_ROUTE],
+    "questions": ["ollama:gemma3:1b", _LOCAL_ROUTE, _COMPAT_ROUTE, "gemini:gemini-2.0-flash", _CLOUD_ROUTE],
+    "grading": ["ollama:gemma3:12b", _LOCAL_ROUTE, _COMPAT_ROUTE, _CLOUD_ROUTE],
+    "reading_bundle": [_LOCAL_ROUTE, "ollama:gemma3:12b", _COMPAT_ROUTE, _CLOUD_ROUTE],
+}
+MODEL_ROUTER_CONFIG = {
+    "enabled": True,
+    "ema_alpha": 0.2,               # Weight of the newest observation in the latency/validity averages
+    "json_validity_floor": 0.9,     # Routes below this validity rate are only used as a last resort
+    "min_samples": 3,               # Observations before a route's averages are trusted
+    "explore_rate": 0.05,           # Chance of trying an untested route ahead of the fastest one
+    "save_interval_s": 30,
+    "path": CACHE_DIR / "model_router.json"
+}
+
+# Local model autotuning (python model_autotune.py): benchmarks the installed Ollama models and
+# records the best one per task for this machine; re-run only when the installed models change.
+MODEL_AUTOTUNE_CONFIG = {
+    "enabled": True,                # Use the saved profile (if any) to pick local models
+    "run_on_start": False,          # Re-tune in the background at startup when the installed models changed
+    "repeats": 2,                   # Runs per task and model (median is kept)
+    "max_tokens": 300,              # Output cap per suite prompt
+    "path": CACHE_DIR / "model_profile.json"
+}
+
+# Reading Lounge generation
+# bundle:   one structured call returns the article and its questions (two-step fallback if it fails validation)
+# two_step: article first, then questions generated from the article (sends the article back as prompt)
+READING_LOUNGE_MODE = "bundle"
+
+# 3. Semantic cache for AI Tutor answers (embeddings from the local Ollama server)
+SEMANTIC_CACHE_CONFIG = {
+    "enabled": True,
+    "embedding_model": "nomic-embed-text",  # ollama pull nomic-embed-text
+    "similarity_threshold": 0.92,           # Cosine similarity needed to reuse an answer
+    "max_entries": 5000,                    # LRU eviction beyond this
+    "path": CACHE_DIR / "tutor_semantic_cache",
+    "save_interval_s": 30
+}
+
+# 4. Local retrieval over bundled TEF material (queried before web search)
+LOCAL_SEARCH_CONFIG = {
+    "enabled": True,
+    "index_path": CACHE_DIR / "local_search_index.json",
+    "max_results": 3,
+    "min_score": 5.0,      # BM25 score of the best hit needed to skip web search
+    "min_coverage": 0.75   # Fraction of query terms the best hit must contain
 }
 
 
@@ -83,5 +280,6 @@ RESOURCE_CATEGORIES = [
     "Pronunciation"
 ]
 
-# Ensure data directory exists
+# Ensure data directories exist
 DATA_DIR.mkdir(exist_ok=True)
+CACHE_DIR.mkdir(exist_ok=True)
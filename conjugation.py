@@ -0,0 +1,407 @@
+"""
+TEF Master Local - Conjugation Engine
+Rule-based French conjugation (regular groups, stem-changing -er verbs and the common irregulars)
+and a template-based fill-in-the-blank generator for the mechanical grammar topics of the
+syllabus (present tense, passé composé, futur, imparfait, conditionnel...).
+
+Drills for the covered topics are built locally in microseconds; other topics return None and go
+to the AI as before.
+
+Persons are indexed 0-5: je, tu, il/elle, nous, vous, ils/elles.
+"""
+
+import random
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from config import LOCAL_DRILLS_ENABLED
+
+PERSONS = ("je", "tu", "il", "nous", "vous", "ils")
+TENSES = ("present", "passe_compose", "futur_simple", "imparfait", "conditionnel", "futur_proche")
+TENSE_LABELS = {
+    "present": "présent", "passe_compose": "passé composé", "futur_simple": "futur simple",
+    "imparfait": "imparfait", "conditionnel": "conditionnel", "futur_proche": "futur proche",
+}
+
+# ==================== Tables ====================
+
+PRESENT_ENDINGS = {
+    "er": ("e", "es", "e", "ons", "ez", "ent"),
+    "ir": ("is", "is", "it", "issons", "issez", "issent"),
+    "re": ("s", "s", "", "ons", "ez", "ent"),
+}
+FUTURE_ENDINGS = ("ai", "as", "a", "ons", "ez", "ont")
+IMPERFECT_ENDINGS = ("ais", "ais", "ait", "ions", "iez", "aient")
+
+# Second-group (-ir, nous finissons) verbs; other -ir verbs are irregular and listed below
+SECOND_GROUP = frozenset({"finir", "choisir", "réussir", "grandir", "réfléchir", "remplir", "obéir", "rougir"})
+
+# -er verbs whose stem vowel changes in the persons with a silent ending (je, tu, il, ils)
+# and, for è/double, in the whole future stem: lever -> lève / lèverai, appeler -> appelle / appellerai
+STEM_CHANGES = {
+    "acheter": "è", "lever": "è", "promener": "è", "amener": "è", "emmener": "è",
+    "appeler": "double", "jeter": "double", "rappeler": "double",
+    "préférer": "é", "espérer": "é", "répéter": "é", "compléter": "é",
+}
+
+# present (6 forms), past participle, future stem; optional imparfait stem (default: nous form - ons)
+IRREGULAR = {
+    "être": ("suis es est sommes êtes sont", "été", "ser", "ét"),
+    "avoir": ("ai as a avons avez ont", "eu", "aur"),
+    "aller": ("vais vas va allons allez vont", "allé", "ir"),
+    "faire": ("fais fais fait faisons faites font", "fait", "fer"),
+    "pouvoir": ("peux peux peut pouvons pouvez peuvent", "pu", "pourr"),
+    "vouloir": ("veux veux veut voulons voulez veulent", "voulu", "voudr"),
+    "devoir": ("dois dois doit devons devez doivent", "dû", "devr"),
+    "savoir": ("sais sais sait savons savez savent", "su", "saur"),
+    "venir": ("viens viens vient venons venez viennent", "venu", "viendr"),
+    "tenir": ("tiens tiens tient tenons tenez tiennent", "tenu", "tiendr"),
+    "prendre": ("prends prends prend prenons prenez prennent", "pris", "prendr"),
+    "mettre": ("mets mets met mettons mettez mettent", "mis", "mettr"),
+    "dire": ("dis dis dit disons dites disent", "dit", "dir"),
+    "voir": ("vois vois voit voyons voyez voient", "vu", "verr"),
+    "croire": ("crois crois croit croyons croyez croient", "cru", "croir"),
+    "partir": ("pars pars part partons partez partent", "parti", "partir"),
+    "sortir": ("sors sors sort sortons sortez sortent", "sorti", "sortir"),
+    "dormir": ("dors dors dort dormons dormez dorment", "dormi", "dormir"),
+    "lire": ("lis lis lit lisons lisez lisent", "lu", "lir"),
+    "écrire": ("écris écris écrit écrivons écrivez écrivent", "écrit", "écrir"),
+    "boire": ("bois bois boit buvons buvez boivent", "bu", "boir"),
+    "connaître": ("connais connais connaît connaissons connaissez connaissent", "connu", "connaîtr"),
+    "ouvrir": ("ouvre ouvres ouvre ouvrons ouvrez ouvrent", "ouvert", "ouvrir"),
+    "recevoir": ("reçois reçois reçoit recevons recevez reçoivent", "reçu", "recevr"),
+    "naître": ("nais nais naît naissons naissez naissent", "né", "naîtr"),
+    "mourir": ("meurs meurs meurt mourons mourez meurent", "mort", "mourr"),
+}
+# Compounds conjugate like their base verb
+COMPOUNDS = {
+    "devenir": "venir", "revenir": "venir", "obtenir": "tenir",
+    "apprendre": "prendre", "comprendre": "prendre", "promettre": "mettre", "permettre": "mettre",
+    "décrire": "écrire",
+}
+
+# Verbs conjugated with être in compound tenses (DR MRS VANDERTRAMP); reflexive verbs too
+ETRE_VERBS = frozenset({
+    "aller", "venir", "devenir", "revenir", "arriver", "partir", "sortir", "entrer", "rentrer",
+    "rester", "tomber", "monter", "descendre", "retourner", "naître", "mourir", "passer",
+})
+
+VOWELS = "aeiouyàâäéèêëîïôöûüh"  # Mute h: the verbs in these tables all elide
+
+# ==================== Conjugation ====================
+
+
+def _split_reflexive(infinitive: str) -> Tuple[str, bool]:
+    if infinitive.startswith("se "):
+        return infinitive[3:], True
+    if infinitive.startswith("s'"):
+        return infinitive[2:], True
+    return infinitive, False
+
+
+def _join(stem: str, ending: str) -> str:
+    """Keep the soft g/c sound before a and o: mangeons, commençons, mangeais."""
+    if ending[:1] in ("a", "o"):
+        if stem.endswith("g"):
+            return stem + "e" + ending
+        if stem.endswith("c"):
+            return stem[:-1] + "ç" + ending
+    return stem + ending
+
+
+def _change_stem(stem: str, kind: str) -> str:
+    """lev -> lèv, appel -> appell, préfér -> préfèr."""
+    if kind == "double":
+        return stem + stem[-1]
+    i = stem.rfind("e" if kind == "è" else "é")
+    return stem[:i] + "è" + stem[i + 1:] if i >= 0 else stem
+
+
+def _irregular(verb: str) -> Optional[Tuple[List[str], str, str, Optional[str]]]:
+    base = COMPOUNDS.get(verb)
+    if base:
+        prefix = verb[:-len(base)]
+        forms, participle, future, imperfect = _irregular(base)
+        return ([prefix + f for f in forms], prefix + participle, prefix + future,
+                prefix + imperfect if imperfect else None)
+    entry = IRREGULAR.get(verb)
+    if entry is None:
+        return None
+    forms, participle, future, *imperfect = entry
+    return forms.split(), participle, future, (imperfect[0] if imperfect else None)
+
+
+def group(verb: str) -> str:
+    """"er", "ir" (finir type), "re", or "irregular"."""
+    if verb in IRREGULAR or verb in COMPOUNDS or verb == "aller":
+        return "irregular"
+    if verb.endswith("er"):
+        return "er"
+    if verb in SECOND_GROUP:
+        return "ir"
+    if verb.endswith("re"):
+        return "re"
+    return "irregular"
+
+
+def present(verb: str, person: int) -> str:
+    irregular = _irregular(verb)
+    if irregular:
+        return irregular[0][person]
+    kind = group(verb)
+    stem = verb[:-2]
+    if kind == "er" and verb in STEM_CHANGES and person in (0, 1, 2, 5):
+        stem = _change_stem(stem, STEM_CHANGES[verb])
+    return _join(stem, PRESENT_ENDINGS[kind][person])
+
+
+def participle(verb: str) -> str:
+    irregular = _irregular(verb)
+    if irregular:
+        return irregular[1]
+    kind = group(verb)
+    return verb[:-2] + {"er": "é", "ir": "i", "re": "u"}[kind]
+
+
+def future_stem(verb: str) -> str:
+    irregular = _irregular(verb)
+    if irregular:
+        return irregular[2]
+    kind = STEM_CHANGES.get(verb)
+    if kind in ("è", "double"):
+        return _change_stem(verb[:-2], kind) + "er"
+    return verb[:-1] if verb.endswith("re") else verb
+
+
+def imperfect_stem(verb: str) -> str:
+    irregular = _irregular(verb)
+    if irregular and irregular[3]:
+        return irregular[3]
+    nous = present(verb, 3)
+    stem = nous[:-3]
+    # mangeons -> mang(e), commençons -> commenc: _join re-applies the spelling before a/o
+    if stem.endswith("ge"):
+        return stem[:-1]
+    if stem.endswith("ç"):
+        return stem[:-1] + "c"
+    return stem
+
+
+def auxiliary(infinitive: str) -> str:
+    verb, reflexive = _split_reflexive(infinitive)
+    return "être" if reflexive or verb in ETRE_VERBS else "avoir"
+
+
+def _agree(participle: str, gender: str, plural: bool) -> str:
+    if gender == "f":
+        participle += "e"
+    if plural and not participle.endswith("s"):
+        participle += "s"
+    return participle
+
+
+def _reflexive_pronoun(person: int, following: str) -> str:
+    pronoun = ("me", "te", "se", "nous", "vous", "se")[person]
+    if person in (0, 1, 2, 5) and following[:1].lower() in VOWELS:
+        return pronoun[0] + "'"
+    return pronoun + " "
+
+
+@lru_cache(maxsize=4096)
+def conjugate(infinitive: str, tense: str, person: int, gender: str = "m") -> str:
+    """The verb form for a subject, without the subject: conjugate("se lever", "present", 0) ->
+    "me lève"; conjugate("aller", "passe_compose", 5, "f") -> "sont allées".
+
+    `gender` only matters for the participle agreement of verbs conjugated with être.
+    """
+    verb, reflexive = _split_reflexive(infinitive)
+    plural = person >= 3
+    if tense == "present":
+        form = present(verb, person)
+    elif tense == "futur_simple":
+        form = future_stem(verb) + FUTURE_ENDINGS[person]
+    elif tense == "conditionnel":
+        form = future_stem(verb) + IMPERFECT_ENDINGS[person]
+    elif tense == "imparfait":
+        form = _join(imperfect_stem(verb), IMPERFECT_ENDINGS[person])
+    elif tense == "futur_proche":
+        form = present("aller", person) + " " + (
+            _reflexive_pronoun(person, verb) + verb if reflexive else verb)
+        return form
+    elif tense == "passe_compose":
+        aux = auxiliary(infinitive)
+        past = participle(verb)
+        if aux == "être":
+            past = _agree(past, gender, plural)
+        form = present(aux, person) + " " + past
+    else:
+        raise ValueError(f"Unknown tense: {tense}")
+    return _reflexive_pronoun(person, form) + form if reflexive else form
+
+
+# ==================== Drills ====================
+
+class Subject(NamedTuple):
+    person: int
+    text: str
+    gender: str
+
+
+SUBJECTS = (
+    Subject(0, "je", "m"), Subject(1, "tu", "m"), Subject(2, "il", "m"), Subject(2, "elle", "f"),
+    Subject(2, "Paul", "m"), Subject(2, "Marie", "f"), Subject(3, "nous", "m"), Subject(4, "vous", "m"),
+    Subject(5, "ils", "m"), Subject(5, "elles", "f"), Subject(5, "mes amis", "m"), Subject(5, "Julie et Léa", "f"),
+)
+
+# Time markers that fit each tense
+TIME_MARKERS = {
+    "present": ("", "Aujourd'hui,", "Tous les jours,", "En ce moment,"),
+    "passe_compose": ("Hier,", "La semaine dernière,", "Ce matin,", "L'année dernière,"),
+    "futur_simple": ("Demain,", "L'année prochaine,", "Dans dix ans,", "Un jour,"),
+    "imparfait": ("Autrefois,", "Chaque été,", "Quand nous étions enfants,", "À cette époque,"),
+    "conditionnel": ("Avec plus de temps,", "À ta place,", "Dans un monde idéal,", "Si possible,"),
+    "futur_proche": ("Ce soir,", "Tout à l'heure,", "Dans cinq minutes,", "Cet après-midi,"),
+}
+
+# A natural complement per verb (verbs without one take none)
+COMPLEMENTS = {
+    "être": "à la maison", "avoir": "un rendez-vous", "aller": "au marché", "faire": "du sport",
+    "pouvoir": "venir à la fête", "vouloir": "un café", "devoir": "travailler", "savoir": "la réponse",
+    "venir": "à la fête", "prendre": "le train", "mettre": "un manteau", "dire": "la vérité",
+    "voir": "un film", "croire": "cette histoire", "partir": "en vacances", "sortir": "avec des amis",
+    "dormir": "huit heures", "lire": "le journal", "écrire": "une lettre", "boire": "de l'eau",
+    "connaître": "ce quartier", "ouvrir": "la fenêtre", "recevoir": "un colis", "devenir": "médecin",
+    "revenir": "de Paris", "apprendre": "le français", "comprendre": "la question",
+    "parler": "français", "aimer": "la musique", "habiter": "à Lyon", "travailler": "au bureau",
+    "regarder": "la télévision", "manger": "une pomme", "commencer": "le cours", "écouter": "la radio",
+    "acheter": "du pain", "préférer": "le thé", "appeler": "le médecin", "jouer": "au tennis",
+    "visiter": "le musée", "chercher": "un appartement", "finir": "le travail", "choisir": "un livre",
+    "réussir": "l'examen", "attendre": "le bus", "vendre": "la voiture", "répondre": "au message",
+    "arriver": "à la gare", "entrer": "dans le magasin", "rester": "à la maison", "tomber": "dans la rue",
+    "monter": "au deuxième étage", "descendre": "du train", "rentrer": "tard",
+    "se lever": "tôt", "se coucher": "à minuit", "se laver": "les mains", "s'habiller": "rapidement",
+    "se promener": "au parc", "se reposer": "le dimanche", "se réveiller": "à sept heures",
+    "s'appeler": "Léa",
+}
+
+REGULAR_ER = ["parler", "aimer", "habiter", "travailler", "regarder", "manger", "commencer", "écouter",
+              "acheter", "préférer", "appeler", "jouer", "visiter", "chercher"]
+COMMON_IRREGULAR = ["faire", "prendre", "venir", "pouvoir", "vouloir", "devoir", "savoir", "dire", "voir",
+                    "mettre", "lire", "écrire", "boire", "partir", "sortir", "connaître"]
+AVOIR_VERBS = ["parler", "manger", "finir", "choisir", "attendre", "vendre", "faire", "prendre", "voir",
+               "lire", "écrire", "boire", "mettre", "recevoir", "ouvrir", "acheter"]
+ETRE_DRILL_VERBS = ["aller", "venir", "arriver", "partir", "sortir", "entrer", "rester", "tomber",
+                    "monter", "descendre", "rentrer", "devenir", "revenir"]
+REFLEXIVE_VERBS = ["se lever", "se coucher", "se laver", "s'habiller", "se promener", "se reposer",
+                   "se réveiller", "s'appeler"]
+MIXED_VERBS = ["parler", "finir", "attendre", "aller", "faire", "être", "avoir", "prendre", "venir",
+               "pouvoir", "vouloir", "voir", "acheter", "manger", "commencer", "se lever"]
+
+# Syllabus grammar topic -> (tenses, verbs)
+DRILL_TOPICS: Dict[str, Tuple[Tuple[str, ...], List[str]]] = {
+    "Present tense - être": (("present",), ["être"]),
+    "Present tense - avoir": (("present",), ["avoir"]),
+    "Regular -ER verbs": (("present",), REGULAR_ER),
+    "Aller (to go)": (("present",), ["aller"]),
+    "Faire expressions": (("present",), ["faire"]),
+    "Irregular verbs": (("present",), COMMON_IRREGULAR),
+    "Modal verbs (pouvoir, vouloir)": (("present",), ["pouvoir", "vouloir", "devoir"]),
+    "Reflexive verbs": (("present",), REFLEXIVE_VERBS),
+    "Future proche": (("futur_proche",), MIXED_VERBS),
+    "Passé composé with avoir": (("passe_compose",), AVOIR_VERBS),
+    "Passé composé with être": (("passe_compose",), ETRE_DRILL_VERBS + REFLEXIVE_VERBS[:4]),
+    "Past participles": (("passe_compose",), AVOIR_VERBS + ETRE_DRILL_VERBS),
+    "Simple future": (("futur_simple",), MIXED_VERBS + ["devoir", "savoir", "voir"]),
+    "Future proche vs future simple": (("futur_proche", "futur_simple"), MIXED_VERBS),
+    "Imparfait formation": (("imparfait",), MIXED_VERBS),
+    "Conditional present": (("conditionnel",), MIXED_VERBS),
+    "Polite requests": (("conditionnel",), ["vouloir", "pouvoir", "aimer", "devoir"]),
+}
+
+BLANK = "___"
+
+
+def covers(topic: str) -> bool:
+    return LOCAL_DRILLS_ENABLED and topic in DRILL_TOPICS
+
+
+def _explain(infinitive: str, tense: str, subject: Subject, answer: str) -> str:
+    verb, reflexive = _split_reflexive(infinitive)
+    kind = group(verb)
+    if tense == "present":
+        rule = f"{verb} is {'irregular' if kind == 'irregular' else f'a regular -{kind} verb'}"
+        if verb in STEM_CHANGES and kind == "er":
+            rule += " with a stem change (je, tu, il, ils)"
+        return f"{rule}: {subject.text} {answer}."
+    if tense == "passe_compose":
+        aux = auxiliary(infinitive)
+        text = f"Passé composé = {aux} in the present + past participle ({participle(verb)})."
+        if aux == "être":
+            why = "reflexive verbs" if reflexive else f"{verb} is a DR MRS VANDERTRAMP verb"
+            text += f" It takes être ({why}), so the participle agrees with '{subject.text}'."
+        return text
+    if tense == "futur_simple":
+        return f"Futur simple = stem '{future_stem(verb)}' + ending '-{FUTURE_ENDINGS[subject.person]}'."
+    if tense == "conditionnel":
+        return (f"Conditionnel = future stem '{future_stem(verb)}' + imparfait ending "
+                f"'-{IMPERFECT_ENDINGS[subject.person]}'.")
+    if tense == "imparfait":
+        return (f"Imparfait = stem of 'nous {present(verb, 3)}' ({imperfect_stem(verb)}-) + ending "
+                f"'-{IMPERFECT_ENDINGS[subject.person]}'.")
+    return f"Futur proche = aller in the present ({present('aller', subject.person)}) + infinitive."
+
+
+def make_exercise(infinitive: str, tense: str, subject: Subject, marker: str = "",
+                  show_tense: bool = False) -> Dict[str, Any]:
+    answer = conjugate(infinitive, tense, subject.person, subject.gender)
+    hint = f"({infinitive}, {TENSE_LABELS[tense]})" if show_tense else f"({infinitive})"
+    if subject.text == "je" and answer[:1] in VOWELS:
+        blank = f"j'{BLANK}"  # Elision belongs to the question, the learner writes the verb form
+    else:
+        blank = f"{subject.text} {BLANK}"
+    sentence = " ".join(part for part in (marker, blank, hint, COMPLEMENTS.get(infinitive, "")) if part)
+    return {
+        "question": sentence[0].upper() + sentence[1:] + ".",
+        "answer": answer,
+        "explanation": _explain(infinitive, tense, subject, answer),
+        "source": "local",
+    }
+
+
+def validate_exercise(exercise: Dict[str, Any]) -> bool:
+    question, answer = exercise.get("question", ""), exercise.get("answer", "")
+    return question.count(BLANK) == 1 and bool(answer.strip()) and BLANK not in answer
+
+
+def generate_drill(topic: str, count: int = 5, seed: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+    """`count` distinct fill-in-the-blank exercises for a syllabus topic, or None if the topic isn't a
+    conjugation drill (the caller then asks the AI)."""
+    if not covers(topic):
+        return None
+    rng = random.Random(seed)
+    tenses, verbs = DRILL_TOPICS[topic]
+    combos = [(verb, tense, subject) for verb in verbs for tense in tenses for subject in SUBJECTS
+              # Agreement needs a subject whose gender is explicit
+              if not (tense == "passe_compose" and auxiliary(verb) == "être" and subject.person in (0, 1, 3, 4))]
+    rng.shuffle(combos)
+
+    exercises, seen = [], set()
+    for verb, tense, subject in combos:
+        if (verb, tense) in seen and len(seen) < len(verbs) * len(tenses):
+            continue  # Vary the verbs before repeating one
+        exercise = make_exercise(verb, tense, subject, rng.choice(TIME_MARKERS[tense]), len(tenses) > 1)
+        if validate_exercise(exercise):
+            seen.add((verb, tense))
+            exercises.append(exercise)
+        if len(exercises) == count:
+            break
+    return exercises
+
+
+_WORD_RE = re.compile(r"[\w'’]+")
+
+
+def normalize_answer(text: str) -> str:
+    """Compare answers word by word, ignoring case, spacing and apostrophe style."""
+    return " ".join(_WORD_RE.findall(text.lower().replace("’", "'")))
@@ -0,0 +1,217 @@
+"""
+TEF Master Local - Essay Draft History
+Draft and grade history per user and writing prompt.
+
+Each saved revision is stored as a compact edit script against the previous one (word-level
+difflib opcodes, zlib-compressed), with a compressed full copy every `keyframe_every` revisions,
+so a long run of small edits costs little and loading any revision replays a bounded number of
+diffs. Listing a prompt's history and its grade trend reads only the metadata columns.
+
+Autosave is debounced: calls made while the learner is still editing only replace the pending
+text, which is written once `debounce_s` seconds pass without another change.
+"""
+
+import atexit
+import difflib
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import ESSAY_HISTORY_CONFIG
+from metrics import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS essay_revisions (
+    user_id TEXT NOT NULL,
+    prompt_id TEXT NOT NULL,
+    rev INTEGER NOT NULL,
+    kind TEXT NOT NULL,            -- base (full text) | diff (edit script against rev - 1)
+    body BLOB NOT NULL,            -- zlib-compressed
+    word_count INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    total_score INTEGER,
+    structure_score INTEGER,
+    vocabulary_score INTEGER,
+    grammar_score INTEGER,
+    graded_at REAL,
+    PRIMARY KEY (user_id, prompt_id, rev)
+)
+"""
+META_COLUMNS = ("rev, kind, length(body) AS stored_bytes, word_count, created_at, total_score, structure_score, "
+                "vocabulary_score, grammar_score, graded_at")
+
+# Each word with the whitespace after it (plus any leading whitespace): joining the tokens gives back
+# the text, and there is no single very common "space" token to slow the matcher down
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+
+def make_diff(old: str, new: str) -> List[List[Any]]:
+    """Edit script turning `old` into `new`: [start, end, replacement] over old's word tokens."""
+    a, b = _TOKEN_RE.findall(old), _TOKEN_RE.findall(new)
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    return [[i1, i2, "".join(b[j1:j2])] for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+
+
+def apply_diff(old: str, ops: List[List[Any]]) -> str:
+    tokens = _TOKEN_RE.findall(old)
+    parts, pos = [], 0
+    for start, end, replacement in ops:
+        parts.extend(tokens[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.extend(tokens[pos:])
+    return "".join(parts)
+
+
+def _compress(data: str) -> bytes:
+    return zlib.compress(data.encode("utf-8"), 9)
+
+
+def _decompress(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+class EssayHistory:
+    """Revision store for essay drafts, keyed by (user, prompt)."""
+
+    def __init__(self, path: Optional[Path] = None, keyframe_every: int = 20, debounce_s: float = 3.0):
+        self.keyframe_every = keyframe_every
+        self.debounce_s = debounce_s
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path) if path else ":memory:", check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._latest: Dict[Tuple[str, str], Tuple[int, str]] = {}  # (user, prompt) -> newest (rev, text) to diff against
+        self._pending: Dict[Tuple[str, str], Tuple[str, threading.Timer]] = {}
+        self._pending_lock = threading.Lock()
+
+    # ==================== Saving ====================
+
+    def save_draft(self, user_id: str, prompt_id: str, text: str) -> int:
+        """Store `text` as the next revision and return its number (the latest one if nothing changed)."""
+        key = (user_id, prompt_id)
+        self._cancel_pending(key)
+        with self._lock:
+            latest = self._latest.get(key) or self._load_latest(key)
+            if latest is not None and latest[1] == text:
+                return latest[0]
+            rev = latest[0] + 1 if latest else 1
+            kind, body = "base", _compress(text)
+            if latest is not None and (rev - 1) % self.keyframe_every:
+                diff = _compress(json.dumps(make_diff(latest[1], text), ensure_ascii=False, separators=(",", ":")))
+                if len(diff) < len(body):
+                    kind, body = "diff", diff
+            self._conn.execute(
+                "INSERT INTO essay_revisions (user_id, prompt_id, rev, kind, body, word_count, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (user_id, prompt_id, rev, kind, body, len(text.split()), time.time()))
+            self._conn.commit()
+            self._latest[key] = (rev, text)
+        metrics.increment("essay_revisions_saved")
+        metrics.increment("essay_history_bytes", len(body))
+        return rev
+
+    def autosave(self, user_id: str, prompt_id: str, text: str):
+        """Debounced save_draft: the text is saved once `debounce_s` pass without another autosave."""
+        if not text.strip():
+            return
+        key = (user_id, prompt_id)
+        timer = threading.Timer(self.debounce_s, self._flush_key, args=(key,))
+        timer.daemon = True
+        with self._pending_lock:
+            previous = self._pending.get(key)
+            if previous is not None:
+                previous[1].cancel()
+                metrics.increment("essay_autosaves_coalesced")
+            self._pending[key] = (text, timer)
+        timer.start()
+
+    def flush(self):
+        """Write every pending autosave now (e.g. at exit)."""
+        for key in list(self._pending):
+            self._flush_key(key)
+
+    def _flush_key(self, key: Tuple[str, str]):
+        with self._pending_lock:
+            pending = self._pending.pop(key, None)
+        if pending is not None:
+            pending[1].cancel()
+            self.save_draft(key[0], key[1], pending[0])
+
+    def _cancel_pending(self, key: Tuple[str, str]):
+        # An explicit save carries the newest text; the pending autosave would only repeat an older one
+        with self._pending_lock:
+            pending = self._pending.pop(key, None)
+        if pending is not None:
+            pending[1].cancel()
+
+    def record_grade(self, user_id: str, prompt_id: str, rev: int, grading: Dict[str, Any]):
+        """Attach a grading result to a revision."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE essay_revisions SET total_score = ?, structure_score = ?, vocabulary_score = ?, "
+                "grammar_score = ?, graded_at = ? WHERE user_id = ? AND prompt_id = ? AND rev = ?",
+                (grading.get("total_score"), grading.get("structure_score"), grading.get("vocabulary_score"),
+                 grading.get("grammar_score"), time.time(), user_id, prompt_id, rev))
+            self._conn.commit()
+
+    # ==================== Reading ====================
+
+    def history(self, user_id: str, prompt_id: str) -> List[Dict[str, Any]]:
+        """Every revision's metadata (number, time, word count, stored size, scores), oldest first.
+        Essay bodies are not read."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {META_COLUMNS} FROM essay_revisions WHERE user_id = ? AND prompt_id = ? ORDER BY rev",
+                (user_id, prompt_id)).fetchall()
+        return [dict(row) for row in rows]
+
+    def grade_trend(self, user_id: str, prompt_id: str) -> List[Dict[str, Any]]:
+        """Graded revisions only, oldest first."""
+        return [row for row in self.history(user_id, prompt_id) if row["total_score"] is not None]
+
+    def load(self, user_id: str, prompt_id: str, rev: Optional[int] = None) -> Optional[str]:
+        """Text of revision `rev` (the latest if None), or None if there is no such revision."""
+        with self._lock:
+            return self._load((user_id, prompt_id), rev)
+
+    def _latest_rev(self, key: Tuple[str, str]) -> Optional[int]:
+        return self._conn.execute("SELECT MAX(rev) FROM essay_revisions WHERE user_id = ? AND prompt_id = ?",
+                                  key).fetchone()[0]
+
+    def _load(self, key: Tuple[str, str], rev: Optional[int]) -> Optional[str]:
+        if rev is None:
+            rev = self._latest_rev(key)
+            if rev is None:
+                return None
+        # The nearest full copy at or before `rev`, then the diffs after it
+        rows = self._conn.execute(
+            "SELECT kind, body FROM essay_revisions WHERE user_id = ? AND prompt_id = ? AND rev <= ? AND rev >= "
+            "(SELECT MAX(rev) FROM essay_revisions WHERE user_id = ? AND prompt_id = ? AND rev <= ? AND kind = 'base') "
+            "ORDER BY rev", (*key, rev, *key, rev)).fetchall()
+        if not rows:
+            return None
+        text = _decompress(rows[0]["body"])
+        for row in rows[1:]:
+            text = apply_diff(text, json.loads(_decompress(row["body"])))
+        return text
+
+    def _load_latest(self, key: Tuple[str, str]) -> Optional[Tuple[int, str]]:
+        rev = self._latest_rev(key)
+        return (rev, self._load(key, rev)) if rev is not None else None
+
+
+# Global instance
+essay_history = EssayHistory(
+    path=ESSAY_HISTORY_CONFIG['path'],
+    keyframe_every=ESSAY_HISTORY_CONFIG['keyframe_every'],
+    debounce_s=ESSAY_HISTORY_CONFIG['autosave_debounce_s']
+)
+atexit.register(essay_history.flush)
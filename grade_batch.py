@@ -0,0 +1,223 @@
+"""
+TEF Master Local - Batch Essay Grading
+Grades a classroom batch of Section A/B essays from the command line, with the same rubric grading
+as the Writing Clinic (HybridHandler.agrade_essay).
+
+Input is either a directory of .txt files, each tagged with a WRITING_PROMPTS id in its path
+(essays/A_01/alice.txt or essays/alice_B_03.txt), or a CSV with `prompt_id` and `essay` columns
+(plus an optional `id`). Essays are graded by a pool of workers, optionally capped at N essays per
+minute. Each finished essay is appended to a checkpoint, so a rerun (after a crash or Ctrl+C) only
+grades what is missing or failed. Results are written as results.csv and results.json.
+
+Usage:
+    python grade_batch.py essays/ --output grading_results
+    python grade_batch.py essays.csv --workers 2 --rate 20
+"""
+
+import asyncio
+import csv
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from ai_handler import ai_handler
+from async_runtime import run_sync
+from config import BATCH_GRADING_CONFIG
+from data.writing_prompts import WRITING_PROMPTS, get_prompt_by_id
+from essay_analysis import essay_hash
+from rate_limiter import TokenBucket
+
+# A prompt id anywhere in a file's path ("A_01", not "A_011" or "XA_01")
+_PROMPT_ID_RE = re.compile(r"(?<![A-Za-z0-9])(" + "|".join(re.escape(p["id"]) for p in WRITING_PROMPTS) + r")(?![0-9])")
+
+CHECKPOINT_FILE = "checkpoint.jsonl"
+RESULT_FIELDS = ["id", "prompt_id", "word_count", "structure_score", "vocabulary_score", "grammar_score",
+                 "total_score", "failed_criteria", "error", "seconds"]
+
+
+# ==================== Input ====================
+
+def load_directory(root: Path) -> List[Dict[str, Any]]:
+    """Every .txt file under `root`; the prompt id comes from the file's relative path."""
+    items = []
+    for path in sorted(root.rglob("*.txt")):
+        rel = path.relative_to(root).as_posix()
+        match = _PROMPT_ID_RE.search(rel)
+        items.append({"id": rel, "prompt_id": match.group(1) if match else None,
+                      "essay": path.read_text(encoding="utf-8-sig")})
+    return items
+
+
+def load_csv(path: Path) -> List[Dict[str, Any]]:
+    """Rows with `prompt_id` and `essay` columns; `id` defaults to the row number."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = {"prompt_id", "essay"} - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"{path} is missing the column(s): {', '.join(sorted(missing))}")
+        return [{"id": (row.get("id") or "").strip() or f"row{n}", "prompt_id": row["prompt_id"].strip(),
+                 "essay": row["essay"]} for n, row in enumerate(reader, 1)]
+
+
+def load_essays(source: Path) -> List[Dict[str, Any]]:
+    if source.is_dir():
+        items = load_directory(source)
+    elif source.suffix.lower() == ".csv":
+        items = load_csv(source)
+    else:
+        raise ValueError(f"{source} is neither a directory nor a .csv file")
+    ids = [item["id"] for item in items]
+    if len(set(ids)) != len(ids):
+        raise ValueError("Essay ids must be unique (they key the checkpoint)")
+    return items
+
+
+# ==================== Checkpoint ====================
+
+def item_key(item: Dict[str, Any]) -> str:
+    """Checkpoint key: an edited essay (or a changed prompt) is graded again."""
+    return f"{item['id']}:{essay_hash(item['essay'], item['prompt_id'] or '')}"
+
+
+def is_complete(record: Dict[str, Any]) -> bool:
+    return "grading" in record and not record["grading"].get("failed_criteria")
+
+
+def load_checkpoint(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Latest record per key; a line cut short by a crash is ignored."""
+    records = {}
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record["key"]] = record
+    return records
+
+
+# ==================== Grading ====================
+
+async def agrade_items(items: List[Dict[str, Any]], checkpoint: Path, workers: int,
+                       essays_per_minute: float = 0, log: Callable[[str], None] = print) -> List[Dict[str, Any]]:
+    """Grade `items` with `workers` concurrent workers, appending each record to `checkpoint` as it lands."""
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in items:
+        queue.put_nowait(item)
+    # One essay per worker may start at once; after that, starts are spaced by the rate
+    bucket = TokenBucket(essays_per_minute, capacity=min(workers, essays_per_minute)) if essays_per_minute else None
+    records: List[Dict[str, Any]] = []
+
+    async def worker():
+        while not queue.empty():
+            item = queue.get_nowait()
+            if bucket is not None:
+                wait = bucket.reserve(1, time.monotonic())
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            start = time.perf_counter()
+            record = {"key": item_key(item), "id": item["id"], "prompt_id": item["prompt_id"]}
+            prompt = get_prompt_by_id(item["prompt_id"]) if item["prompt_id"] else None
+            if prompt is None:
+                record["error"] = f"unknown prompt id {item['prompt_id']!r}"
+            elif not item["essay"].strip():
+                record["error"] = "empty essay"
+            else:
+                try:
+                    record["grading"] = await ai_handler.agrade_essay(item["essay"], prompt["type"])
+                except Exception as e:
+                    record["error"] = f"{type(e).__name__}: {e}"
+            record["seconds"] = round(time.perf_counter() - start, 2)
+            with open(checkpoint, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            records.append(record)
+
+            if "grading" in record:
+                grading = record["grading"]
+                status = f"total {grading['total_score']}"
+                if grading["failed_criteria"]:
+                    status += f" (failed: {', '.join(grading['failed_criteria'])})"
+            else:
+                status = f"error: {record['error']}"
+            log(f"[{len(records)}/{len(items)}] {item['id']}  {status}  ({record['seconds']:.1f}s)")
+
+    await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+    return records
+
+
+# ==================== Output ====================
+
+def result_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    grading = record.get("grading") or {}
+    row = {field: grading.get(field) for field in RESULT_FIELDS}
+    row.update(id=record["id"], prompt_id=record["prompt_id"], error=record.get("error"),
+               seconds=record.get("seconds"), word_count=(grading.get("analysis") or {}).get("word_count"),
+               failed_criteria="; ".join(grading.get("failed_criteria", [])))
+    return row
+
+
+def write_results(items: List[Dict[str, Any]], records: Dict[str, Dict[str, Any]], output: Path):
+    """results.csv (one row of scores per essay) and results.json (full grading, with feedback), in input order."""
+    ordered = [records[item_key(item)] for item in items if item_key(item) in records]
+    with open(output / "results.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(result_row(record) for record in ordered)
+    with open(output / "results.json", "w", encoding="utf-8") as f:
+        json.dump([{k: v for k, v in record.items() if k != "key"} for record in ordered], f,
+                  ensure_ascii=False, indent=2)
+
+
+def grade_batch(source: Path, output: Path, workers: Optional[int] = None, essays_per_minute: Optional[float] = None,
+                log: Callable[[str], None] = print) -> Dict[str, Any]:
+    """Grade everything in `source` not already complete in `output`'s checkpoint; returns a run summary."""
+    workers = workers or BATCH_GRADING_CONFIG['workers']
+    if essays_per_minute is None:
+        essays_per_minute = BATCH_GRADING_CONFIG['essays_per_minute']
+    output.mkdir(parents=True, exist_ok=True)
+    checkpoint = output / CHECKPOINT_FILE
+
+    items = load_essays(source)
+    done = load_checkpoint(checkpoint)
+    todo = [item for item in items if not is_complete(done.get(item_key(item), {}))]
+    log(f"{len(items)} essays, {len(items) - len(todo)} already graded, {len(todo)} to grade "
+        f"with {workers} workers" + (f" at most {essays_per_minute:g}/min" if essays_per_minute else ""))
+
+    start = time.perf_counter()
+    records = run_sync(agrade_items(todo, checkpoint, workers, essays_per_minute, log)) if todo else []
+    wall = time.perf_counter() - start
+    for record in records:
+        done[record["key"]] = record
+    write_results(items, done, output)
+
+    graded = sum(is_complete(record) for record in records)
+    return {
+        "essays": len(items), "skipped": len(items) - len(todo), "graded": graded,
+        "failed": len(records) - graded, "wall_s": wall,
+        "essays_per_minute": len(records) / wall * 60 if records and wall > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Grade a batch of TEF essays (directory of .txt files or CSV).")
+    parser.add_argument("source", type=Path, help="Directory of .txt essays or a CSV with prompt_id,essay columns")
+    parser.add_argument("--output", type=Path, default=Path("grading_results"),
+                        help="Directory for results.csv, results.json and the checkpoint")
+    parser.add_argument("--workers", type=int, help="Essays graded at once")
+    parser.add_argument("--rate", type=float, help="Start at most this many essays per minute (0 = no limit)")
+    args = parser.parse_args()
+
+    try:
+        summary = grade_batch(args.source, args.output, args.workers, args.rate)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"Error: {e}")
+    except KeyboardInterrupt:
+        raise SystemExit("\nInterrupted: finished essays are in the checkpoint; rerun to grade the rest.")
+    print(f"\nGraded {summary['graded']} essays ({summary['failed']} failed, {summary['skipped']} already done) "
+          f"in {summary['wall_s']:.1f}s: {summary['essays_per_minute']:.1f} essays/minute")
+    print(f"Results: {args.output / 'results.csv'}, {args.output / 'results.json'}")
@@ -0,0 +1,225 @@
+"""
+TEF Master Local - Background Essay Grading Jobs
+Essay grading as queued jobs instead of a call inside the Streamlit script run.
+
+submit() stores the job and returns its id at once; a pool of workers on the shared AI loop grades
+queued jobs, and results are persisted in SQLite keyed by user and essay hash. A rerun, tab switch
+or reconnect no longer loses the work: the page polls the job by id, and resubmitting the same
+essay returns the stored job without another model call. Jobs left queued or running when the app
+stopped are picked up again on the next start.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from ai_handler import ai_handler
+from async_runtime import get_loop, run_sync, submit
+from config import GRADING_JOBS_CONFIG
+from essay_analysis import essay_hash
+from metrics import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS grading_jobs (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    essay_hash TEXT NOT NULL,
+    task_type TEXT NOT NULL,
+    essay TEXT NOT NULL,
+    status TEXT NOT NULL,          -- queued | running | done | failed
+    result TEXT,                   -- grading dict as JSON (done jobs)
+    error TEXT,                    -- failed jobs
+    rewarded INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    UNIQUE (user_id, essay_hash)
+)
+"""
+
+
+class GradingJobs:
+    """Persistent grading queue drained by `workers` coroutines on the shared AI loop."""
+
+    def __init__(self, grade: Callable[[str, str], Awaitable[Dict[str, Any]]], path: Optional[Path] = None,
+                 workers: int = 2, job_timeout: float = 300):
+        self.grade = grade
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self._lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._conn = sqlite3.connect(str(path) if path else ":memory:", check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+
+    # ==================== Submitting ====================
+
+    def submit(self, user_id: str, essay: str, task_type: str) -> str:
+        """Queue an essay for grading and return the job id.
+
+        The same essay from the same user maps to the same job: a finished grade is reused, one in
+        progress is joined, and a failed or partial one is queued again.
+        """
+        self._start_workers()
+        key = essay_hash(essay, task_type)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT id, status, result FROM grading_jobs WHERE user_id = ? AND essay_hash = ?",
+                                     (user_id, key)).fetchone()
+            if row is not None and (row["status"] in ("queued", "running") or
+                                    (row["status"] == "done" and not json.loads(row["result"]).get("failed_criteria"))):
+                metrics.increment("grading_jobs_reused")
+                return row["id"]
+            if row is None:
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO grading_jobs (id, user_id, essay_hash, task_type, essay, status, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, 'queued', ?)", (job_id, user_id, key, task_type, essay, now))
+            else:
+                job_id = row["id"]
+                self._conn.execute(
+                    "UPDATE grading_jobs SET status = 'queued', result = NULL, error = NULL, created_at = ?, "
+                    "started_at = NULL, finished_at = NULL WHERE id = ?", (now, job_id))
+            self._conn.commit()
+        metrics.increment("grading_jobs_submitted")
+        self._enqueue(job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job's status and, once done, its grading dict. None for an unknown id.
+
+        Keys: id, status, result, error, position (queued jobs ahead of this one), created_at,
+        started_at, finished_at.
+        """
+        self._start_workers()
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM grading_jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            position = 0
+            if row["status"] == "queued":
+                position = self._conn.execute(
+                    "SELECT COUNT(*) FROM grading_jobs WHERE status = 'queued' AND created_at < ?",
+                    (row["created_at"],)).fetchone()[0]
+        return {
+            "id": row["id"], "status": row["status"], "position": position,
+            "result": json.loads(row["result"]) if row["result"] else None, "error": row["error"],
+            "created_at": row["created_at"], "started_at": row["started_at"], "finished_at": row["finished_at"],
+        }
+
+    def claim_reward(self, job_id: str) -> bool:
+        """True the first time a finished job is claimed, so its XP is awarded once per essay."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE grading_jobs SET rewarded = 1 WHERE id = ? AND status = 'done' AND rewarded = 0", (job_id,))
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def close(self, timeout: float = 5):
+        """Cancel the workers, wait for them to exit, and close the database.
+
+        A job cancelled mid-grade stays 'running' and is re-queued on the next start.
+        """
+        with self._lock:
+            started, self._queue = self._queue is not None, None
+        if started:
+            run_sync(self._stop_workers(), timeout)
+        with self._lock:
+            self._conn.close()
+
+    # ==================== Workers ====================
+
+    def _start_workers(self):
+        """Start the worker pool on first use, re-queueing jobs an earlier run left unfinished."""
+        with self._lock:
+            if self._queue is not None:
+                return
+            self._queue = asyncio.Queue()
+            self._conn.execute("UPDATE grading_jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+            self._conn.commit()
+            leftover = [row["id"] for row in self._conn.execute(
+                "SELECT id FROM grading_jobs WHERE status = 'queued' ORDER BY created_at")]
+        for _ in range(self.workers):
+            submit(self._worker())
+        for job_id in leftover:
+            self._enqueue(job_id)
+
+    def _enqueue(self, job_id: str):
+        # asyncio.Queue isn't thread-safe: hand the id to the AI loop
+        get_loop().call_soon_threadsafe(self._queue.put_nowait, job_id)
+
+    def _claim(self, job_id: str) -> Optional[sqlite3.Row]:
+        """Mark a queued job running; None if another worker already has it."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE grading_jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id))
+            self._conn.commit()
+            if cursor.rowcount != 1:
+                return None
+            return self._conn.execute("SELECT * FROM grading_jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def _finish(self, job_id: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE grading_jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                ("failed" if error else "done", json.dumps(result) if result is not None else None, error,
+                 time.time(), job_id))
+            self._conn.commit()
+
+    async def _stop_workers(self):
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _worker(self):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        queue = self._queue
+        try:
+            while True:
+                job_id = await queue.get()
+                try:
+                    await self._run_job(job_id)
+                except Exception as e:
+                    # SQLite errors (locked database, disk full): the job keeps its queued/running
+                    # row and is picked up again on the next start; this worker keeps draining the queue
+                    metrics.increment("grading_jobs_errors")
+                    metrics.record("grading_job", status="error", job_id=job_id, error=f"{type(e).__name__}: {e}")
+        finally:
+            self._tasks.discard(task)
+
+    async def _run_job(self, job_id: str):
+        job = await asyncio.to_thread(self._claim, job_id)
+        if job is None:
+            return
+        result, error = None, None
+        try:
+            result = await asyncio.wait_for(self.grade(job["essay"], job["task_type"]), self.job_timeout)
+        except asyncio.TimeoutError:
+            error = f"Grading took longer than {self.job_timeout:.0f}s"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        await asyncio.to_thread(self._finish, job_id, result, error)
+        metrics.record("grading_job", status="failed" if error else "done",
+                       queue_ms=round((job["started_at"] - job["created_at"]) * 1000, 1),
+                       run_ms=round((time.time() - job["started_at"]) * 1000, 1))
+
+
+# Global instance
+grading_jobs = GradingJobs(
+    ai_handler.agrade_essay,
+    path=GRADING_JOBS_CONFIG['path'],
+    workers=GRADING_JOBS_CONFIG['workers'],
+    job_timeout=GRADING_JOBS_CONFIG['job_timeout']
+)
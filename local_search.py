@@ -0,0 +1,268 @@
+"""
+TEF Master Local - Local Retrieval Index
+BM25 search over the material we already ship (TEF_Research.md, syllabus, writing prompts,
+resource catalog), so most `use_search` requests are answered without a web round trip.
+
+The index is built once, cached on disk and rebuilt automatically when the sources change.
+Prebuild it with:
+    python local_search.py --rebuild
+"""
+
+import hashlib
+import json
+import math
+import re
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import BASE_DIR, LOCAL_SEARCH_CONFIG
+from data.resources import RESOURCES
+from data.syllabus import TEF_SYLLABUS
+from data.writing_prompts import WRITING_PROMPTS
+
+INDEX_VERSION = 1
+
+# French + English function words (accent-folded, since tokens are folded before lookup)
+STOP_WORDS = frozenset("""
+a au aux avec ce ces cette cet dans de des du elle elles en et eux il ils je la le les leur leurs
+lui ma mais me meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur
+ta te tes toi ton tu un une vos votre vous c d j l m n s t y etre avoir est sont ete fait plus tres
+comme si tout tous toute toutes aussi bien alors donc car ni
+the of and to in is it for on with as at by an be are this that from or what how why when which
+who about can do does you your me my i we our explain tell give please use using
+difference between write word words article topic create question questions french francais
+""".split())
+
+# Elided articles/pronouns (l', d', qu', j'...) are split off before tokenizing
+_ELISION_RE = re.compile(r"\b(?:[cdjlmnst]|qu|jusqu|lorsqu|puisqu)['’]", re.IGNORECASE)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+# ==================== Text Normalization ====================
+
+def fold_accents(text: str) -> str:
+    """Lowercase and strip diacritics (é -> e, ç -> c, œ -> oe)."""
+    text = text.lower().replace("œ", "oe").replace("æ", "ae")
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    """Accent-folded, stop-word-filtered tokens with light plural stripping."""
+    text = fold_accents(_ELISION_RE.sub(" ", text))
+    tokens = []
+    for token in _TOKEN_RE.findall(text):
+        if token in STOP_WORDS or len(token) < 2:
+            continue
+        if len(token) > 4 and token[-1] in "sx":
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+# ==================== Corpus ====================
+
+def _research_chunks(path: Path, words_per_chunk: int = 120) -> List[Dict[str, str]]:
+    """Split TEF_Research.md into section-aware passages of roughly `words_per_chunk` words."""
+    if not path.exists():
+        return []
+    raw = path.read_text(encoding="utf-8").replace("\\", "")
+    docs, section, buffer = [], "TEF Research", []
+
+    def flush():
+        if buffer:
+            docs.append({"title": section, "source": path.name, "text": " ".join(buffer)})
+            buffer.clear()
+
+    for line in raw.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            flush()
+            section = stripped.strip("#* ").strip() or section
+            continue
+        if stripped:
+            buffer.extend(stripped.split())
+            if len(buffer) >= words_per_chunk:
+                flush()
+    flush()
+    return docs
+
+
+def build_corpus() -> List[Dict[str, str]]:
+    """Collect searchable documents from every bundled source."""
+    docs = _research_chunks(BASE_DIR / "TEF_Research.md")
+
+    for week in TEF_SYLLABUS:
+        docs.append({
+            "title": f"Syllabus Week {week['week']} ({week['level']}): {week['title']}",
+            "source": "TEF_SYLLABUS",
+            "text": (
+                f"Grammar: {', '.join(week.get('grammar_topics', []))}. "
+                f"Vocabulary: {', '.join(week.get('vocabulary_themes', []))}. "
+                f"Reading: {', '.join(week.get('reading_topics', []))}. "
+                f"Writing: {', '.join(week.get('writing_tasks', []))}."
+            )
+        })
+
+    for prompt in WRITING_PROMPTS:
+        metadata = prompt.get("metadata", {})
+        details = "; ".join(
+            f"{key.replace('_', ' ')}: {', '.join(value) if isinstance(value, list) else value}"
+            for key, value in metadata.items()
+        )
+        docs.append({
+            "title": f"Writing prompt {prompt['id']} - {prompt['type']}: {prompt['topic']}",
+            "source": "WRITING_PROMPTS",
+            "text": f"{prompt['prompt']} Target: {prompt['word_count']} words. {details}"
+        })
+
+    for resource in RESOURCES:
+        docs.append({
+            "title": f"Resource: {resource['title']} ({resource['category']})",
+            "source": "RESOURCES",
+            "text": f"{resource['description']} URL: {resource['url']}"
+        })
+
+    return docs
+
+
+def corpus_fingerprint(docs: List[Dict[str, str]]) -> str:
+    """Stable hash of the corpus (and tokenizer vocabulary), used to invalidate the on-disk index."""
+    digest = hashlib.sha256(str(INDEX_VERSION).encode())
+    digest.update(" ".join(sorted(STOP_WORDS)).encode())
+    for doc in docs:
+        digest.update(json.dumps(doc, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# ==================== BM25 Index ====================
+
+class LocalSearchIndex:
+    """Okapi BM25 inverted index over the bundled corpus."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs: List[Dict[str, str]] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, List[List[int]]] = {}   # term -> [[doc_id, tf], ...]
+        self.avg_length = 0.0
+        self.fingerprint = ""
+
+    def build(self, docs: List[Dict[str, str]]) -> "LocalSearchIndex":
+        self.docs = docs
+        self.postings = {}
+        self.doc_lengths = []
+        for doc_id, doc in enumerate(docs):
+            # Titles carry the topic names, so weight them double
+            tokens = tokenize(doc["title"]) * 2 + tokenize(doc["text"])
+            self.doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self.postings.setdefault(term, []).append([doc_id, tf])
+        self.avg_length = sum(self.doc_lengths) / len(self.doc_lengths) if docs else 0.0
+        self.fingerprint = corpus_fingerprint(docs)
+        return self
+
+    def search(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
+        """Top-k documents with BM25 score and query-term coverage (0-1)."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.docs:
+            return []
+
+        n_docs = len(self.docs)
+        scores: Dict[int, float] = {}
+        matched: Dict[int, int] = {}
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                matched[doc_id] = matched.get(doc_id, 0) + 1
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            {**self.docs[doc_id], "score": round(score, 3), "coverage": matched[doc_id] / len(terms)}
+            for doc_id, score in ranked
+        ]
+
+    def is_confident(self, results: List[Dict[str, Any]]) -> bool:
+        """Whether the best local hit is good enough to skip web search."""
+        if not results:
+            return False
+        best = results[0]
+        return (best["score"] >= LOCAL_SEARCH_CONFIG["min_score"]
+                and best["coverage"] >= LOCAL_SEARCH_CONFIG["min_coverage"])
+
+    # ==================== Persistence ====================
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": INDEX_VERSION, "fingerprint": self.fingerprint, "k1": self.k1, "b": self.b,
+                "docs": self.docs, "doc_lengths": self.doc_lengths, "postings": self.postings,
+                "avg_length": self.avg_length
+            }, f, ensure_ascii=False)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["LocalSearchIndex"]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != INDEX_VERSION:
+            return None
+        index = cls(k1=data["k1"], b=data["b"])
+        index.docs = data["docs"]
+        index.doc_lengths = data["doc_lengths"]
+        index.postings = data["postings"]
+        index.avg_length = data["avg_length"]
+        index.fingerprint = data["fingerprint"]
+        return index
+
+
+def load_or_build_index(path: Optional[Path] = None, rebuild: bool = False) -> LocalSearchIndex:
+    """Load the cached index, rebuilding it if missing, stale or explicitly requested."""
+    path = Path(path or LOCAL_SEARCH_CONFIG["index_path"])
+    docs = build_corpus()
+    if not rebuild:
+        index = LocalSearchIndex.load(path)
+        if index and index.fingerprint == corpus_fingerprint(docs):
+            return index
+    index = LocalSearchIndex().build(docs)
+    try:
+        index.save(path)
+    except OSError:
+        pass  # Read-only deployments still get an in-memory index
+    return index
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Render hits in the same context format as web search results."""
+    return "".join(
+        f"- Title: {r['title']}\n  Source: {r['source']} (local)\n  Summary: {r['text'][:600]}\n\n"
+        for r in results
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or query the local TEF retrieval index.")
+    parser.add_argument("--rebuild", action="store_true", help="Force a rebuild of the cached index")
+    parser.add_argument("query", nargs="*", help="Optional query to run against the index")
+    args = parser.parse_args()
+
+    index = load_or_build_index(rebuild=args.rebuild)
+    print(f"Index: {len(index.docs)} documents, {len(index.postings)} terms -> {LOCAL_SEARCH_CONFIG['index_path']}")
+    if args.query:
+        results = index.search(" ".join(args.query))
+        print(f"Confident: {index.is_confident(results)}")
+        print(format_results(results))
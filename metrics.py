@@ -0,0 +1,57 @@
+"""
+TEF Master Local - Metrics Module
+Thread-safe, in-process recorder for AI pipeline timings and counters.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+
+class MetricsRecorder:
+    """Keeps the most recent events (per-call records) plus running counters."""
+
+    def __init__(self, max_events: int = 1000):
+        self._events = deque(maxlen=max_events)
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, **fields) -> Dict[str, Any]:
+        """Append an event like record("ollama_call", load_ms=..., eval_ms=...)."""
+        event = {"kind": kind, "ts": time.time(), **fields}
+        with self._lock:
+            self._events.append(event)
+        return event
+
+    def increment(self, counter: str, amount: float = 1):
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+
+    def counter(self, counter: str) -> float:
+        with self._lock:
+            return self._counters.get(counter, 0)
+
+    def recent(self, kind: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent events (newest last), optionally filtered by kind."""
+        with self._lock:
+            events = [e for e in self._events if kind is None or e["kind"] == kind]
+        return events[-limit:]
+
+    def last(self, kind: str) -> Optional[Dict[str, Any]]:
+        events = self.recent(kind, limit=1)
+        return events[0] if events else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus the recent event log, e.g. for dumping to JSON."""
+        with self._lock:
+            return {"counters": dict(self._counters), "events": list(self._events)}
+
+    def reset(self):
+        with self._lock:
+            self._events.clear()
+            self._counters.clear()
+
+
+# Global instance
+metrics = MetricsRecorder()
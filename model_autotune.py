@@ -0,0 +1,229 @@
+"""
+TEF Master Local - Local Model Autotuner
+Benchmarks the chat models installed in Ollama on a short fixed prompt suite (one prompt per task
+type) and records, per model and task, prompt-eval and generation speed (tokens/s) and JSON
+validity. The best model per task for this machine is saved to a profile file that OllamaProvider
+reads at startup.
+
+The profile is keyed by a fingerprint of the installed models (names and digests), so it is only
+re-run when a model is pulled, updated or removed.
+
+Usage:
+    python model_autotune.py            # Tune if the installed models changed
+    python model_autotune.py --force --repeats 3
+"""
+
+import hashlib
+import json
+import platform
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import ollama
+
+from config import GENERATION_PROFILES, MODEL_AUTOTUNE_CONFIG, MODEL_ROUTER_CONFIG, OLLAMA_CONFIG
+
+# Same wording as ai_handler.JSON_INSTRUCTION (not imported: ai_handler imports this module)
+JSON_INSTRUCTION = "CRITICAL: RESPONSE MUST BE VALID MINIFIED JSON. NO MARKDOWN."
+
+
+def _valid_questions(data: Any) -> bool:
+    return isinstance(data, list) and bool(data) and all(
+        isinstance(q, dict) and {"question", "answer"} <= q.keys() for q in data)
+
+
+def _valid_grade(data: Any) -> bool:
+    return isinstance(data, dict) and isinstance(data.get("score"), (int, float)) and "feedback" in data
+
+
+# One fixed prompt per task type (generation profile); JSON tasks come with a shape check
+SUITE: Dict[str, Dict[str, Any]] = {
+    "questions": {
+        "prompt": "Create 3 fill-in-the-blank French questions about the passé composé. Return a JSON array "
+                  "of objects with keys: question (with ___ for the blank), answer, explanation.",
+        "validate": _valid_questions,
+    },
+    "grading": {
+        "prompt": "Grade ONLY the grammar of this TEF essay on a 0-150 scale. Return JSON with keys: score, "
+                  "feedback, suggestions.\n\nEssay: Hier je suis allé au marché avec mes amis. Nous avons acheté "
+                  "des légumes et nous sommes rentré tard. C'était une belle journée mais il faisait froid.",
+        "validate": _valid_grade,
+    },
+    "explanation": {
+        "prompt": "Explain in a short paragraph, for a B1 learner, when French uses the subjonctif after "
+                  "'bien que' and 'pour que'. Give two examples.",
+    },
+    "chat": {
+        "prompt": "Comment dit-on « I have been living here for two years » en français ? Réponds brièvement.",
+    },
+}
+
+
+def is_chat_model(model: Any) -> bool:
+    """Embedding-only models can't answer the suite."""
+    family = (getattr(model.details, "family", "") or "").lower() if model.details else ""
+    return "embed" not in model.model.lower() and "bert" not in family
+
+
+def fingerprint(models: List[Any]) -> str:
+    """Changes whenever a model is pulled, updated (new digest) or removed."""
+    keys = sorted(f"{m.model}@{m.digest}" for m in models)
+    return hashlib.sha256("\n".join(keys).encode("utf-8")).hexdigest()[:16]
+
+
+def load_profile(path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path or MODEL_AUTOTUNE_CONFIG['path'], encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_profile(profile: Dict[str, Any], path: Optional[Path] = None):
+    path = Path(path or MODEL_AUTOTUNE_CONFIG['path'])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=1)
+    tmp.replace(path)
+
+
+# ==================== Benchmark ====================
+
+def _run_task(client: ollama.Client, model: str, task: str, max_tokens: int, run: int = 0) -> Dict[str, Any]:
+    spec = SUITE[task]
+    profile = GENERATION_PROFILES[task]
+    json_mode = "validate" in spec
+    messages = [{"role": "system", "content": JSON_INSTRUCTION}] if json_mode else []
+    messages.append({"role": "user", "content": spec["prompt"]})
+    # Ollama reuses the KV cache of a matching prompt prefix; a different first line on every run
+    # keeps repeats from measuring a cached prompt evaluation
+    messages[0] = {**messages[0], "content": f"[run {run}-{time.time_ns()}]\n" + messages[0]["content"]}
+
+    start = time.perf_counter()
+    response = client.chat(
+        model=model, messages=messages, format="json" if json_mode else "",
+        options={"num_predict": min(max_tokens, profile["max_tokens"]), "num_ctx": profile["num_ctx"],
+                 "temperature": profile["temperature"]},
+        keep_alive=OLLAMA_CONFIG['keep_alive']['warmup'],
+    )
+    wall = time.perf_counter() - start
+    content = response["message"]["content"]
+    if json_mode:
+        try:
+            valid = spec["validate"](json.loads(content.replace("```json", "").replace("```", "").strip()))
+        except ValueError:
+            valid = False
+    else:
+        valid = bool(content.strip())
+
+    def per_second(count_field: str, duration_field: str) -> Optional[float]:
+        count, duration = getattr(response, count_field, None) or 0, getattr(response, duration_field, None) or 0
+        return count / (duration / 1e9) if count and duration else None
+
+    return {
+        "wall_s": wall,
+        "prompt_tokens": getattr(response, "prompt_eval_count", None) or 0,
+        "prompt_tps": per_second("prompt_eval_count", "prompt_eval_duration"),
+        "gen_tps": per_second("eval_count", "eval_duration"),
+        "valid": valid,
+    }
+
+
+def _median(values: List[float]) -> Optional[float]:
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+def benchmark_model(client: ollama.Client, model: str, repeats: int, max_tokens: int) -> Dict[str, Any]:
+    """Load time, then per-task medians over `repeats` runs."""
+    start = time.perf_counter()
+    client.generate(model=model, prompt="", keep_alive=OLLAMA_CONFIG['keep_alive']['warmup'])
+    result: Dict[str, Any] = {"load_s": round(time.perf_counter() - start, 3), "tasks": {}}
+    for task in SUITE:
+        runs = [_run_task(client, model, task, max_tokens, run) for run in range(repeats)]
+        prompt_tps = _median([r["prompt_tps"] for r in runs])
+        gen_tps = _median([r["gen_tps"] for r in runs])
+        prompt_tokens = _median([r["prompt_tokens"] for r in runs]) or 0
+        # Expected latency at the task's full output budget, so short answers don't flatter a model
+        expected_s = (prompt_tokens / prompt_tps if prompt_tps else 0) + (
+            GENERATION_PROFILES[task]["max_tokens"] / gen_tps if gen_tps else float("inf"))
+        result["tasks"][task] = {
+            "prompt_tps": round(prompt_tps, 1) if prompt_tps else None,
+            "gen_tps": round(gen_tps, 1) if gen_tps else None,
+            "wall_s": round(_median([r["wall_s"] for r in runs]), 3),
+            "expected_s": round(expected_s, 3),
+            "json_validity": sum(r["valid"] for r in runs) / len(runs),
+        }
+    return result
+
+
+def pick_best(results: Dict[str, Dict[str, Any]], validity_floor: float) -> Dict[str, str]:
+    """Fastest model meeting the validity floor, per task; "default" is the fastest overall among the
+    models that meet the floor on every task."""
+    best: Dict[str, str] = {}
+    for task in SUITE:
+        qualified = [(r["tasks"][task]["expected_s"], model) for model, r in results.items()
+                     if task in r["tasks"] and r["tasks"][task]["json_validity"] >= validity_floor]
+        if qualified:
+            best[task] = min(qualified)[1]
+    all_round = [(sum(t["expected_s"] for t in r["tasks"].values()), model) for model, r in results.items()
+                 if all(t["json_validity"] >= validity_floor for t in r["tasks"].values())]
+    if all_round:
+        best["default"] = min(all_round)[1]
+    return best
+
+
+def autotune(host: Optional[str] = None, force: bool = False, repeats: Optional[int] = None,
+             path: Optional[Path] = None, log: Callable[[str], None] = lambda message: None) -> Optional[Dict[str, Any]]:
+    """Benchmark the installed models if they changed since the last profile; returns the profile."""
+    host = host or (OLLAMA_CONFIG['base_url'] if isinstance(OLLAMA_CONFIG['base_url'], str)
+                    else OLLAMA_CONFIG['base_url'][0])
+    client = ollama.Client(host=host, timeout=OLLAMA_CONFIG['timeout'])
+    models = [m for m in client.list().models if is_chat_model(m)]
+    current = fingerprint(models)
+    profile = load_profile(path)
+    if profile and profile.get("fingerprint") == current and not force:
+        log(f"Installed models unchanged ({current}); keeping {path or MODEL_AUTOTUNE_CONFIG['path']}")
+        return profile
+
+    repeats = repeats or MODEL_AUTOTUNE_CONFIG['repeats']
+    results: Dict[str, Dict[str, Any]] = {}
+    for model in models:
+        log(f"Benchmarking {model.model} ...")
+        try:
+            results[model.model] = benchmark_model(client, model.model, repeats, MODEL_AUTOTUNE_CONFIG['max_tokens'])
+        except Exception as e:
+            log(f"  skipped: {e}")
+    profile = {
+        "fingerprint": current,
+        "created_at": time.time(),
+        "host": host,
+        "machine": {"platform": platform.platform(), "processor": platform.processor() or platform.machine()},
+        "models": results,
+        "best": pick_best(results, MODEL_ROUTER_CONFIG['json_validity_floor']),
+    }
+    save_profile(profile, path)
+    return profile
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark installed Ollama models and pick the best per task.")
+    parser.add_argument("--host", help="Ollama URL (defaults to the first configured host)")
+    parser.add_argument("--force", action="store_true", help="Re-run even if the installed models are unchanged")
+    parser.add_argument("--repeats", type=int, help="Runs per task and model (median is kept)")
+    args = parser.parse_args()
+
+    profile = autotune(args.host, args.force, args.repeats, log=print)
+    for model, result in profile["models"].items():
+        print(f"\n{model} (load {result['load_s']:.1f}s)")
+        for task, stats in result["tasks"].items():
+            print(f"  {task:12s} prompt {stats['prompt_tps'] or 0:7.1f} tok/s  gen {stats['gen_tps'] or 0:6.1f} tok/s  "
+                  f"expected {stats['expected_s']:6.2f}s  json {stats['json_validity']:.0%}")
+    print(f"\nBest per task: {profile['best']}")
@@ -0,0 +1,159 @@
+"""
+TEF Master Local - Model Router
+Maps each task (generation profile) to an ordered list of candidate models and picks, per call,
+the fastest candidate whose observed JSON-validity rate meets the quality floor.
+
+Routes are "provider:model" strings, e.g. "ollama:gemma3:4b" or "gemini:gemma-3-27b-it".
+Latency and validity are tracked per (route, task) as exponential moving averages.
+"""
+
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import metrics
+
+
+def split_route(route: str) -> Tuple[str, str]:
+    """Split "ollama:gemma3:4b" into ("ollama", "gemma3:4b")."""
+    provider, _, model = route.partition(":")
+    return provider.lower(), model
+
+
+class RouteStats:
+    """EMA latency (successful calls) and validity (1 = usable answer, 0 = error/invalid JSON)."""
+
+    __slots__ = ("latency_s", "validity", "samples")
+
+    def __init__(self, latency_s: Optional[float] = None, validity: float = 1.0, samples: int = 0):
+        self.latency_s = latency_s
+        self.validity = validity
+        self.samples = samples
+
+    def update(self, alpha: float, latency_s: Optional[float], valid: bool):
+        # The first observation seeds the averages instead of being blended with the defaults
+        weight = 1.0 if self.samples == 0 else alpha
+        self.validity += weight * ((1.0 if valid else 0.0) - self.validity)
+        if valid and latency_s is not None:
+            self.latency_s = latency_s if self.latency_s is None else self.latency_s + alpha * (latency_s - self.latency_s)
+        self.samples += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"latency_s": self.latency_s, "validity": round(self.validity, 4), "samples": self.samples}
+
+
+class ModelRouter:
+    """Latency-aware, quality-floored choice among candidate models per task."""
+
+    def __init__(self, routes: Dict[str, List[str]], alpha: float = 0.2, validity_floor: float = 0.9,
+                 min_samples: int = 3, explore_rate: float = 0.05, path: Optional[Path] = None):
+        self.routes = routes
+        self.alpha = alpha
+        self.validity_floor = validity_floor
+        self.min_samples = min_samples
+        self.explore_rate = explore_rate
+        self.path = Path(path) if path else None
+        self._stats: Dict[Tuple[str, str], RouteStats] = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self._dirty = False
+        self._last_save = 0.0
+        self.load()
+
+    def candidates(self, task: str, prefer: Optional[str] = None) -> List[str]:
+        """Configured routes for `task`; `prefer` (e.g. an autotuned model) is moved to the front."""
+        routes = list(self.routes.get(task) or self.routes.get("default", []))
+        if prefer:
+            routes = [prefer] + [r for r in routes if r != prefer]
+        return routes
+
+    def stats(self, route: str, task: str) -> RouteStats:
+        with self._lock:
+            return self._stats.setdefault((route, task), RouteStats())
+
+    def rank(self, task: str, usable: Callable[[str], bool] = lambda route: True,
+             prefer: Optional[str] = None) -> List[str]:
+        """Candidates for `task` in the order they should be tried.
+
+        Qualified routes (enough samples, validity >= floor) come first, fastest first. Routes without
+        enough samples follow in configured order (they lead while nothing is qualified yet, and now and
+        then get explored). Routes below the floor come last, best validity first, as a safety net.
+        """
+        qualified, untested, below = [], [], []
+        for route in self.candidates(task, prefer):
+            if not usable(route):
+                continue
+            s = self.stats(route, task)
+            if s.samples < self.min_samples:
+                untested.append(route)
+            elif s.validity >= self.validity_floor:
+                qualified.append((s.latency_s if s.latency_s is not None else float("inf"), route))
+            else:
+                below.append((-s.validity, route))
+
+        ordered = [r for _, r in sorted(qualified)]
+        if untested and (not ordered or self._rng.random() < self.explore_rate):
+            ordered = untested + ordered
+            reason = "explore" if qualified else "warmup"
+        else:
+            ordered = ordered + untested
+            reason = "fastest_qualified"
+        ordered += [r for _, r in sorted(below)]
+        if not qualified and not untested and below:
+            reason = "below_floor"
+
+        if ordered:
+            chosen = self.stats(ordered[0], task)
+            metrics.increment(f"route_{task}_{ordered[0]}")
+            metrics.record("model_route", task=task, chosen=ordered[0], reason=reason, order=ordered,
+                           latency_ema_s=chosen.latency_s, validity_ema=round(chosen.validity, 4))
+        return ordered
+
+    def observe(self, route: str, task: str, latency_s: float, valid: bool):
+        """Feed back one call's outcome."""
+        stats = self.stats(route, task)
+        with self._lock:
+            stats.update(self.alpha, latency_s, valid)
+            self._dirty = True
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """{task: {route: stats}} for display and persistence."""
+        with self._lock:
+            items = list(self._stats.items())
+        result: Dict[str, Dict[str, Any]] = {}
+        for (route, task), s in items:
+            result.setdefault(task, {})[route] = s.as_dict()
+        return result
+
+    # ==================== Persistence ====================
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=1)
+        tmp.replace(self.path)
+        self._dirty = False
+        self._last_save = time.time()
+
+    def maybe_save(self, min_interval_s: float = 30.0):
+        if self._dirty and time.time() - self._last_save >= min_interval_s:
+            self.save()
+
+    def load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            for task, routes in data.items():
+                for route, s in routes.items():
+                    self._stats[(route, task)] = RouteStats(s.get("latency_s"), s.get("validity", 1.0), s.get("samples", 0))
@@ -5,7 +5,7 @@ Interactive Chat interface with Internet Search capabilities.
 
 import streamlit as st
 from ai_handler import ai_handler
-from config import XP_PER_SEARCH_QUERY
+from config import XP_PER_SEARCH_QUERY, TUTOR_MEMORY_CONFIG
 from database import db
 
 def render_ai_tutor():
@@ -21,11 +21,25 @@ def render_ai_tutor():
             "role": "assistant",
             "content": "Bonjour! I am your AI Tutor. I can help you with grammar, find French news, or explain cultural topics. What do you want to learn today?"
         })
+    # What the AI remembers of the conversation (bounded: recent turns + rolling summary)
+    if "tutor_memory" not in st.session_state:
+        st.session_state.tutor_memory = ai_handler.new_tutor_memory()
 
-    # Display chat messages
-    for msg in st.session_state.tutor_messages:
+    # Display chat messages: only the most recent ones, older ones on demand
+    messages = st.session_state.tutor_messages
+    page = TUTOR_MEMORY_CONFIG['visible_messages']
+    visible = st.session_state.get("tutor_visible_messages", page)
+    hidden = len(messages) - visible
+    if hidden > 0:
+        if st.button(f"⬆️ Show older messages ({hidden})", key="tutor_show_older"):
+            st.session_state.tutor_visible_messages = visible + page
+            st.rerun()
+
+    for msg in messages[-visible:]:
         with st.chat_message(msg["role"]):
             st.markdown(msg["content"])
+            if msg.get("cached"):
+                st.caption("⚡ Instant answer from cache")
 
     # Chat input
     if prompt := st.chat_input("Ask about French grammar, news, or culture..."):
@@ -37,11 +51,18 @@ def render_ai_tutor():
         # Generate response
         with st.chat_message("assistant"):
             with st.spinner("Thinking (and searching if needed)..."):
-                response = ai_handler.ask_tutor(prompt)
+                result = ai_handler.ask_tutor_with_meta(prompt, memory=st.session_state.tutor_memory)
+                response = result["answer"]
                 st.markdown(response)
+                if result["cached"]:
+                    st.caption("⚡ Instant answer from cache")
                 
                 # Add assistant message
-                st.session_state.tutor_messages.append({"role": "assistant", "content": response})
+                st.session_state.tutor_messages.append(
+                    {"role": "assistant", "content": response, "cached": result["cached"]}
+                )
+                # Display history is capped too (the AI's memory is already bounded)
+                del st.session_state.tutor_messages[:-TUTOR_MEMORY_CONFIG['max_stored_messages']]
                 
                 # Award XP (once per query)
                 # Simple check to avoid spamming XP: just add it. Gamification is for fun.
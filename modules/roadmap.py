@@ -187,7 +187,7 @@ def render_grammar_lab(week_data: dict):
                 if not already_answered and user_answer.strip():
                     if st.button("✅ Check Answer", key=f"check_{idx}", use_container_width=True):
                         result = ai_handler.grade_fill_in_blank(
-                            user_answer, q["answer"]
+                            user_answer, q["answer"], exact=q.get("source") == "local"
                         )
                         st.session_state.grammar_results[answer_key] = result
                         
@@ -252,22 +252,26 @@ def render_reading_lounge(week_data: dict):
     selected_topic = st.selectbox("Select Reading Topic", topics, key="reading_topic")
     
     if st.button("📰 Generate Article", key="gen_article"):
-        with show_loading_spinner("Generating authentic French article..."):
-            article = ai_handler.generate_reading_article(
+        with show_loading_spinner("Generating authentic French article and questions..."):
+            bundle = ai_handler.generate_reading_bundle(
                 selected_topic, 
-                difficulty=week_data["level"]
+                difficulty=week_data["level"],
+                count=5
             )
-            st.session_state.reading_article = article
-        
-        with show_loading_spinner("Creating comprehension questions..."):
-            questions = ai_handler.generate_reading_questions(article, count=5)
-            st.session_state.reading_questions = questions
+            st.session_state.reading_article = bundle["article"]
+            st.session_state.reading_questions = bundle["questions"]
             st.session_state.reading_results = {}
+            st.session_state.reading_stats = bundle
     
     # Display article
     if "reading_article" in st.session_state:
         with st.expander("📄 Article", expanded=True):
             st.markdown(st.session_state.reading_article)
+        stats = st.session_state.get("reading_stats")
+        if stats:
+            mode_label = {"bundle": "single call", "bundle_fallback": "two-step fallback", "two_step": "two-step"}
+            st.caption(f"⏱️ Generated in {stats['latency_ms'] / 1000:.1f}s · ~{stats['prompt_tokens_est']} prompt tokens "
+                       f"· {mode_label.get(stats['mode'], stats['mode'])}")
     
     # Display questions
     if "reading_questions" in st.session_state:
@@ -326,7 +330,7 @@ def render_reading_lounge(week_data: dict):
             db.save_progress(week_data["week"], "reading", True, score)
             
             if st.button("🔄 Try Another Article"):
-                for key in ["reading_article", "reading_questions", "reading_results"]:
+                for key in ["reading_article", "reading_questions", "reading_results", "reading_stats"]:
                     if key in st.session_state:
                         del st.session_state[key]
                 st.rerun()
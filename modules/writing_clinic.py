@@ -3,12 +3,19 @@ TEF Master Local - Enhanced Writing Clinic Module
 AI-powered essay grading with TEF rubric feedback + Research-based prompts.
 """
 
+import re
+import time
+
 import streamlit as st
 from database import db
-from ai_handler import ai_handler
-from components.progress_bar import show_loading_spinner
-from config import XP_PER_WRITING_SUBMISSION, TEF_SCORE_MAX
+from config import XP_PER_WRITING_SUBMISSION, TEF_SCORE_MAX, GRADING_JOBS_CONFIG, WRITING_CHECKER_CONFIG
 from data.writing_prompts import get_all_prompts, get_prompts_by_type, get_random_prompt
+from essay_analysis import provisional_score
+from essay_history import essay_history
+from grading_jobs import grading_jobs
+from writing_checker import writing_checker
+
+_MARKDOWN_SPECIAL_RE = re.compile(r"([\\`*_\[\]<>#~$|])")
 
 
 def render_writing_clinic():
@@ -101,7 +108,9 @@ def render_writing_clinic():
             "Type your essay in French:",
             height=300,
             key="essay_input",
-            placeholder="Écrivez votre texte ici..."
+            placeholder="Écrivez votre texte ici...",
+            on_change=autosave_essay,
+            args=(prompt['id'],)
         )
         
         # Word count
@@ -119,6 +128,9 @@ def render_writing_clinic():
                 st.warning("⚠️ Too long")
             else:
                 st.info("ℹ️ Add more words")
+
+        if essay and WRITING_CHECKER_CONFIG['enabled']:
+            render_writing_feedback(essay)
         
         # Grade button
         col1, col2 = st.columns([1, 3])
@@ -126,16 +138,24 @@ def render_writing_clinic():
             grade_button = st.button("🎯 Grade My Essay", disabled=word_count < 20)
         
         if grade_button:
-            with show_loading_spinner("Analyzing your essay according to TEF rubric..."):
-                grading = ai_handler.grade_essay(essay, prompt['type'])
-                st.session_state.writing_grading = grading
-                
-                # Award XP
-                db.add_xp(XP_PER_WRITING_SUBMISSION, f"Writing: {prompt['topic']}")
-                
-                # Save progress
-                db.save_progress(0, "writing", True, grading["total_score"])
-        
+            # Grading runs as a background job; the page shows a local estimate until it lands
+            st.session_state.writing_job = {
+                "id": grading_jobs.submit(db.user_id, essay, prompt['type']),
+                "revision": essay_history.save_draft(db.user_id, prompt['id'], essay),
+                "prompt_id": prompt['id'],
+                "topic": prompt['topic'],
+                "provisional": provisional_score(essay, prompt),
+            }
+            st.session_state.pop("writing_grading", None)
+            st.session_state.pop("writing_error", None)
+
+        if "writing_job" in st.session_state:
+            render_pending_grading()
+        elif "writing_error" in st.session_state:
+            st.error(f"❌ Grading failed: {st.session_state.writing_error}. Try grading again.")
+
+        render_draft_history(prompt)
+
         # Display grading results
         if "writing_grading" in st.session_state:
             st.markdown("---")
@@ -172,20 +192,131 @@ def render_writing_clinic():
                 st.metric("Grammar", f"{grading['grammar_score']}/150")
                 with st.expander("Grammar Feedback"):
                     st.markdown(grading["grammar_feedback"])
-            
+
+            if grading.get("failed_criteria"):
+                st.warning(f"⚠️ Could not grade: {', '.join(grading['failed_criteria'])}. Try grading again.")
+
             # Suggestions
             st.markdown("### 💡 Improvement Suggestions")
             for i, suggestion in enumerate(grading.get("suggestions", []), 1):
                 st.markdown(f"{i}. {suggestion}")
             
-            st.success(f"🎉 Essay graded! +{XP_PER_WRITING_SUBMISSION} XP earned")
+            if st.session_state.get("writing_xp_awarded"):
+                st.success(f"🎉 Essay graded! +{XP_PER_WRITING_SUBMISSION} XP earned")
+            else:
+                st.info("♻️ Same essay as before: showing the stored grade (no extra XP)")
             
             # Reset button
             if st.button("📝 Try Another Prompt"):
                 del st.session_state.writing_grading
                 del st.session_state.selected_prompt
+                st.session_state.pop("writing_job", None)
                 if 'essay_input' in st.session_state:
                     del st.session_state.essay_input
                 st.rerun()
     else:
         st.info("👆 Click a button above to get started with a writing prompt!")
+
+
+def autosave_essay(prompt_id: str):
+    """Essay text changed: save a draft once editing pauses (debounced in essay_history)."""
+    essay_history.autosave(db.user_id, prompt_id, st.session_state.get("essay_input", ""))
+
+
+def render_writing_feedback(essay: str):
+    """Local checker findings under the essay, each shown in its context with the flagged words
+    highlighted. Only edited sentences are re-checked, so this runs on every edit."""
+    issues = writing_checker.check(essay)
+    if not issues:
+        return
+
+    def md(text: str) -> str:
+        return _MARKDOWN_SPECIAL_RE.sub(r"\\\1", text.replace("\n", " "))
+
+    with st.container(border=True):
+        st.markdown(f"**✏️ Quick check: {len(issues)} thing(s) to review**")
+        for issue in issues[:WRITING_CHECKER_CONFIG['max_shown']]:
+            # Up to ~40 characters either side, cut back to whole words
+            before = essay[max(0, issue['start'] - 40):issue['start']]
+            if issue['start'] > 40:
+                before = "…" + before.split(" ", 1)[-1]
+            after = essay[issue['end']:issue['end'] + 40]
+            if issue['end'] + 40 < len(essay):
+                after = after.rsplit(" ", 1)[0] + "…"
+            st.markdown(f"{md(before)}:red-background[{md(issue['text'])}]{md(after)} → **{md(issue['suggestion'])}**")
+            st.caption(issue['message'])
+        hidden = len(issues) - WRITING_CHECKER_CONFIG['max_shown']
+        if hidden > 0:
+            st.caption(f"…and {hidden} more.")
+
+
+def restore_draft(prompt_id: str, rev: int):
+    text = essay_history.load(db.user_id, prompt_id, rev)
+    if text is not None:
+        st.session_state.essay_input = text
+
+
+def render_draft_history(prompt):
+    """Saved drafts and grade trend for this prompt. Only metadata is listed; a draft's text is
+    loaded when it is restored."""
+    revisions = essay_history.history(db.user_id, prompt['id'])
+    if not revisions:
+        return
+
+    with st.expander(f"🕘 Draft History ({len(revisions)} saved)"):
+        graded = [r for r in revisions if r["total_score"] is not None]
+        if len(graded) > 1:
+            st.markdown("**Score across drafts**")
+            st.line_chart({"Draft": [r["rev"] for r in graded], "Total": [r["total_score"] for r in graded]},
+                          x="Draft", y="Total")
+
+        for r in reversed(revisions[-10:]):
+            saved = time.strftime("%d %b %H:%M", time.localtime(r["created_at"]))
+            score = f" — **{r['total_score']}/{TEF_SCORE_MAX}**" if r["total_score"] is not None else ""
+            st.markdown(f"Draft {r['rev']} · {saved} · {r['word_count']} words{score}")
+
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            rev = st.selectbox("Restore a draft:", [r["rev"] for r in reversed(revisions)],
+                               format_func=lambda n: f"Draft {n}", key="draft_to_restore")
+        with col2:
+            st.button("↩️ Restore", on_click=restore_draft, args=(prompt['id'], rev))
+
+
+@st.fragment(run_every=GRADING_JOBS_CONFIG['poll_interval_s'])
+def render_pending_grading():
+    """Provisional estimate while the grading job runs; polls the job and swaps in the AI grade."""
+    pending = st.session_state.get("writing_job")
+    if pending is None:
+        return
+    job = grading_jobs.get(pending["id"])
+
+    if job is None or job["status"] == "failed":
+        st.session_state.writing_error = job["error"] if job else "grading job not found"
+        del st.session_state.writing_job
+        st.rerun()
+
+    if job["status"] == "done":
+        grading = job["result"]
+        st.session_state.writing_grading = grading
+        del st.session_state.writing_job
+        # XP and progress once per essay, however many times it is resubmitted
+        st.session_state.writing_xp_awarded = grading_jobs.claim_reward(job["id"])
+        essay_history.record_grade(db.user_id, pending["prompt_id"], pending["revision"], grading)
+        if st.session_state.writing_xp_awarded:
+            db.add_xp(XP_PER_WRITING_SUBMISSION, f"Writing: {pending['topic']}")
+            db.save_progress(0, "writing", True, grading["total_score"])
+        st.rerun()
+
+    provisional = pending["provisional"]
+    if job["status"] == "queued" and job["position"]:
+        st.caption(f"⏳ Waiting for the grader ({job['position']} essay(s) ahead)... You can switch pages, the grade is kept.")
+    else:
+        st.caption("⏳ AI grading in progress... You can switch pages, the grade is kept.")
+    st.caption("Provisional estimate (local, approximate):")
+    col1, col2, col3, col4 = st.columns(4)
+    margin = provisional['uncertainty']
+    col1.metric("Estimated Total", f"~{provisional['total_score']}/{TEF_SCORE_MAX}")
+    col2.metric("Structure", f"{provisional['structure_score']} ± {margin}")
+    col3.metric("Vocabulary", f"{provisional['vocabulary_score']} ± {margin}")
+    col4.metric("Grammar", f"{provisional['grammar_score']} ± {margin}")
@@ -0,0 +1,267 @@
+"""
+TEF Master Local - Ollama Host Pool
+Spreads local AI requests over one or more Ollama servers. Each request goes to the healthy host
+expected to finish it first: its requests in flight (plus this one) times its recent service time
+per request, so a faster machine takes a larger share. A host that keeps failing is ejected for a
+cool-down and re-admitted once a health probe (the model list endpoint) answers again.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Union
+
+import httpx
+import ollama
+
+from metrics import metrics
+
+THROUGHPUT_WINDOW_S = 60.0
+SERVICE_EWMA_ALPHA = 0.2  # Weight of the newest request in a host's service-time average
+
+
+def is_host_error(error: BaseException) -> bool:
+    """True for failures that say something about the host (unreachable, crashed, overloaded),
+    not about the request (unknown model, bad parameters, caller timeouts)."""
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code >= 500
+    return isinstance(error, (ConnectionError, httpx.TransportError))
+
+
+def model_names(listing: Any) -> set:
+    """Model names from a list() response, with and without the implicit ':latest' tag."""
+    names = {m.model for m in listing.models if m.model}
+    return names | {name.removesuffix(":latest") for name in names}
+
+
+class NoHealthyHost(ConnectionError):
+    """Every configured Ollama host is ejected or unreachable."""
+
+
+class OllamaHost:
+    """One Ollama server: its clients, health state and load/throughput counters."""
+
+    def __init__(self, url: str, timeout: float, probe_timeout_s: float):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.client = ollama.Client(host=self.url, timeout=timeout)  # Sync: warm-up threads
+        self.probe_client = ollama.Client(host=self.url, timeout=probe_timeout_s)
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ollama.AsyncClient]" = weakref.WeakKeyDictionary()
+
+        self.healthy = False
+        self.ejected_until = 0.0
+        self.checked_at = 0.0
+        self.consecutive_failures = 0
+        self.models: Optional[set] = None
+
+        self.outstanding = 0
+        self.last_dispatch = 0.0
+        self.completed = 0
+        self.failures = 0
+        self.ejections = 0
+        self.busy_s = 0.0
+        # Latency divided by the requests in flight when it was dispatched (a host shares itself between
+        # them or queues them), averaged; None until the host completes a request
+        self.service_ewma_s: Optional[float] = None
+        self.output_tokens = 0
+        self._recent: deque = deque(maxlen=1024)  # (finished_at, output_tokens) of recent completions
+
+    @property
+    def aclient(self) -> ollama.AsyncClient:
+        """AsyncClient bound to the running event loop (httpx pools cannot be shared across loops)."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = ollama.AsyncClient(host=self.url, timeout=self.timeout)
+            self._async_clients[loop] = client
+        return client
+
+    @property
+    def state(self) -> str:
+        if self.healthy:
+            return "up"
+        return "ejected" if self.ejections and self.ejected_until > time.monotonic() else "down"
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        recent = [(t, n) for t, n in self._recent if now - t <= THROUGHPUT_WINDOW_S]
+        window = max(1.0, now - recent[0][0]) if recent else THROUGHPUT_WINDOW_S
+        return {
+            "url": self.url,
+            "state": self.state,
+            "outstanding": self.outstanding,
+            "completed": self.completed,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "avg_latency_ms": round(self.busy_s / self.completed * 1000, 1) if self.completed else None,
+            "service_ms": round(self.service_ewma_s * 1000, 1) if self.service_ewma_s is not None else None,
+            "requests_per_min": round(len(recent) * 60 / window, 1),
+            "output_tokens_per_s": round(sum(n for _, n in recent) / window, 1),
+        }
+
+
+class OllamaHostPool:
+    """Latency-weighted least-outstanding balancing with per-host health checks, ejection and re-admission."""
+
+    def __init__(self, urls: Union[str, Sequence[str]], timeout: float, eject_after: int = 2,
+                 eject_s: float = 30.0, health_interval_s: float = 15.0, probe_timeout_s: float = 2.0):
+        urls = [urls] if isinstance(urls, str) else list(urls)
+        self.hosts = [OllamaHost(url, timeout, probe_timeout_s) for url in urls]
+        self.eject_after = eject_after
+        self.eject_s = eject_s
+        self.health_interval_s = health_interval_s
+        self.probe_timeout_s = probe_timeout_s
+        self._lock = threading.Lock()
+        self._probing: set = set()
+
+    @property
+    def available(self) -> bool:
+        return any(host.healthy for host in self.hosts)
+
+    def installed_models(self) -> Optional[set]:
+        """Models pulled on at least one healthy host; None if no host has reported its list yet."""
+        lists = [host.models for host in self.hosts if host.healthy and host.models is not None]
+        return set().union(*lists) if lists else None
+
+    # ==================== Health ====================
+
+    def _probe_due(self, host: OllamaHost, now: float) -> bool:
+        if host in self._probing:
+            return False
+        if host.healthy:
+            return now - host.checked_at >= self.health_interval_s
+        return now >= host.ejected_until
+
+    def _probe_ok(self, host: OllamaHost, listing: Any):
+        with self._lock:
+            readmitted = not host.healthy and host.ejections > 0
+            host.healthy = True
+            host.consecutive_failures = 0
+            host.models = model_names(listing)
+            host.checked_at = time.monotonic()
+        if readmitted:
+            metrics.record("ollama_host", url=host.url, event="readmitted")
+
+    def _probe_failed(self, host: OllamaHost):
+        with self._lock:
+            host.checked_at = time.monotonic()
+            if host.healthy:
+                # A busy host can miss one probe: it counts toward the same threshold as request errors
+                host.consecutive_failures += 1
+                if host.consecutive_failures >= self.eject_after:
+                    self._eject(host, f"{host.consecutive_failures} consecutive failures (health probe)")
+            else:
+                # Never up, or still down after an ejection: probe again after another cool-down
+                host.ejected_until = host.checked_at + self.eject_s
+
+    def _eject(self, host: OllamaHost, reason: str):
+        # Caller holds the lock
+        host.healthy = False
+        host.ejected_until = time.monotonic() + self.eject_s
+        host.ejections += 1
+        metrics.increment("ollama_host_ejections")
+        metrics.record("ollama_host", url=host.url, event="ejected", reason=reason)
+
+    def check(self) -> bool:
+        """Synchronously probe the hosts that are due (startup and sync availability checks)."""
+        now = time.monotonic()
+        for host in self.hosts:
+            if not self._probe_due(host, now):
+                continue
+            try:
+                listing = host.probe_client.list()
+            except Exception:
+                self._probe_failed(host)
+            else:
+                self._probe_ok(host, listing)
+        return self.available
+
+    async def _aprobe(self, host: OllamaHost):
+        try:
+            listing = await asyncio.wait_for(host.aclient.list(), self.probe_timeout_s)
+        except Exception:
+            self._probe_failed(host)
+        else:
+            self._probe_ok(host, listing)
+        finally:
+            self._probing.discard(host)
+
+    async def arefresh(self) -> bool:
+        """Probe the hosts that are due. Probes run in the background while some host is healthy,
+        so a slow or dead host never delays a request; otherwise they are awaited."""
+        now = time.monotonic()
+        due = [h for h in self.hosts if self._probe_due(h, now)]
+        self._probing.update(due)
+        probes = [asyncio.ensure_future(self._aprobe(h)) for h in due]
+        if probes and not self.available:
+            await asyncio.gather(*probes)
+        return self.available
+
+    # ==================== Dispatch ====================
+
+    def pick(self, model: Optional[str] = None, exclude: Sequence[OllamaHost] = ()) -> OllamaHost:
+        """Reserve the healthy host with the lowest expected completion time, (in flight + 1) x recent
+        service time, preferring hosts known to have `model` pulled. Hosts without a measured request yet
+        score 0, so each is tried early; ties go to the fewest in flight, then the least recently used."""
+        with self._lock:
+            candidates = [h for h in self.hosts if h.healthy and h not in exclude]
+            if not candidates:
+                raise NoHealthyHost("No healthy Ollama host available.")
+            if model:
+                candidates = [h for h in candidates if h.models is None or model in h.models] or candidates
+            host = min(candidates, key=lambda h: ((h.outstanding + 1) * (h.service_ewma_s or 0.0),
+                                                  h.outstanding, h.last_dispatch))
+            host.outstanding += 1
+            host.last_dispatch = time.monotonic()
+            return host
+
+    def release(self, host: OllamaHost, elapsed_s: float, error: Optional[BaseException] = None,
+                output_tokens: int = 0, in_flight: int = 1):
+        """Return a reservation and account for its outcome (`in_flight`: the host's requests in flight,
+        this one included, when it was dispatched)."""
+        with self._lock:
+            host.outstanding -= 1
+            if error is None:
+                host.completed += 1
+                host.consecutive_failures = 0
+                host.busy_s += elapsed_s
+                service_s = elapsed_s / max(1, in_flight)
+                host.service_ewma_s = service_s if host.service_ewma_s is None else \
+                    (1 - SERVICE_EWMA_ALPHA) * host.service_ewma_s + SERVICE_EWMA_ALPHA * service_s
+                host.output_tokens += output_tokens
+                host._recent.append((time.monotonic(), output_tokens))
+            elif is_host_error(error):
+                host.failures += 1
+                host.consecutive_failures += 1
+                if host.healthy and host.consecutive_failures >= self.eject_after:
+                    self._eject(host, f"{host.consecutive_failures} consecutive failures")
+
+    async def arun(self, call: Callable[[OllamaHost], Awaitable[Any]], model: Optional[str] = None) -> Any:
+        """Run `call(host)` on the least-loaded healthy host. A host failure is retried once on every
+        other healthy host before giving up; request errors and cancellation propagate immediately."""
+        await self.arefresh()
+        tried: List[OllamaHost] = []
+        while True:
+            host = self.pick(model, exclude=tried)
+            in_flight = host.outstanding
+            start = time.perf_counter()
+            try:
+                result = await call(host)
+            except BaseException as e:
+                self.release(host, time.perf_counter() - start, e)
+                tried.append(host)
+                if isinstance(e, Exception) and is_host_error(e) and any(
+                        h.healthy and h not in tried for h in self.hosts):
+                    metrics.increment("ollama_host_retries")
+                    continue
+                raise
+            output_tokens = getattr(result, "eval_count", None) or 0
+            self.release(host, time.perf_counter() - start, output_tokens=output_tokens, in_flight=in_flight)
+            return result
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-host state, load and throughput, for display and benchmarks."""
+        with self._lock:
+            return [host.stats() for host in self.hosts]
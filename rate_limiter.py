@@ -0,0 +1,181 @@
+"""
+TEF Master Local - Client-side Rate Limiting
+Token buckets for a cloud API quota (requests/min and tokens/min), shared per API key, plus the
+retry policy for quota and transient errors: jittered exponential backoff that honours the
+server's retry-after hint.
+
+Requests reserve capacity up front and wait their turn (first come, first served) instead of
+bursting into 429s; a 429 pauses the whole bucket until the hinted time, so throughput settles at
+the quota ceiling rather than oscillating between bursts and errors.
+"""
+
+import asyncio
+import hashlib
+import random
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+from metrics import metrics
+
+_RETRY_IN_RE = re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE)
+_RETRY_DELAY_RE = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)(?:\s*nanos:\s*(\d+))?", re.IGNORECASE)
+
+# HTTP status codes worth retrying: quota (429) and transient server errors
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+class QuotaWaitTooLong(Exception):
+    """The quota would only admit the request after the caller's deadline."""
+
+
+class TokenBucket:
+    """Refills at `per_minute / 60` units per second up to `capacity`. Reservations may push the level
+    below zero; the deficit is the queue, and each reservation waits until its share is refilled."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take `amount` and return the seconds until it is covered."""
+        self._refill(now)
+        self.level -= min(amount, self.capacity)  # Oversized requests wait for a full bucket, not forever
+        return max(0.0, -self.level / self.rate)
+
+    def refund(self, amount: float, now: float):
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """Requests/min and tokens/min buckets for one API key."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, name: str = "api",
+                 burst_s: float = 60.0):
+        # burst_s: how many seconds' worth of quota may go out at once (a full minute by default)
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute * burst_s / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute * burst_s / 60)
+        self.paused_until = 0.0
+        self.waiting = 0  # Requests currently queued
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.requests.reserve(1, now), self.tokens.reserve(tokens, now))
+            return max(wait, self.paused_until - now)
+
+    def _refund(self, requests: int, tokens: int):
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refund(requests, now)
+            self.tokens.refund(tokens, now)
+
+    async def acquire(self, tokens: int, max_wait: Optional[float] = None) -> float:
+        """Wait until the request fits the quota; returns the seconds spent queued.
+
+        Raises QuotaWaitTooLong (without consuming quota) if that would take longer than `max_wait`.
+        """
+        wait = self._reserve(tokens)
+        if max_wait is not None and wait > max_wait:
+            self._refund(1, tokens)
+            raise QuotaWaitTooLong(f"{self.name} quota frees up in {wait:.1f}s, after the request deadline.")
+        self.waiting += 1
+        try:
+            if wait > 0:
+                await asyncio.sleep(wait)
+            # A 429 may have paused the bucket while this request was queued
+            while (paused := self.paused_until - time.monotonic()) > 0:
+                await asyncio.sleep(paused)
+                wait += paused
+        except asyncio.CancelledError:
+            self._refund(1, tokens)
+            raise
+        finally:
+            self.waiting -= 1
+        metrics.increment(f"{self.name}_queue_wait_s", wait)
+        metrics.record("rate_limit_wait", limiter=self.name, tokens=tokens, wait_s=round(wait, 3))
+        return wait
+
+    def settle(self, reserved_tokens: int, actual_tokens: int):
+        """Correct a reservation once the real token count is known."""
+        if actual_tokens < reserved_tokens:
+            self._refund(0, reserved_tokens - actual_tokens)
+        elif actual_tokens > reserved_tokens:
+            with self._lock:
+                self.tokens.reserve(actual_tokens - reserved_tokens, time.monotonic())
+
+    def pause(self, seconds: float):
+        """Hold every request (queued or new) for `seconds`, e.g. after a 429."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(api_key: str, requests_per_minute: float, tokens_per_minute: float, name: str = "api") -> RateLimiter:
+    """The shared limiter for an API key (quotas are per key, not per session or provider instance)."""
+    key = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(requests_per_minute, tokens_per_minute, name)
+        return _limiters[key]
+
+
+# ==================== Retry Policy ====================
+
+def error_code(error: BaseException) -> Optional[int]:
+    code = getattr(error, "code", None)
+    if callable(code):  # grpc errors expose code() instead of an HTTP status
+        return None
+    return code if isinstance(code, int) else getattr(error, "status_code", None)
+
+
+def is_retryable(error: BaseException) -> bool:
+    return error_code(error) in RETRYABLE_CODES
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Server-suggested delay in seconds: RetryInfo details, a Retry-After header, or "retry in Ns" text."""
+    for detail in getattr(error, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None and hasattr(delay, "seconds"):
+            return delay.seconds + getattr(delay, "nanos", 0) / 1e9
+    response = getattr(error, "response", None)
+    header = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+    text = str(error)
+    match = _RETRY_IN_RE.search(text)
+    if match:
+        return float(match.group(1))
+    match = _RETRY_DELAY_RE.search(text)
+    if match:
+        return int(match.group(1)) + int(match.group(2) or 0) / 1e9
+    return None
+
+
+def backoff_delay(attempt: int, base_s: float, max_s: float, hint_s: Optional[float] = None,
+                  rng: random.Random = random) -> float:
+    """Seconds before retry number `attempt` (0-based).
+
+    Full jitter over an exponentially growing window; a retry-after hint sets the floor, with a
+    little jitter on top so queued callers don't all come back in the same instant.
+    """
+    if hint_s is not None:
+        return hint_s + rng.uniform(0, base_s)
+    return rng.uniform(0, min(max_s, base_s * 2 ** attempt))
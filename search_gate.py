@@ -0,0 +1,105 @@
+"""
+TEF Master Local - Search Gate
+Decides whether a request needs external context, and builds a compact search query from it.
+
+Levels:
+    none   small talk / acknowledgements: no search at all
+    local  language questions the model (plus the bundled TEF material) already covers
+    web    current events, places, people, recipes, prices... anything needing fresh facts
+"""
+
+import re
+from typing import List, NamedTuple, Optional
+
+from config import SEARCH_GATE_CONFIG
+from local_search import STOP_WORDS, fold_accents
+
+# Request phrasing that carries no topic (folded, compared per token)
+INSTRUCTION_WORDS = frozenset("""
+explique expliquer explain explanation peux pourrais pouvez pourriez dire donne donner montre montrer
+aide aider help want veux voudrais would like could should je tu il nous vous moi toi svp stp merci
+thanks thank brief briefly detail details detailed example examples exemple exemples include including
+definition practical exam focused keep concrete when grammar grammaire topic sujet below ci dessous
+quel quelle quels quelles comment pourquoi quand combien est-ce qu'est-ce find search cherche chercher
+trouve trouver entre
+""".split())
+
+SMALL_TALK = frozenset("""
+bonjour bonsoir salut coucou hello hi hey merci thanks thank ok okay dac daccord parfait super genial
+cool bye revoir ciao oui non yes no va bien ca beaucoup tres much lot good great fine
+""".split())
+
+# Fresh or real-world facts the model cannot know reliably
+WEB_CUES = re.compile(
+    r"\b(news|actualite|actualites|latest|recent|today|aujourd|hier|demain|cette semaine|this week|current|"
+    r"maintenant|now|20\d\d|prix|price|cost|cout|meteo|weather|recette|recipe|restaurant|horaire|schedule|"
+    r"where|ou se trouve|who is|qui est|election|president|ministre|festival|film|movie|livre|book|site|"
+    r"website|link|lien|url|inscription|register|date|deadline|centre|center|frais|fees)\b"
+)
+
+# Language questions: answered from the model's knowledge and the bundled material
+LANGUAGE_CUES = re.compile(
+    r"\b(conjug\w*|subjonctif|subjunctive|indicatif|imparfait|passe compose|plus que parfait|futur|conditionnel|"
+    r"pronom\w*|pronoun\w*|accord\w*|agreement|article\w*|preposition\w*|adjecti\w*|adverb\w*|verbe?s?|verb\w*|"
+    r"tense\w*|temps|grammar|grammaire|translate|tradui\w*|traduction|comment dit on|how do you say|meaning|"
+    r"signifie|veut dire|synonym\w*|antonym\w*|prononc\w*|pronounc\w*|orthographe|spelling|difference|"
+    r"masculin|feminin|pluriel|plural|negation|relative?s?|tef|cefr|dele|delf)\b"
+)
+
+_WORD_RE = re.compile(r"[\w'’-]+", re.UNICODE)
+_URL_RE = re.compile(r"https?://\S+|www\.\S+")
+
+
+class SearchDecision(NamedTuple):
+    level: str   # "none" | "local" | "web"
+    query: str   # compact keyword query ("" for none)
+    reason: str
+
+
+def extract_keywords(text: str, max_terms: Optional[int] = None) -> List[str]:
+    """Topic words from a question, original spelling kept, instruction/function words dropped."""
+    max_terms = max_terms or SEARCH_GATE_CONFIG["max_keywords"]
+    keywords, seen = [], set()
+    for raw in _WORD_RE.findall(_URL_RE.sub(" ", text)):
+        word = raw.strip("'’-")
+        # Elided articles: l'imparfait -> imparfait
+        if re.match(r"^(?:[cdjlmnst]|qu)['’]", word, re.IGNORECASE):
+            word = re.split(r"['’]", word, maxsplit=1)[1]
+        folded = fold_accents(word)
+        if (len(folded) < 2 or folded in STOP_WORDS or folded in INSTRUCTION_WORDS
+                or folded in SMALL_TALK or (folded.isdigit() and len(folded) != 4) or folded in seen):
+            continue
+        seen.add(folded)
+        keywords.append(word)
+        if len(keywords) >= max_terms:
+            break
+    return keywords
+
+
+def build_query(text: str) -> str:
+    """Compact search query for `text`."""
+    return " ".join(extract_keywords(text))
+
+
+def classify(text: str) -> SearchDecision:
+    """Decide how much external context `text` needs."""
+    folded = fold_accents(text)
+    words = re.findall(r"[a-z0-9]+", folded)
+    keywords = extract_keywords(text)
+
+    if not words or all(w in SMALL_TALK or w in STOP_WORDS for w in words):
+        return SearchDecision("none", "", "small talk")
+    if not keywords:
+        return SearchDecision("none", "", "no topic words")
+
+    query = " ".join(keywords)
+    if _URL_RE.search(text) or WEB_CUES.search(folded):
+        return SearchDecision("web", query, "needs fresh facts")
+    if LANGUAGE_CUES.search(folded):
+        return SearchDecision("local", query, "language question")
+    # Capitalized words after the first one are usually names and places
+    if any(w[:1].isupper() for w in _WORD_RE.findall(text)[1:]) and len(keywords) >= 2:
+        return SearchDecision("web", query, "named entity")
+    if len(keywords) >= SEARCH_GATE_CONFIG["min_web_keywords"]:
+        return SearchDecision("web", query, "open question")
+    return SearchDecision("local", query, "short question")
@@ -0,0 +1,324 @@
+"""
+TEF Master Local - Semantic Response Cache
+Caches AI Tutor answers keyed by query embeddings, so near-identical questions
+("difference between passé composé and imparfait") are answered without a model call.
+
+Vectors are L2-normalised and stored in NumPy blocks. Small caches are searched
+exhaustively; once the cache grows past `train_at` entries the vectors are partitioned
+into k-means lists (IVF) and only the `nprobe` closest lists are scored, which keeps
+lookups sub-millisecond at 100k entries. Eviction is LRU.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class _InvertedList:
+    """Contiguous, growable block of vectors belonging to one IVF list."""
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.slots = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+
+    def append(self, slot: int, vector: np.ndarray) -> int:
+        if self.size == len(self.slots):
+            self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)])
+            self.slots = np.concatenate([self.slots, np.zeros_like(self.slots)])
+        row = self.size
+        self.vectors[row] = vector
+        self.slots[row] = slot
+        self.size += 1
+        return row
+
+    def remove(self, row: int) -> Optional[Tuple[int, int]]:
+        """Swap-remove a row. Returns (moved_slot, new_row) if another entry moved."""
+        last = self.size - 1
+        moved = None
+        if row != last:
+            self.vectors[row] = self.vectors[last]
+            self.slots[row] = self.slots[last]
+            moved = (int(self.slots[row]), row)
+        self.size -= 1
+        return moved
+
+
+class SemanticCache:
+    """Bounded LRU cache of (query embedding -> answer) with cosine top-k lookup."""
+
+    def __init__(self, max_entries: int = 5000, threshold: float = 0.92, path: Optional[Path] = None,
+                 nprobe: int = 4, train_at: int = 4096):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.path = Path(path) if path else None
+        self.nprobe = nprobe
+        self.train_at = train_at
+        # ~2*sqrt(N) lists of ~sqrt(N)/2 vectors: nprobe=4 scores ~2*sqrt(N) rows per lookup
+        self.nlist = max(1, int(2 * np.sqrt(max_entries)))
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # serializes writers; file I/O happens outside _lock
+        self._dim: Optional[int] = None
+        self._centroids: Optional[np.ndarray] = None   # None => exhaustive (single list)
+        self._lists: List[_InvertedList] = []
+        self._next_train = train_at
+
+        # Per-slot metadata
+        self._queries: List[Optional[str]] = []
+        self._answers: List[Optional[str]] = []
+        self._location: List[Tuple[int, int]] = []        # (list_id, row)
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._clock = 0
+
+        self._dirty = False
+        self._last_save = time.time()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+        if self.path:
+            self.load()
+
+    # ==================== Public API ====================
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def search(self, vector, k: int = 1) -> List[Tuple[int, float]]:
+        """Top-k (slot, cosine similarity) pairs, best first."""
+        with self._lock:
+            return self._search(self._normalize(vector), k)
+
+    def get(self, vector) -> Optional[Dict[str, Any]]:
+        """Return the cached answer if the best match clears the similarity threshold."""
+        with self._lock:
+            if self._dim is None or len(np.ravel(vector)) != self._dim:
+                self.stats["misses"] += 1
+                return None
+            matches = self._search(self._normalize(vector), 1)
+            if not matches or matches[0][1] < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            slot, similarity = matches[0]
+            self._touch(slot)
+            self.stats["hits"] += 1
+            return {"query": self._queries[slot], "answer": self._answers[slot], "similarity": similarity}
+
+    def put(self, query: str, vector, answer: str):
+        """Insert an entry, evicting the least recently used one when full."""
+        with self._lock:
+            vec = self._normalize(vector)
+            if self._dim != len(vec):
+                # First entry, or the embedding model changed: start over
+                self._reset(len(vec))
+
+            if len(self._answers) >= self.max_entries:
+                slot = int(np.argmin(self._last_used[:len(self._answers)]))
+                self._detach(slot)
+                self._queries[slot], self._answers[slot] = query, answer
+                self.stats["evictions"] += 1
+            else:
+                slot = len(self._answers)
+                self._queries.append(query)
+                self._answers.append(answer)
+                self._location.append((0, 0))
+
+            self._attach(slot, vec)
+            self._touch(slot)
+            self._dirty = True
+
+            if self._centroids is None and len(self._answers) >= self._next_train:
+                self._train()
+
+    def maybe_save(self, min_interval_s: float = 30.0):
+        """Persist if there are unsaved changes and the last save is old enough."""
+        if self._dirty and time.time() - self._last_save >= min_interval_s:
+            self.save()
+
+    def save(self):
+        """Write vectors (NumPy) and metadata (JSON) atomically to `path`.
+
+        Only the snapshot is taken under the cache lock; serialization and file writes run
+        outside it, so lookups and puts are not blocked while a save is in progress.
+        """
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if self._dim is None:
+                    return
+                count = len(self._answers)
+                vectors = self._gather_vectors()
+                list_ids = np.array([loc[0] for loc in self._location], dtype=np.int64)
+                last_used = self._last_used[:count].copy()
+                centroids = self._centroids if self._centroids is not None else np.zeros((0, self._dim), np.float32)
+                meta = {"queries": list(self._queries), "answers": list(self._answers), "clock": self._clock}
+                self._dirty = False
+                self._last_save = time.time()
+
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                npz_tmp = self.path.with_name(self.path.name + ".tmp.npz")
+                np.savez(npz_tmp, vectors=vectors, list_ids=list_ids, last_used=last_used, centroids=centroids)
+                os.replace(npz_tmp, self.path.with_suffix(".npz"))
+
+                json_tmp = self.path.with_name(self.path.name + ".tmp.json")
+                with open(json_tmp, "w", encoding="utf-8") as f:
+                    json.dump(meta, f, ensure_ascii=False)
+                os.replace(json_tmp, self.path.with_suffix(".json"))
+            except Exception:
+                self._dirty = True  # retry on the next maybe_save
+                raise
+
+    def load(self):
+        """Restore a previously saved cache. Missing or corrupt files leave the cache empty."""
+        npz_path, json_path = self.path.with_suffix(".npz"), self.path.with_suffix(".json")
+        if not npz_path.exists() or not json_path.exists():
+            return
+        try:
+            with np.load(npz_path) as data:
+                vectors, list_ids = data["vectors"], data["list_ids"]
+                last_used, centroids = data["last_used"], data["centroids"]
+            with open(json_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except Exception:
+            return
+
+        with self._lock:
+            keep = min(len(vectors), self.max_entries)
+            order = np.argsort(last_used)[-keep:]  # keep most recently used if max_entries shrank
+            self._reset(vectors.shape[1])
+            self._queries = [meta["queries"][i] for i in order]
+            self._answers = [meta["answers"][i] for i in order]
+            self._last_used[:keep] = last_used[order]
+            self._clock = int(meta.get("clock", int(last_used.max()) if len(last_used) else 0))
+            if len(centroids) and keep >= self.train_at:
+                self._centroids = centroids.astype(np.float32)
+                self._rebuild(vectors[order], list_ids[order])
+            elif keep >= self.train_at:
+                self._rebuild(vectors[order])
+                self._train()
+            else:
+                self._rebuild(vectors[order])
+
+    # ==================== Internals ====================
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def _reset(self, dim: int):
+        self._dim = dim
+        self._centroids = None
+        self._lists = [_InvertedList(dim)]
+        self._queries, self._answers, self._location = [], [], []
+        self._last_used[:] = 0
+        self._next_train = self.train_at
+
+    def _touch(self, slot: int):
+        self._clock += 1
+        self._last_used[slot] = self._clock
+
+    def _nearest_list(self, vec: np.ndarray) -> int:
+        if self._centroids is None:
+            return 0
+        return int(np.argmax(self._centroids @ vec))
+
+    def _attach(self, slot: int, vec: np.ndarray):
+        list_id = self._nearest_list(vec)
+        row = self._lists[list_id].append(slot, vec)
+        self._location[slot] = (list_id, row)
+
+    def _detach(self, slot: int):
+        list_id, row = self._location[slot]
+        moved = self._lists[list_id].remove(row)
+        if moved:
+            moved_slot, new_row = moved
+            self._location[moved_slot] = (list_id, new_row)
+
+    def _search(self, vec: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if self._dim is None or not self._answers:
+            return []
+        if self._centroids is None:
+            probe = [0]
+        else:
+            centroid_scores = self._centroids @ vec
+            nprobe = min(self.nprobe, len(centroid_scores))
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        slots, scores = [], []
+        for list_id in probe:
+            lst = self._lists[list_id]
+            if lst.size:
+                scores.append(lst.vectors[:lst.size] @ vec)
+                slots.append(lst.slots[:lst.size])
+        if not scores:
+            return []
+        scores = np.concatenate(scores) if len(scores) > 1 else scores[0]
+        slots = np.concatenate(slots) if len(slots) > 1 else slots[0]
+
+        k = min(k, len(scores))
+        if k == 1:
+            top = [int(np.argmax(scores))]
+        else:
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        return [(int(slots[i]), float(scores[i])) for i in top]
+
+    def _gather_vectors(self) -> np.ndarray:
+        """All stored vectors as one (count, dim) matrix ordered by slot."""
+        vectors = np.zeros((len(self._answers), self._dim), dtype=np.float32)
+        for lst in self._lists:
+            vectors[lst.slots[:lst.size]] = lst.vectors[:lst.size]
+        return vectors
+
+    def _rebuild(self, vectors: np.ndarray, list_ids: Optional[np.ndarray] = None):
+        """Bulk-load lists from a slot-ordered matrix (much faster than attaching one by one)."""
+        nlist = 1 if self._centroids is None else len(self._centroids)
+        if list_ids is None:
+            if self._centroids is None:
+                list_ids = np.zeros(len(vectors), dtype=np.int64)
+            else:
+                list_ids = np.concatenate([
+                    np.argmax(chunk @ self._centroids.T, axis=1)
+                    for chunk in np.array_split(vectors, max(1, len(vectors) // 4096))
+                ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+        self._lists = []
+        self._location = [(0, 0)] * len(vectors)
+        for list_id in range(nlist):
+            members = np.flatnonzero(list_ids == list_id)
+            lst = _InvertedList(self._dim, capacity=max(64, len(members) * 2))
+            lst.vectors[:len(members)] = vectors[members]
+            lst.slots[:len(members)] = members
+            lst.size = len(members)
+            for row, slot in enumerate(members.tolist()):
+                self._location[slot] = (list_id, row)
+            self._lists.append(lst)
+
+    def _train(self, iterations: int = 8):
+        """Partition the stored vectors into k-means lists (spherical k-means on a sample)."""
+        count = len(self._answers)
+        vectors = self._gather_vectors()
+
+        nlist = min(self.nlist, count)
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(count, size=min(count, nlist * 20), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+
+        self._centroids = centroids
+        self._rebuild(vectors)
+        self._next_train = float("inf")
@@ -0,0 +1,123 @@
+"""
+TEF Master Local - Tutor Conversation Memory
+Bounded multi-turn context for the AI Tutor: the most recent turns verbatim, within a token
+budget, plus a rolling summary of everything older.
+
+Turns that slide out of the window are folded into the summary in batches (previous summary +
+the new turns only), so each refresh costs about the same however long the conversation gets,
+and summarized turns are dropped. The prompt and the memory both stay bounded.
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import TUTOR_MEMORY_CONFIG
+
+ROLE_LABELS = {"user": "User", "assistant": "Tutor"}
+
+SUMMARY_SYSTEM_PROMPT = "You maintain the running summary of a French tutoring conversation."
+SUMMARY_PROMPT = """Update the summary with the new turns. Keep what the tutor needs later: the learner's level
+and goals, topics covered, mistakes they keep making, and questions still open. At most {words} words, plain text.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}"""
+
+
+class ConversationMemory:
+    """Recent turns plus a rolling summary of the older ones. Safe to read from the Streamlit
+    thread while a summary refresh runs on the AI loop."""
+
+    def __init__(self, count_tokens: Callable[[str], int], window_tokens: Optional[int] = None,
+                 summary_batch_tokens: Optional[int] = None, max_turns: Optional[int] = None):
+        self.window_tokens = window_tokens or TUTOR_MEMORY_CONFIG['window_tokens']
+        self.summary_batch_tokens = summary_batch_tokens or TUTOR_MEMORY_CONFIG['summary_batch_tokens']
+        self.max_turns = max_turns or TUTOR_MEMORY_CONFIG['max_turns']
+        self.count_tokens = count_tokens
+        self.turns: List[Tuple[str, str, int]] = []  # (role, content, tokens), oldest first
+        self.summary = ""
+        self.summarizing = False
+        self.refreshes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def empty(self) -> bool:
+        return not self.turns and not self.summary
+
+    def add(self, role: str, content: str):
+        with self._lock:
+            self.turns.append((role, content, self.count_tokens(content)))
+            if len(self.turns) > self.max_turns:
+                # Summaries keep failing: forget the oldest turns rather than grow without bound
+                del self.turns[:len(self.turns) - self.max_turns]
+
+    def _split(self, budget: int) -> int:
+        """Index of the first of the newest turns that fit `budget` tokens."""
+        used, start = 0, len(self.turns)
+        while start > 0 and used + self.turns[start - 1][2] <= budget:
+            start -= 1
+            used += self.turns[start][2]
+        return start
+
+    @staticmethod
+    def _transcript(turns: List[Tuple[str, str, int]]) -> str:
+        return "\n".join(f"{ROLE_LABELS.get(role, role)}: {content}" for role, content, _ in turns)
+
+    def render(self, query: str) -> str:
+        """The prompt for the next user message: summary, recent turns, then the message itself.
+        With no history this is just the message.
+
+        Turns that left the window but aren't in the summary yet are still sent (up to one batch),
+        so nothing drops out of view between refreshes.
+        """
+        with self._lock:
+            summary = self.summary
+            window = self.turns[self._split(self.window_tokens + self.summary_batch_tokens):]
+        if not summary and not window:
+            return query
+        parts = []
+        if summary:
+            parts.append(f"Summary of the conversation so far:\n{summary}")
+        if window:
+            parts.append(f"Recent conversation:\n{self._transcript(window)}")
+        parts.append(f"User: {query}")
+        return "\n\n".join(parts)
+
+    def search_text(self, query: str) -> str:
+        """What to search for the next user message: the message plus the previous user turn, since a
+        follow-up ("et au pluriel ?") rarely names its topic. Pair it with `summary` for more context."""
+        with self._lock:
+            previous = next((content for role, content, _ in reversed(self.turns) if role == "user"), "")
+        return f"{query}\n{previous}" if previous else query
+
+    def begin_summary(self) -> Optional[Dict[str, object]]:
+        """Claim the turns that left the window once they add up to a batch; returns the summary
+        request, or None if a refresh is already running or the batch isn't full yet."""
+        with self._lock:
+            if self.summarizing:
+                return None
+            evicted = self.turns[:self._split(self.window_tokens)]
+            if not evicted or sum(t[2] for t in evicted) < self.summary_batch_tokens:
+                return None
+            self.summarizing = True
+            prompt = SUMMARY_PROMPT.format(words=TUTOR_MEMORY_CONFIG['summary_words'],
+                                           summary=self.summary or "(empty)", turns=self._transcript(evicted))
+            return {"prompt": prompt, "turns": evicted}
+
+    def finish_summary(self, request: Optional[Dict[str, object]], summary: Optional[str]):
+        """Install a refreshed summary and drop the turns it covers; on failure (None) keep them for the
+        next attempt."""
+        if request is None:
+            return
+        with self._lock:
+            self.summarizing = False
+            if not summary:
+                return
+            # Only appends happen meanwhile, but max_turns may have trimmed the head
+            last = request["turns"][-1]
+            drop = next((i + 1 for i, turn in enumerate(self.turns) if turn is last), 0)
+            del self.turns[:drop]
+            self.summary = summary.strip()
+            self.refreshes += 1
@@ -0,0 +1,217 @@
+"""
+TEF Master Local - Web Search Stage
+Fans out a few reformulations of a query concurrently, merges and ranks the hits, then fetches the
+top pages through a bounded connection pool and extracts their readable text with BeautifulSoup.
+
+Everything runs inside one strict time budget: queries or pages that are not back in time are
+dropped (pages fall back to their search snippet), so a slow site can never stall a generation.
+"""
+
+import asyncio
+import functools
+import re
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+from bs4 import BeautifulSoup
+
+from config import WEB_SEARCH_CONFIG
+from local_search import fold_accents
+from metrics import metrics
+
+SearchFn = Callable[..., List[Dict[str, str]]]  # (query, max_results=...) -> [{title, href, body}]
+
+# Elements that never hold article text
+_NOISE_TAGS = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "iframe", "svg", "button"]
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+# ==================== Query Handling ====================
+
+def reformulate(query: str, count: int) -> List[str]:
+    """Up to `count` distinct variants of a keyword query."""
+    words = query.split()
+    variants = [query, f"{query} en français", " ".join(words[:3]), f"{query} explication"]
+    unique = []
+    for variant in variants:
+        variant = variant.strip()
+        if variant and variant.lower() not in (u.lower() for u in unique):
+            unique.append(variant)
+    return unique[:count]
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form for deduplication (no scheme/www/fragment/trailing slash)."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    return urlunsplit(("", host, parts.path.rstrip("/"), parts.query, ""))
+
+
+def _terms(text: str) -> set:
+    return set(_WORD_RE.findall(fold_accents(text)))
+
+
+def rank_results(result_lists: List[List[Dict[str, str]]], query: str) -> List[Dict[str, Any]]:
+    """Merge per-query result lists: reciprocal-rank fusion plus query-term overlap, deduped by URL."""
+    query_terms = _terms(query)
+    merged: Dict[str, Dict[str, Any]] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results):
+            href = result.get("href") or result.get("url")
+            if not href:
+                continue
+            key = normalize_url(href)
+            entry = merged.setdefault(key, {
+                "title": result.get("title", ""), "href": href, "body": result.get("body", ""), "score": 0.0
+            })
+            entry["score"] += 1.0 / (60 + rank)
+            if len(result.get("body", "")) > len(entry["body"]):
+                entry["body"] = result["body"]
+
+    for entry in merged.values():
+        if query_terms:
+            overlap = len(query_terms & _terms(f"{entry['title']} {entry['body']}")) / len(query_terms)
+            entry["score"] += 0.01 * overlap
+    return sorted(merged.values(), key=lambda e: e["score"], reverse=True)
+
+
+# ==================== Text Extraction ====================
+
+def extract_text(html: str) -> str:
+    """Readable paragraphs of an HTML page (main/article content preferred)."""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(_NOISE_TAGS):
+        tag.decompose()
+    root = soup.find("article") or soup.find("main") or soup.body or soup
+    blocks = [" ".join(el.get_text(" ", strip=True).split()) for el in root.find_all(["p", "li", "h1", "h2", "h3"])]
+    blocks = list(dict.fromkeys(b for b in blocks if len(b.split()) >= 5))  # Drop boilerplate repeats
+    if not blocks:
+        blocks = [" ".join(root.get_text(" ", strip=True).split())]
+    return "\n".join(blocks)
+
+
+def trim_to_budget(text: str, query: str, max_tokens: int) -> str:
+    """Keep the paragraphs most relevant to `query`, in page order, within ~max_tokens."""
+    budget = max_tokens * 4  # ~4 characters per token
+    if len(text) <= budget:
+        return text
+    query_terms = _terms(query)
+    paragraphs = [p for p in text.split("\n") if p.strip()]
+    ranked = sorted(range(len(paragraphs)), key=lambda i: (-len(query_terms & _terms(paragraphs[i])), i))
+    keep, used = set(), 0
+    for i in ranked:
+        if used + len(paragraphs[i]) > budget:
+            continue
+        keep.add(i)
+        used += len(paragraphs[i]) + 1
+    if not keep:
+        return paragraphs[ranked[0]][:budget]
+    return "\n".join(paragraphs[i] for i in sorted(keep))
+
+
+# ==================== Search Stage ====================
+
+class WebSearcher:
+    """Parallel multi-query search with bounded, time-boxed page fetching."""
+
+    def __init__(self, search_fn: Optional[SearchFn] = None, config: Optional[Dict[str, Any]] = None):
+        self.config = {**WEB_SEARCH_CONFIG, **(config or {})}
+        self.search_fn = search_fn
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._executor = ThreadPoolExecutor(max_workers=self.config["search_threads"], thread_name_prefix="web-search")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client for the running loop; max_connections bounds concurrent page fetches."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.config["max_connections"],
+                                    max_keepalive_connections=self.config["max_connections"]),
+                timeout=httpx.Timeout(self.config["time_budget_s"], connect=self.config["connect_timeout_s"]),
+                headers={"User-Agent": self.config["user_agent"]},
+                follow_redirects=True,
+            )
+            self._clients[loop] = client
+        return client
+
+    async def _query(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        # Own pool: abandoned (late) searches must not starve the loop's default executor
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self.search_fn, query, max_results=max_results))
+
+    async def fetch_page(self, url: str) -> Optional[str]:
+        """Page HTML, read up to max_page_bytes. None for non-HTML or failed responses."""
+        limit = self.config["max_page_bytes"]
+        async with self.client.stream("GET", url) as response:
+            if response.status_code != 200 or "html" not in response.headers.get("content-type", "html"):
+                return None
+            chunks, size = [], 0
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= limit:
+                    break
+            return b"".join(chunks)[:limit].decode(response.encoding or "utf-8", errors="replace")
+
+    async def _page_text(self, url: str, query: str, max_tokens: int, stats: Dict[str, Any]) -> Optional[str]:
+        html = await self.fetch_page(url)
+        if not html:
+            return None
+        stats["pages_fetched"] += 1
+        stats["bytes"] += len(html)
+        # Parsing is CPU-bound; keep it off the event loop and inside the page's share of the budget
+        text = await asyncio.to_thread(extract_text, html)
+        return trim_to_budget(text, query, max_tokens) if text else None
+
+    async def asearch(self, query: str, max_results: int = 3) -> List[Dict[str, str]]:
+        """Top `max_results` hits for `query`; `body` holds extracted page text when it was fetched in time."""
+        start = time.perf_counter()
+        deadline = start + self.config["time_budget_s"]
+        stats = {"queries": 0, "queries_done": 0, "results": 0, "pages_fetched": 0, "pages_timed_out": 0,
+                 "pages_failed": 0, "bytes": 0}
+
+        # 1. Fan out reformulated queries (a straggler may only use its share of the budget)
+        queries = reformulate(query, self.config["queries"])
+        stats["queries"] = len(queries)
+        tasks = [asyncio.ensure_future(self._query(q, self.config["results_per_query"])) for q in queries]
+        search_deadline = start + self.config["time_budget_s"] * self.config["search_share"]
+        done, pending = await asyncio.wait(tasks, timeout=max(0.0, search_deadline - time.perf_counter()))
+        for task in pending:
+            task.cancel()
+        result_lists = [t.result() for t in done if not t.exception()]
+        stats["queries_done"] = len(result_lists)
+        ranked = rank_results(result_lists, query)
+        stats["results"] = len(ranked)
+        if not ranked:
+            if tasks and all(t.done() and t.exception() for t in tasks):
+                raise tasks[0].exception()
+            return []
+
+        # 2. Fetch and extract the best pages within what is left of the budget
+        top = ranked[:max_results]
+        per_page_tokens = max(50, self.config["context_tokens"] // max(1, min(len(top), self.config["fetch_top"])))
+        fetches = {
+            asyncio.ensure_future(self._page_text(r["href"], query, per_page_tokens, stats)): r
+            for r in top[:self.config["fetch_top"]]
+        }
+        if fetches:
+            done, pending = await asyncio.wait(fetches, timeout=max(0.0, deadline - time.perf_counter()))
+            for task in pending:
+                task.cancel()
+            stats["pages_timed_out"] = len(pending)
+            for task in done:
+                text = None if task.exception() else task.result()
+                if not text:
+                    stats["pages_failed"] += 1
+                    continue
+                fetches[task]["body"] = text
+
+        stats["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        metrics.record("web_search_stage", **stats)
+        return [{"title": r["title"], "href": r["href"], "body": r["body"]} for r in top[:max_results]]
@@ -0,0 +1,365 @@
+"""
+TEF Master Local - Writing Checker
+Local rule-based checks for frequent written-French errors, run on the essay as it changes:
+
+- past participle agreement after être (elle est allé -> allée)
+- avoir instead of être for the DR MRS VANDERTRAMP verbs (j'ai allé -> je suis allé)
+- missing elision (je ai -> j'ai, la école -> l'école, si il -> s'il)
+- misplaced or incomplete negation (je ne pas aime, je n'ai mangé pas, je sais pas)
+
+Verb forms come from the conjugation engine and every pattern is compiled once. Results are cached
+per sentence, so after an edit only the sentences that changed are analyzed again. The rules favour
+precision: a construction they can't decide (e.g. a transitive "sortir le chien") is left alone.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from config import WRITING_CHECKER_CONFIG
+from conjugation import (AVOIR_VERBS, COMMON_IRREGULAR, ETRE_DRILL_VERBS, ETRE_VERBS, IRREGULAR, REGULAR_ER,
+                         conjugate, participle)
+from metrics import metrics
+
+# ==================== Word Tables ====================
+
+AVOIR_TO_ETRE = {
+    "ai": "suis", "as": "es", "a": "est", "avons": "sommes", "avez": "êtes", "ont": "sont",
+    "avais": "étais", "avait": "était", "avions": "étions", "aviez": "étiez", "avaient": "étaient",
+}
+ETRE_FORMS = ("suis", "es", "est", "sommes", "êtes", "sont", "étais", "était", "étions", "étiez", "étaient",
+              "serai", "seras", "sera", "serons", "serez", "seront", "serais", "serait", "serions", "seriez",
+              "seraient")
+
+# Participle -> infinitive for the verbs conjugated with être
+ETRE_PARTICIPLES = {participle(verb): verb for verb in ETRE_VERBS}
+# Used with avoir when they take a direct object (j'ai sorti le chien); passer mostly does
+TRANSITIVE_ETRE_VERBS = frozenset({"monter", "descendre", "sortir", "entrer", "rentrer", "retourner", "passer"})
+# After one of those verbs, only these words (or the end of the clause) show that no direct object
+# follows; anything else may start one (quelque chose, ça, deux valises, du pain)
+NO_OBJECT_FOLLOWS = frozenset({"à", "au", "aux", "en", "dans", "par", "chez", "vers", "pour", "avec", "sans",
+                               "sur", "sous", "hier", "tôt", "tard", "ensemble", "très", "trop", "là", "ici",
+                               "puis", "et", "mais"})
+DETERMINERS = frozenset({
+    "le", "la", "les", "l", "un", "une", "des", "du", "mon", "ma", "mes", "ton", "ta", "tes", "son", "sa", "ses",
+    "notre", "nos", "votre", "vos", "leur", "leurs", "ce", "cet", "cette", "ces", "tout", "toute", "tous", "toutes",
+})
+
+# Reflexive verbs whose pronoun is an indirect object: no agreement (ils se sont parlé)
+NO_AGREEMENT_REFLEXIVE = frozenset({"parlé", "téléphoné", "demandé", "ressemblé", "succédé", "souri", "plu",
+                                    "menti", "écrit", "dit", "répondu"})
+
+# Subject pronoun -> (gender, plural) for participle agreement; None gender: unknown (nous)
+SUBJECT_AGREEMENT = {"il": ("m", False), "elle": ("f", False), "ils": ("m", True), "elles": ("f", True),
+                     "nous": (None, True)}
+# Adverbs that may sit between a participle and its object (elle s'est lavé soigneusement les mains)
+ADVERBS = frozenset({"bien", "mal", "vite", "déjà", "encore", "toujours", "souvent", "aussi", "même", "très",
+                     "tôt", "tard", "longtemps", "beaucoup", "trop", "peu", "ensuite", "enfin", "alors"})
+PLURAL_AVOIR = frozenset({"avons", "avez", "ont", "avions", "aviez", "avaient"})
+# Subject pronoun before avoir -> gender of the participle once the auxiliary becomes être
+AVOIR_SUBJECT_GENDER = {"il": "m", "ils": "m", "elle": "f", "elles": "f"}
+
+# Forms of être each subject takes: "nous est" means nous is an object (ce qui nous est arrivé)
+_SINGULAR_ETRE = frozenset({"est", "était", "sera", "serait"})
+_PLURAL_ETRE = frozenset({"sont", "étaient", "seront", "seraient"})
+SUBJECT_ETRE_FORMS = {"il": _SINGULAR_ETRE, "elle": _SINGULAR_ETRE, "ils": _PLURAL_ETRE, "elles": _PLURAL_ETRE,
+                      "nous": frozenset({"sommes", "étions", "serons", "serions"})}
+SUBJECT_PRONOUNS = frozenset({"je", "tu", "il", "elle", "on", "nous", "vous", "ils", "elles"})
+
+# Conjugated (non-infinitive) forms of common verbs, to tell "ne pas + infinitive" from a misplaced negation
+CHECK_VERBS = sorted(set(REGULAR_ER + COMMON_IRREGULAR + AVOIR_VERBS + ETRE_DRILL_VERBS + list(IRREGULAR)
+                         + ["penser", "trouver", "croire", "comprendre", "oublier", "donner", "rester"]))
+CONJUGATED_FORMS = frozenset(
+    form
+    for verb in CHECK_VERBS
+    for tense in ("present", "imparfait", "futur_simple", "conditionnel")
+    for person in range(6)
+    for form in [conjugate(verb, tense, person)]
+    if " " not in form
+) | frozenset(AVOIR_TO_ETRE) | frozenset(ETRE_FORMS)
+
+# Mute-h words that elide (l'homme, l'heure); other h-words are left alone (le héros, la haine)
+MUTE_H = ("homme", "heure", "hôtel", "hôpital", "histoire", "habit", "hiver", "herbe", "humain", "honnête",
+          "huile", "habitude", "hier", "hébergement", "horaire", "horizon")
+NO_ELISION = frozenset({"onze", "onzième", "oui", "ouate"})
+# These conjunctions only elide before a few words (lorsqu'il, jusqu'à)
+LIMITED_ELISION = {
+    "lorsque": {"il", "ils", "elle", "elles", "on", "un", "une", "en"},
+    "puisque": {"il", "ils", "elle", "elles", "on", "un", "une", "en"},
+    "jusque": {"à", "au", "aux", "ici", "alors", "où"},
+}
+
+# ==================== Patterns ====================
+
+_W = r"\w+"
+_NOT_AFTER_WORD = r"(?<![\w'’-])"
+_ADVERB = r"(?:(?:pas|jamais|plus|déjà|bien|toujours|souvent|enfin|encore)\s+)?"
+
+_SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]*\s*|\n+")
+
+_AGREEMENT_RE = re.compile(
+    _NOT_AFTER_WORD + r"(?P<subject>ils|elles|il|elle|nous)\s+(?:ne\s+|n['’])?"
+    r"(?P<reflexive>s['’]|se\s+|nous\s+)?(?P<aux>" + "|".join(ETRE_FORMS) + r")\s+" + _ADVERB
+    + r"(?P<word>" + _W + r")(?P<next>\s+" + _W + r")?",
+    re.IGNORECASE)
+
+_AUXILIARY_RE = re.compile(
+    _NOT_AFTER_WORD + r"(?P<aux>(?:j['’]|n['’])?(?:" + "|".join(sorted(AVOIR_TO_ETRE, key=len, reverse=True))
+    + r"))\s+" + _ADVERB + r"(?P<word>" + _W + r")(?P<next>\s+[\w'’]+)?",
+    re.IGNORECASE)
+
+_VOWEL_START = r"(?:[aeiouyàâäéèêëîïôöûüœæ]|(?:" + "|".join(MUTE_H) + r"))"
+_ELISION_RE = re.compile(
+    _NOT_AFTER_WORD + r"(?P<word>je|me|te|se|le|la|de|ne|que|jusque|lorsque|puisque)\s+(?P<next>"
+    + _VOWEL_START + r"[\w]*)",
+    re.IGNORECASE)
+_ELISION_CE_SI_RE = re.compile(
+    _NOT_AFTER_WORD + r"(?:(?P<ce>ce)\s+(?P<est>est|était|étaient)|(?P<si>si)\s+(?P<il>ils?))\b",
+    re.IGNORECASE)
+
+_NE_PAS_VERB_RE = re.compile(_NOT_AFTER_WORD + r"(?P<ne>ne)\s+(?P<neg>pas|jamais|plus)\s+(?P<verb>" + _W + r")",
+                             re.IGNORECASE)
+_NEG_AFTER_PARTICIPLE_RE = re.compile(
+    _NOT_AFTER_WORD + r"(?P<aux>n['’](?:" + "|".join(sorted(list(AVOIR_TO_ETRE) + list(AVOIR_TO_ETRE.values()),
+                                                             key=len, reverse=True))
+    + r"))\s+(?P<word>" + _W + r"(?:é|ée|és|ées|i|ie|is|ies|u|ue|us|ues|it|ite|ert|erte|eint))\s+"
+    r"(?P<neg>pas|jamais|rien|plus)\b",
+    re.IGNORECASE)
+_MISSING_NE_RE = re.compile(
+    _NOT_AFTER_WORD + r"(?P<subject>je\s+|j['’]|tu\s+|il\s+|elle\s+|on\s+|nous\s+|vous\s+|ils\s+|elles\s+|c['’])"
+    r"(?P<verb>" + _W + r")\s+(?P<neg>pas|jamais|rien)\b",
+    re.IGNORECASE)
+_APOSTROPHE_RE = re.compile(r"['’]")
+_PREVIOUS_WORD_RE = re.compile(r"([\w'’]+)\s*$")
+_WORD_RE = re.compile(r"\w+")
+_IL_Y_A_PAS_RE = re.compile(_NOT_AFTER_WORD + r"il\s+y\s+(?P<verb>a|avait|aura)\s+(?P<neg>pas|jamais|rien|plus)\b",
+                            re.IGNORECASE)
+
+
+def _issue(rule: str, match: "re.Match", group: Any, suggestion: str, message: str) -> Dict[str, Any]:
+    start, end = match.span(group)
+    return {"rule": rule, "start": start, "end": end, "text": match.string[start:end],
+            "suggestion": suggestion, "message": message}
+
+
+def _keep_case(original: str, replacement: str) -> str:
+    return replacement[:1].upper() + replacement[1:] if original[:1].isupper() else replacement
+
+
+def _elide(word: str) -> str:
+    """je -> j', que -> qu'."""
+    return word[:-1] + "'"
+
+
+# ==================== Rules ====================
+
+def _participle_base(word: str, reflexive: bool) -> Optional[str]:
+    """The unagreed participle behind `word` (allées -> allé), if it is one the rule can judge."""
+    lower = word.lower()
+    for cut in (0, 1, 2):
+        base = lower[:len(lower) - cut] if cut else lower
+        if cut == 1 and lower[-1:] not in "es":
+            continue
+        if cut == 2 and not lower.endswith("es"):
+            continue
+        if base in ETRE_PARTICIPLES:
+            return base
+        if reflexive and base.endswith("é") and len(base) > 3 and base not in NO_AGREEMENT_REFLEXIVE:
+            return base
+    return None
+
+
+def _previous_word(sentence: str, pos: int) -> str:
+    m = _PREVIOUS_WORD_RE.search(sentence, 0, pos)
+    return m.group(1).lower() if m else ""
+
+
+def _next_non_adverb(sentence: str, pos: int) -> str:
+    """First word after `pos` that is not an adverb (elided words come back without their apostrophe)."""
+    for m in _WORD_RE.finditer(sentence, pos):
+        word = m.group().lower()
+        if word not in ADVERBS and not (word.endswith("ment") and len(word) > 6):
+            return word
+    return ""
+
+
+def _agreed(base: str, gender: Optional[str], plural: bool) -> str:
+    """Participle agreed for a subject; both forms when the gender is unknown."""
+    if gender is None:
+        return f"{base}s / {base}es" if plural else f"{base} / {base}e"
+    return base + ("e" if gender == "f" else "") + ("s" if plural else "")
+
+
+def check_agreement(sentence: str) -> List[Dict[str, Any]]:
+    issues = []
+    for m in _AGREEMENT_RE.finditer(sentence):
+        subject = m.group("subject").lower()
+        if m.group("aux").lower() not in SUBJECT_ETRE_FORMS[subject]:
+            continue  # The pronoun is not the subject of this être
+        pronoun = (m.group("reflexive") or "").strip().lower()
+        # "nous" before être is only reflexive with nous as the subject (il nous est arrivé: an object)
+        reflexive = bool(pronoun) and (pronoun != "nous" or subject == "nous")
+        base = _participle_base(m.group("word"), reflexive)
+        if base is None:
+            continue
+        next_word = _next_non_adverb(sentence, m.end("word"))
+        if reflexive and (next_word in DETERMINERS or next_word in ("que", "qu")):
+            continue  # elle s'est lavé (soigneusement) les mains, elle s'est imaginé que...: no agreement
+        gender, plural = SUBJECT_AGREEMENT[subject]
+        word = m.group("word").lower()
+        if gender is None:
+            if word.endswith("s"):
+                continue
+            suggestion = f"{base}s / {base}es"
+        else:
+            suggestion = base + ("e" if gender == "f" else "")
+            if plural and not suggestion.endswith("s"):
+                suggestion += "s"
+            if word == suggestion:
+                continue
+        issues.append(_issue("agreement", m, "word", suggestion,
+                             f"With être, the past participle agrees with the subject ({subject})."))
+    return issues
+
+
+def check_auxiliary(sentence: str) -> List[Dict[str, Any]]:
+    issues = []
+    for m in _AUXILIARY_RE.finditer(sentence):
+        word = m.group("word").lower()
+        verb = ETRE_PARTICIPLES.get(word)
+        if verb is None or verb == "passer":
+            continue
+        next_word = _APOSTROPHE_RE.split((m.group("next") or "").strip().lower())[0]
+        if verb in TRANSITIVE_ETRE_VERBS and next_word and next_word not in NO_OBJECT_FOLLOWS:
+            continue  # j'ai monté les valises, il a sorti quelque chose: transitive, avoir is right
+        aux = m.group("aux")
+        lower = aux.lower()
+        negated = lower.startswith("n")
+        bare = lower[2:] if lower[:2] in ("j'", "j’", "n'", "n’") else lower
+        etre = AVOIR_TO_ETRE[bare]
+        if lower.startswith("j"):
+            replacement = f"je {etre}"
+        elif negated:
+            replacement = f"n'{etre}" if etre[0] in "eéêa" else f"ne {etre}"
+        else:
+            replacement = etre
+        subject = "je" if lower.startswith("j") else _previous_word(sentence, m.start())
+        gender = AVOIR_SUBJECT_GENDER.get(subject)
+        participle_form = (f"{word}(e)(s)" if subject == "vous"
+                           else _agreed(word, gender, bare in PLURAL_AVOIR))
+        issues.append({
+            "rule": "auxiliary", "start": m.start("aux"), "end": m.end("word"),
+            "text": sentence[m.start("aux"):m.end("word")],
+            "suggestion": _keep_case(aux, replacement) + sentence[m.end("aux"):m.start("word")] + participle_form,
+            "message": f"{verb.capitalize()} takes être in the passé composé (DR MRS VANDERTRAMP); "
+                       f"the participle then agrees with the subject.",
+        })
+    return issues
+
+
+def check_elision(sentence: str) -> List[Dict[str, Any]]:
+    issues = []
+    for m in _ELISION_RE.finditer(sentence):
+        word, following = m.group("word"), m.group("next").lower()
+        if following in NO_ELISION or (word.lower() in ("le", "la") and (following[0] == "y"
+                                                                         or following in ("un", "une"))):
+            continue  # le onze, le yoga, la une du journal, le un (the number)
+        if word.lower() in LIMITED_ELISION and following not in LIMITED_ELISION[word.lower()]:
+            continue
+        issues.append({
+            "rule": "elision", "start": m.start(), "end": m.end(), "text": m.group(),
+            "suggestion": _elide(word) + m.group("next"),
+            "message": f"“{word.lower()}” elides before a vowel or mute h.",
+        })
+    for m in _ELISION_CE_SI_RE.finditer(sentence):
+        word, following = (m.group("ce"), m.group("est")) if m.group("ce") else (m.group("si"), m.group("il"))
+        issues.append({
+            "rule": "elision", "start": m.start(), "end": m.end(), "text": m.group(),
+            "suggestion": f"{word[0]}'{following}",
+            "message": f"“{word.lower()} {following.lower()}” is always written {word[0].lower()}'{following.lower()}.",
+        })
+    return issues
+
+
+def check_negation(sentence: str) -> List[Dict[str, Any]]:
+    issues = []
+    for m in _NE_PAS_VERB_RE.finditer(sentence):
+        verb = m.group("verb")
+        if verb.lower() not in CONJUGATED_FORMS:
+            continue  # ne pas + infinitive is correct
+        ne = "n'" if verb[0].lower() in "aeiouéèêh" else "ne "
+        issues.append(_issue("negation", m, 0, f"{_keep_case(m.group('ne'), ne)}{verb} {m.group('neg')}",
+                             "The negation goes around the conjugated verb: ne + verb + pas."))
+    for m in _NEG_AFTER_PARTICIPLE_RE.finditer(sentence):
+        issues.append({
+            "rule": "negation", "start": m.start(), "end": m.end(), "text": m.group(),
+            "suggestion": f"{m.group('aux')} {m.group('neg')} {m.group('word')}",
+            "message": "In compound tenses the negation surrounds the auxiliary: n'ai pas mangé.",
+        })
+    for m in _MISSING_NE_RE.finditer(sentence):
+        verb = m.group("verb")
+        if verb.lower() not in CONJUGATED_FORMS:
+            continue
+        previous = _previous_word(sentence, m.start())
+        if previous == "ne" or previous.endswith(("n'", "n’")) or previous in SUBJECT_PRONOUNS:
+            continue  # The pronoun is an object (je ne vous crois pas, il nous aime pas)
+        subject = m.group("subject").strip()
+        if subject.lower() in ("j'", "j’"):
+            subject = _keep_case(subject, "je")
+        elif subject.lower() in ("c'", "c’"):
+            subject = _keep_case(subject, "ce")
+        ne = "n'" if verb[0].lower() in "aeiouéèêh" else "ne "
+        issues.append(_issue("negation", m, 0, f"{subject} {ne}{verb} {m.group('neg')}",
+                             "Written French keeps the “ne” of the negation."))
+    for m in _IL_Y_A_PAS_RE.finditer(sentence):
+        issues.append(_issue("negation", m, 0, _keep_case(m.group(), f"il n'y {m.group('verb')} {m.group('neg')}"),
+                             "Written French keeps the “ne” of the negation: il n'y a pas."))
+    return issues
+
+
+RULES = (check_agreement, check_auxiliary, check_elision, check_negation)
+
+
+def check_sentence(sentence: str) -> List[Dict[str, Any]]:
+    """Every rule on one sentence; offsets are relative to the sentence."""
+    issues = [issue for rule in RULES for issue in rule(sentence)]
+    return sorted(issues, key=lambda issue: issue["start"])
+
+
+# ==================== Incremental Checker ====================
+
+class WritingChecker:
+    """Runs the rules on a whole text, reusing the results of sentences it has already checked."""
+
+    def __init__(self, max_sentences: int = 5000):
+        self.max_sentences = max_sentences
+        self.analyzed = 0  # Sentences the last check() had to analyze
+        self._cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, text: str) -> List[Dict[str, Any]]:
+        """Issues in `text`, in order, with offsets into `text`."""
+        issues, analyzed = [], 0
+        for m in _SENTENCE_RE.finditer(text):
+            sentence = m.group()
+            with self._lock:
+                found = self._cache.get(sentence)
+                if found is not None:
+                    self._cache.move_to_end(sentence)
+            if found is None:
+                found = check_sentence(sentence)
+                analyzed += 1
+                with self._lock:
+                    self._cache[sentence] = found
+                    while len(self._cache) > self.max_sentences:
+                        self._cache.popitem(last=False)
+            offset = m.start()
+            issues.extend({**issue, "start": issue["start"] + offset, "end": issue["end"] + offset} for issue in found)
+        self.analyzed = analyzed
+        metrics.increment("writing_checker_sentences", analyzed)
+        return issues
+
+
+# Global instance
+writing_checker = WritingChecker(WRITING_CHECKER_CONFIG['max_cached_sentences'])